@@ -0,0 +1,214 @@
+"""Employee-reported ad spend reconciled against settled Advertising rows.
+
+Reported spend is BrandDailyMetrics.ads_spend_delta, the day's change in the
+brand's typed-in ads_spend_total. Settled spend is the net of the brand's
+Advertising transactions posted that day. Both sides are grouped per day in
+SQL, read through the uq_brand_daily_metrics and ix_amazon_tx_brand_posted
+indexes, and the variance is stored in ad_spend_reconciliation.
+
+A report submission or a settlement import recomputes only the brand-days
+it touched, upserting their rows. Days in archived months no longer have
+their Advertising rows in the table, so their stored settled spend is
+kept and only the reported side is recomputed. ad_spend_gaps() rolls the
+stored days up by day or week and flags periods whose variance is above
+the thresholds.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, literal_column, select, union
+
+from models import db, AdSpendReconciliation, AmazonTransaction, BrandDailyMetrics, TransactionArchive, \
+    get_bangkok_now, upsert
+from money import CENTS_PER_UNIT, cents, from_cents
+from pivot import time_bucket
+
+ADVERTISING = 'Advertising'
+
+GAP_PERIODS = ('day', 'week')
+
+DEFAULT_PERIODS = 90
+
+
+def _valid_days(dates):
+    days = set()
+    for day in dates:
+        try:
+            datetime.strptime(day, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            continue
+        days.add(day)
+    return sorted(days)
+
+
+def _reported_by_day(brand, days=None):
+    query = select(BrandDailyMetrics.date_report, cents(BrandDailyMetrics.ads_spend_delta))\
+        .where(BrandDailyMetrics.brand == brand)
+    if days is not None:
+        query = query.where(BrandDailyMetrics.date_report.in_(days))
+    return dict(db.session.execute(query).all())
+
+
+def _settled_by_day(brand, first=None, last=None):
+    """Advertising spend per posted day, in cents, optionally for first..last only."""
+    day = func.date(AmazonTransaction.posted_date)
+    query = select(day, func.sum(cents(AmazonTransaction.total_amount))).where(
+        AmazonTransaction.brand == brand,
+        AmazonTransaction.transaction_type == ADVERTISING,
+        AmazonTransaction.posted_date.isnot(None)
+    )
+    if first is not None:
+        query = query.where(
+            AmazonTransaction.posted_date >= datetime.strptime(first, '%Y-%m-%d'),
+            AmazonTransaction.posted_date < datetime.strptime(last, '%Y-%m-%d') + timedelta(days=1)
+        )
+    # Charges are posted as negative amounts, so the day's spend is the size of its net
+    return {str(posted)[:10]: abs(int(total or 0))
+            for posted, total in db.session.execute(query.group_by(day)).all()}
+
+
+def _stored_settled(brand, days):
+    """Settled spend already stored for some days, in cents."""
+    return dict(db.session.execute(
+        select(AdSpendReconciliation.date_report, cents(AdSpendReconciliation.settled_spend)).where(
+            AdSpendReconciliation.brand == brand,
+            AdSpendReconciliation.date_report.in_(days)
+        )
+    ).all())
+
+
+def _archived_months():
+    return {month for month, in db.session.query(TransactionArchive.month)}
+
+
+def _store(brand, days, reported, settled):
+    """Upsert the rows of days with either side; delete those left with neither."""
+    now = get_bangkok_now().replace(tzinfo=None)
+    records = []
+    empty = []
+    for day in days:
+        if day not in reported and day not in settled:
+            empty.append(day)
+            continue
+        reported_cents = reported.get(day)
+        settled_cents = settled.get(day, 0)
+        records.append({
+            'brand': brand,
+            'date_report': day,
+            'reported_spend': from_cents(reported_cents),
+            'settled_spend': from_cents(settled_cents),
+            'variance': from_cents((reported_cents or 0) - settled_cents),
+            'updated_at': now
+        })
+    if empty:
+        AdSpendReconciliation.query.filter(
+            AdSpendReconciliation.brand == brand,
+            AdSpendReconciliation.date_report.in_(empty)
+        ).delete(synchronize_session=False)
+    # Upsert: concurrent submits for the same brand-day must not fail on uq_ad_spend_reconciliation
+    upsert(AdSpendReconciliation, records, keys=('brand', 'date_report'))
+    return len(records)
+
+
+def reconcile_dates(brand, dates):
+    """Recompute the reconciliation rows of some days of a brand; the caller commits.
+
+    Days in archived months keep their stored settled spend.
+    """
+    days = _valid_days(dates)
+    if not days:
+        return 0
+    archived = _archived_months()
+    hot_days = [day for day in days if day[:7] not in archived]
+    settled = {}
+    if hot_days:
+        settled = {day: spend for day, spend in _settled_by_day(brand, hot_days[0], hot_days[-1]).items()
+                   if day[:7] not in archived}
+    settled.update(_stored_settled(brand, [day for day in days if day[:7] in archived]))
+    return _store(brand, days, _reported_by_day(brand, days), settled)
+
+
+def reconcile_report(brand, date_report):
+    """Recompute after a report for date_report was saved and the brand's metrics refreshed.
+
+    A new ads_spend_total changes that day's delta and the next reported
+    day's delta, so both days are recomputed.
+    """
+    following = db.session.query(func.min(BrandDailyMetrics.date_report)).filter(
+        BrandDailyMetrics.brand == brand,
+        BrandDailyMetrics.date_report > date_report
+    ).scalar()
+    return reconcile_dates(brand, [date_report, following])
+
+
+def reconcile_transactions(brand, rows):
+    """Recompute the days of the Advertising rows in a parsed settlement; the caller commits."""
+    days = {row['posted_date'].strftime('%Y-%m-%d') for row in rows
+            if row.get('transaction_type') == ADVERTISING and row.get('posted_date')}
+    return reconcile_dates(brand, days)
+
+
+def reconcile_brand(brand):
+    """Rebuild every reconciliation row of a brand; the caller commits.
+
+    Archived months no longer have their Advertising rows in the table, so
+    their stored rows are kept as they were.
+    """
+    archived = _archived_months()
+    reported = _reported_by_day(brand)
+    settled = _settled_by_day(brand)
+    days = [day for day in _valid_days(set(reported) | set(settled)) if day[:7] not in archived]
+
+    stale = AdSpendReconciliation.query.filter(AdSpendReconciliation.brand == brand)
+    if archived:
+        stale = stale.filter(func.substr(AdSpendReconciliation.date_report, 1, 7).notin_(archived))
+    stale.delete(synchronize_session=False)
+    return _store(brand, days, reported, settled)
+
+
+def reconcile_all():
+    """Rebuild the reconciliation of every brand with metrics or Advertising rows."""
+    brands = db.session.execute(union(
+        select(BrandDailyMetrics.brand),
+        select(AmazonTransaction.brand).where(AmazonTransaction.transaction_type == ADVERTISING)
+    )).scalars().all()
+    rows = sum(reconcile_brand(brand) for brand in brands)
+    db.session.commit()
+    return len(brands), rows
+
+
+def ad_spend_gaps(brand, period='day', amount=10.0, percent=10.0, limit=DEFAULT_PERIODS):
+    """Reported vs settled spend per day or week, newest first, in currency units.
+
+    A period is flagged when its variance is at least `amount` and at least
+    `percent` of the larger side, so small-spend days are not flagged over
+    a few cents of rounding.
+    """
+    if period not in GAP_PERIODS:
+        raise ValueError(f'period must be one of {", ".join(GAP_PERIODS)}')
+    bucket = time_bucket(AdSpendReconciliation.date_report, period, db.engine.dialect.name)
+    rows = db.session.execute(
+        select(
+            bucket.label('period'),
+            func.count().label('days'),
+            func.sum(func.coalesce(cents(AdSpendReconciliation.reported_spend), 0)).label('reported'),
+            func.sum(cents(AdSpendReconciliation.settled_spend)).label('settled'),
+            func.sum(cents(AdSpendReconciliation.variance)).label('variance'),
+        ).where(AdSpendReconciliation.brand == brand)
+        # By position: PostgreSQL rejects a GROUP BY repeating an expression with bound parameters
+        .group_by(literal_column('1')).order_by(literal_column('1').desc()).limit(limit)
+    ).all()
+
+    gaps = []
+    for row in rows:
+        reported = int(row.reported or 0) / CENTS_PER_UNIT
+        settled = int(row.settled or 0) / CENTS_PER_UNIT
+        variance = int(row.variance or 0) / CENTS_PER_UNIT
+        gaps.append({
+            'period': row.period,
+            'days': row.days,
+            'reported': reported,
+            'settled': settled,
+            'variance': variance,
+            'flagged': abs(variance) >= amount and abs(variance) * 100 >= percent * max(reported, settled)
+        })
+    return gaps
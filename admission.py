@@ -0,0 +1,196 @@
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+
+# Priority classes. Critical requests (the employee form, the landing page,
+# assets) are always admitted. Every other request takes a slot from a shared
+# pool of capacity - reserved threads, so the reserved threads stay free for
+# critical ones. A request waiting for its slots already holds a gthread
+# thread, so the pool slot is taken first and without waiting: a request that
+# finds the pool full is shed at once. Heavy and stream requests also count
+# against a class limit and may queue for it while holding their pool slot.
+CRITICAL = 'critical'
+DEFAULT = 'default'
+HEAVY = 'heavy'
+STREAM = 'stream'
+
+ROUTE_CLASSES = {
+    'static': CRITICAL,
+    'asset': CRITICAL,
+    'index': CRITICAL,
+    'employee': CRITICAL,
+    'manager_login': CRITICAL,
+    'admission_stats': CRITICAL,
+    'manager_daily_stream': STREAM,
+    'export_csv': HEAVY,
+    'amazon_download': HEAVY,
+    'shipment_download': HEAVY,
+    'amazon_upload': HEAVY,
+    'amazon_orders': HEAVY,
+    'api_amazon_reconciliation': HEAVY,
+    'api_pivot': HEAVY,
+}
+
+
+def parse_route_limits(value):
+    """'export_csv=1,amazon_upload=1' → {'export_csv': 1, 'amazon_upload': 1}."""
+    limits = {}
+    for item in (value or '').split(','):
+        endpoint, _, limit = item.partition('=')
+        if endpoint.strip() and limit.strip():
+            limits[endpoint.strip()] = int(limit)
+    return limits
+
+
+class _Gate:
+    """A counting semaphore that also reports how many holders and waiters it has."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+
+    def acquire(self, timeout):
+        if self._semaphore.acquire(blocking=False):
+            acquired = True
+        elif timeout <= 0:
+            return False
+        else:
+            with self._lock:
+                self.waiting += 1
+            try:
+                acquired = self._semaphore.acquire(timeout=timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        if acquired:
+            with self._lock:
+                self.active += 1
+        return acquired
+
+    def stats(self):
+        return {'limit': self.limit, 'active': self.active, 'waiting': self.waiting}
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._semaphore.release()
+
+
+class AdmissionController:
+    """Per-worker admission control: concurrency limits and load shedding.
+
+    Registered as before_request/after_request/teardown_request hooks. A request that
+    finds the pool full, or cannot get its route and class slots within
+    queue_seconds, is shed with a 503 and a Retry-After header. Queued
+    requests hold their pool slot, so at most capacity - reserved threads
+    serve or wait on non-critical requests. Limits count threads of one
+    gunicorn worker; each worker admits independently.
+    """
+
+    def __init__(self, capacity, reserved=2, class_limits=None, route_limits=None,
+                 queue_seconds=5.0, retry_after=10):
+        self.capacity = capacity
+        self.reserved = min(reserved, capacity - 1)
+        self.queue_seconds = queue_seconds
+        self.retry_after = retry_after
+        self._pool = _Gate(capacity - self.reserved)
+        self._class_gates = {name: _Gate(limit) for name, limit in (class_limits or {}).items()}
+        self._route_gates = {endpoint: _Gate(limit) for endpoint, limit in (route_limits or {}).items()}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def init_app(self, app):
+        app.before_request(self.admit)
+        app.after_request(self.hold_streamed)
+        app.teardown_request(self.release)
+
+    def _gates(self, endpoint, priority):
+        gates = []
+        if endpoint in self._route_gates:
+            gates.append(self._route_gates[endpoint])
+        if priority in self._class_gates:
+            gates.append(self._class_gates[priority])
+        return gates
+
+    def _count(self, endpoint, priority, outcome, waited=0.0):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                'class': priority, 'admitted': 0, 'queued': 0, 'shed': 0, 'max_wait_ms': 0.0
+            })
+            stats[outcome] += 1
+            if waited:
+                stats['queued'] += 1
+                stats['max_wait_ms'] = max(stats['max_wait_ms'], round(waited * 1000, 1))
+
+    def admit(self):
+        """before_request: take this request's slots, or shed it."""
+        endpoint = request.endpoint or 'unknown'
+        priority = ROUTE_CLASSES.get(endpoint, DEFAULT)
+        g.admission_gates = []
+        if priority == CRITICAL:
+            self._count(endpoint, priority, 'admitted')
+            return None
+
+        # Waiting would hold a thread the pool does not count, so a full pool sheds at once
+        if not self._pool.acquire(0):
+            self._count(endpoint, priority, 'shed')
+            return self._shed_response()
+        g.admission_gates.append(self._pool)
+
+        started = time.monotonic()
+        deadline = started + self.queue_seconds
+        for gate in self._gates(endpoint, priority):
+            if not gate.acquire(deadline - time.monotonic()):
+                self.release()
+                self._count(endpoint, priority, 'shed')
+                return self._shed_response()
+            g.admission_gates.append(gate)
+
+        waited = time.monotonic() - started
+        self._count(endpoint, priority, 'admitted', waited if waited >= 0.001 else 0.0)
+        return None
+
+    def hold_streamed(self, response):
+        """after_request: a streamed body (the SSE feed) outlives teardown; release when it closes."""
+        if response.is_streamed:
+            gates = g.pop('admission_gates', None) or []
+            if gates:
+                response.call_on_close(lambda: self._release(gates))
+        return response
+
+    def release(self, exc=None):
+        """teardown_request: give back the slots taken in admit()."""
+        self._release(g.pop('admission_gates', None) or [])
+
+    @staticmethod
+    def _release(gates):
+        for gate in reversed(gates):
+            gate.release()
+
+    def _shed_response(self):
+        message = 'Server busy, please retry shortly.'
+        if request.path.startswith('/api/'):
+            response = jsonify({'error': message})
+        else:
+            response = current_app.response_class(message, mimetype='text/plain')
+        response.status_code = 503
+        response.headers['Retry-After'] = str(self.retry_after)
+        return response
+
+    def stats(self):
+        """Admission counters per endpoint and current slot usage, for monitoring."""
+        with self._lock:
+            routes = {endpoint: dict(stats) for endpoint, stats in self._stats.items()}
+        return {
+            'capacity': self.capacity,
+            'reserved': self.reserved,
+            'queue_seconds': self.queue_seconds,
+            'pool': self._pool.stats(),
+            'classes': {name: gate.stats() for name, gate in self._class_gates.items()},
+            'routes': {endpoint: gate.stats() for endpoint, gate in self._route_gates.items()},
+            'endpoints': routes,
+        }
@@ -0,0 +1,174 @@
+from sqlalchemy import and_, case, func
+
+from models import db, BrandDailyMetrics, DailyReport, BrandEmployee, BrandProduct
+from money import cents, from_cents
+
+
+def portfolio_kpis(start_date=None, end_date=None):
+    """Compute per-brand KPIs for every brand in a single grouped query.
+
+    start_date / end_date are 'YYYY-MM-DD' strings compared against the
+    user-entered date_report field. Returns a dict of aligned arrays, one
+    entry per brand, so the portfolio page can chart all brands at once.
+
+    ads_spend_total and ads_sales_total are lifetime running totals, so
+    with a date range the ads figures (and ACOS) are the sums of the
+    brand's daily deltas over the range instead of the latest totals.
+    """
+    query = db.session.query(
+        DailyReport.brand.label('brand'),
+        DailyReport.product.label('product'),
+        DailyReport.new_orders.label('new_orders'),
+        DailyReport.current_balance.label('current_balance'),
+        DailyReport.ads_spend_total.label('ads_spend_total'),
+        DailyReport.ads_sales_total.label('ads_sales_total'),
+        DailyReport.current_inventory.label('current_inventory'),
+        DailyReport.average_orders_30_days.label('average_orders_30_days'),
+        DailyReport.average_rating.label('average_rating'),
+        # Latest report per brand (brand-level values: balance, ads totals)
+        func.row_number().over(
+            partition_by=DailyReport.brand,
+            order_by=(DailyReport.date_report.desc(), DailyReport.created_at.desc())
+        ).label('rn_brand_last'),
+        # Earliest report per brand (start of the rating trend)
+        func.row_number().over(
+            partition_by=DailyReport.brand,
+            order_by=(DailyReport.date_report, DailyReport.created_at)
+        ).label('rn_brand_first'),
+        # Latest report per product (inventory is product-level)
+        func.row_number().over(
+            partition_by=(DailyReport.brand, DailyReport.product),
+            order_by=(DailyReport.date_report.desc(), DailyReport.created_at.desc())
+        ).label('rn_product_last'),
+    )
+
+    if start_date:
+        query = query.filter(DailyReport.date_report >= start_date)
+    if end_date:
+        query = query.filter(DailyReport.date_report <= end_date)
+
+    ranked = query.subquery()
+
+    def latest_brand(column):
+        return func.max(case((ranked.c.rn_brand_last == 1, column)))
+
+    def first_brand(column):
+        return func.max(case((ranked.c.rn_brand_first == 1, column)))
+
+    def latest_product_sum(column):
+        return func.sum(case((ranked.c.rn_product_last == 1, column), else_=0))
+
+    rows = db.session.query(
+        ranked.c.brand,
+        func.count().label('reports'),
+        func.coalesce(func.sum(ranked.c.new_orders), 0).label('orders'),
+        latest_brand(ranked.c.current_balance).label('balance'),
+        latest_brand(ranked.c.ads_spend_total).label('ads_spend'),
+        latest_brand(ranked.c.ads_sales_total).label('ads_sales'),
+        latest_product_sum(ranked.c.current_inventory).label('inventory'),
+        latest_product_sum(ranked.c.average_orders_30_days).label('avg_orders'),
+        first_brand(ranked.c.average_rating).label('rating_start'),
+        latest_brand(ranked.c.average_rating).label('rating_end'),
+    ).filter(ranked.c.brand.isnot(None))\
+        .group_by(ranked.c.brand)\
+        .order_by(ranked.c.brand)\
+        .all()
+    ads_in_range = _ads_deltas(start_date, end_date) if start_date or end_date else None
+
+    result = {
+        'brands': [], 'reports': [], 'orders': [], 'balance': [],
+        'ads_spend': [], 'ads_sales': [], 'acos': [], 'inventory': [],
+        'days_of_stock': [], 'rating': [], 'rating_trend': []
+    }
+
+    for row in rows:
+        if ads_in_range is None:
+            ads_spend = float(row.ads_spend or 0)
+            ads_sales = float(row.ads_sales or 0)
+        else:
+            ads_spend, ads_sales = ads_in_range.get(row.brand, (0.0, 0.0))
+        inventory = int(row.inventory or 0)
+        avg_orders = float(row.avg_orders or 0)
+        rating_end = float(row.rating_end or 0)
+        rating_start = float(row.rating_start or 0)
+
+        result['brands'].append(row.brand)
+        result['reports'].append(int(row.reports))
+        result['orders'].append(int(row.orders or 0))
+        result['balance'].append(round(float(row.balance or 0), 2))
+        result['ads_spend'].append(round(ads_spend, 2))
+        result['ads_sales'].append(round(ads_sales, 2))
+        result['acos'].append(round(ads_spend / ads_sales * 100, 2) if ads_sales else None)
+        result['inventory'].append(inventory)
+        # Same formula as the fulfilment page (999 = no recent orders)
+        if avg_orders > 0:
+            days_of_stock = round(inventory / avg_orders, 1)
+        else:
+            days_of_stock = 999 if inventory > 0 else 0
+        result['days_of_stock'].append(days_of_stock)
+        result['rating'].append(round(rating_end, 2))
+        result['rating_trend'].append(round(rating_end - rating_start, 2))
+
+    return result
+
+
+def _ads_deltas(start_date, end_date):
+    """Ads spend and sales per brand summed over a date range, as floats."""
+    query = db.session.query(
+        BrandDailyMetrics.brand,
+        func.sum(cents(BrandDailyMetrics.ads_spend_delta)),
+        func.sum(cents(BrandDailyMetrics.ads_sales_delta))
+    )
+    if start_date:
+        query = query.filter(BrandDailyMetrics.date_report >= start_date)
+    if end_date:
+        query = query.filter(BrandDailyMetrics.date_report <= end_date)
+    return {
+        brand: (float(from_cents(spend or 0)), float(from_cents(sales or 0)))
+        for brand, spend, sales in query.group_by(BrandDailyMetrics.brand)
+    }
+
+
+def submission_completeness(day):
+    """Who has and hasn't reported for day ('YYYY-MM-DD').
+
+    The expected matrix is every registered employee × their brand's
+    products; it is LEFT JOINed to daily_reports on (employee_name,
+    date_report, product), which the ix_daily_report_employee_day index
+    covers, so no report rows beyond that day are read. Cells without a
+    matching report are the missing submissions.
+    """
+    rows = db.session.query(
+        BrandEmployee.employee_name,
+        BrandEmployee.brand,
+        BrandProduct.product,
+        DailyReport.created_at,
+        DailyReport.updated_at
+    ).join(BrandProduct, BrandProduct.brand == BrandEmployee.brand)\
+        .outerjoin(DailyReport, and_(
+            DailyReport.employee_name == BrandEmployee.employee_name,
+            DailyReport.date_report == day,
+            DailyReport.product == BrandProduct.product
+        ))\
+        .order_by(BrandEmployee.brand, BrandEmployee.employee_name, BrandProduct.product)\
+        .all()
+
+    cells = []
+    for row in rows:
+        submitted_at = row.updated_at or row.created_at
+        cells.append({
+            'employee_name': row.employee_name,
+            'brand': row.brand,
+            'product': row.product,
+            'submitted': row.created_at is not None,
+            'submitted_at': submitted_at.strftime('%H:%M:%S') if submitted_at else None
+        })
+
+    submitted = sum(1 for cell in cells if cell['submitted'])
+    return {
+        'date': day,
+        'expected': len(cells),
+        'submitted': submitted,
+        'missing': len(cells) - submitted,
+        'cells': cells
+    }
@@ -0,0 +1,273 @@
+import math
+
+from models import db, DailyReport, ProductFieldStats, ReportAnomaly, get_bangkok_now, upsert
+
+# Report fields tracked with per-product running statistics
+MONITORED_FIELDS = [
+    'current_balance', 'new_orders', 'current_inventory', 'average_orders_30_days',
+    'average_rating', 'main_niche_ranking', 'sub_niche_ranking',
+    'ads_spend_total', 'ads_sales_total', 'acos', 'impressions'
+]
+
+RANKING_FIELDS = ('main_niche_ranking', 'sub_niche_ranking')
+
+# Minimum history before the z-score test applies
+MIN_SAMPLES = 5
+
+# Flag values more than this many standard deviations from the mean
+Z_THRESHOLD = 4.0
+
+# Flag values this many times above/below the mean (e.g. an extra zero)
+SCALE_FACTOR = 8.0
+
+# Outliers on the same side of the mean in this many reports in a row are a
+# new level (e.g. a restock): the baseline restarts from them
+LEVEL_SHIFT_REPORTS = 3
+
+# Rule-based reasons; these are entry mistakes however long they persist
+RANKING_ZERO = 'Ranking is 0'
+ACOS_FRACTION = 'ACOS looks like a fraction instead of a percent'
+
+
+class RunningStats:
+    """Running mean/variance for one field (Welford's algorithm).
+
+    streak holds the latest run of outliers on one side of the mean, as
+    RunningStats of their own, or None.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'streak')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, streak=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.streak = streak
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value):
+        """Undo update(value), e.g. for a report value that was resubmitted."""
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        delta = value - self.mean
+        self.count -= 1
+        self.mean -= delta / self.count
+        self.m2 = max(self.m2 - delta * (value - self.mean), 0.0)
+
+    def add_outlier(self, value):
+        """Count an outlier towards a level shift.
+
+        Returns True when it makes LEVEL_SHIFT_REPORTS outliers in a row on
+        the same side of the mean; the stats then restart from that run.
+        """
+        above = value > self.mean
+        if self.streak is None or (self.streak.mean > self.mean) != above:
+            self.streak = RunningStats()
+        self.streak.update(value)
+        if self.streak.count < LEVEL_SHIFT_REPORTS:
+            return False
+        self.count, self.mean, self.m2 = self.streak.count, self.streak.mean, self.streak.m2
+        self.streak = None
+        return True
+
+    def add_clean(self, value):
+        """Fold a value that was not flagged into the baseline, ending any outlier run."""
+        self.streak = None
+        self.update(value)
+
+
+def _z_score(value, stats):
+    std = stats.std
+    return (value - stats.mean) / std if std > 0 else None
+
+
+def check_rules(field, value, stats):
+    """(reason, z_score) for a value that breaks a field rule (an entry mistake), else None."""
+    mean = stats.mean
+    if field in RANKING_FIELDS and value == 0 and stats.count and mean > 0:
+        return RANKING_ZERO, _z_score(value, stats)
+
+    if field == 'acos' and 0 < value < 1 and stats.count and mean >= 5:
+        return ACOS_FRACTION, _z_score(value, stats)
+
+    return None
+
+
+def check_level(field, value, stats):
+    """(reason, z_score) for a value far from the product's usual level, else None."""
+    if stats.count < MIN_SAMPLES:
+        return None
+
+    mean = stats.mean
+    z_score = _z_score(value, stats)
+
+    if mean > 0 and value > 0 and field not in RANKING_FIELDS:
+        ratio = value / mean
+        if ratio >= SCALE_FACTOR or ratio <= 1 / SCALE_FACTOR:
+            return f'{ratio:.1f}x the usual value', z_score
+
+    if z_score is not None and abs(z_score) > Z_THRESHOLD:
+        return f'{abs(z_score):.1f} standard deviations from the usual value', z_score
+
+    return None
+
+
+def check_value(field, value, stats):
+    """Return (reason, z_score) if value looks wrong given stats, else None."""
+    if value is None:
+        return None
+    return check_rules(field, value, stats) or check_level(field, value, stats)
+
+
+def check_report(report, stats_by_field):
+    """Check a report against per-field stats, updating stats with clean values.
+
+    Outliers stay out of the baseline, except that LEVEL_SHIFT_REPORTS of
+    them in a row on the same side become the new baseline; the report that
+    completes such a run is not flagged. Returns a list of ReportAnomaly
+    objects (not yet added to the session).
+    """
+    anomalies = []
+    created_at = get_bangkok_now().replace(tzinfo=None)
+
+    for field in MONITORED_FIELDS:
+        value = getattr(report, field)
+        if value is None:
+            continue
+        value = float(value)
+        stats = stats_by_field.setdefault(field, RunningStats())
+
+        flagged = check_rules(field, value, stats)
+        if not flagged:
+            flagged = check_level(field, value, stats)
+            if not flagged:
+                stats.add_clean(value)
+            elif stats.add_outlier(value):
+                # Not an outlier but a sustained shift, now the baseline
+                flagged = None
+        if flagged:
+            reason, z_score = flagged
+            anomalies.append(ReportAnomaly(
+                report_id=report.id,
+                created_at=created_at,
+                brand=report.brand,
+                product=report.product,
+                employee_name=report.employee_name,
+                date_report=report.date_report,
+                field=field,
+                value=value,
+                expected=round(stats.mean, 4) if stats.count else None,
+                z_score=round(z_score, 2) if z_score is not None else None,
+                reason=reason
+            ))
+
+    return anomalies
+
+
+def forget_superseded(report_id, superseded, stats_by_field):
+    """Take a resubmitted report's old values back out of the running stats.
+
+    Values that were flagged never entered the stats, so only the unflagged
+    ones are removed; a flagged level outlier leaves the current outlier
+    run instead. The old version's flags are deleted with it.
+    """
+    flagged = ReportAnomaly.query.filter_by(report_id=report_id)
+    reasons = dict(flagged.with_entities(ReportAnomaly.field, ReportAnomaly.reason))
+    for field in MONITORED_FIELDS:
+        value = getattr(superseded, field)
+        stats = stats_by_field.get(field)
+        if value is None or stats is None:
+            continue
+        if field not in reasons:
+            stats.remove(float(value))
+        elif reasons[field] not in (RANKING_ZERO, ACOS_FRACTION) and stats.streak is not None:
+            stats.streak.remove(float(value))
+            if not stats.streak.count:
+                stats.streak = None
+    flagged.delete(synchronize_session=False)
+
+
+def _streak(count, mean, m2):
+    return RunningStats(count, mean, m2) if count else None
+
+
+def _stats_columns(stats):
+    """ProductFieldStats column values for a RunningStats."""
+    streak = stats.streak or RunningStats()
+    return {'count': stats.count, 'mean': stats.mean, 'm2': stats.m2,
+            'streak_count': streak.count, 'streak_mean': streak.mean, 'streak_m2': streak.m2}
+
+
+def detect_report_anomalies(report, superseded=None):
+    """Validate a new (flushed) report against its product's running stats.
+
+    superseded is the previous version of a resubmitted report, whose values
+    are removed from the stats before the new ones are checked. Reads and
+    upserts only this product's stats rows; the caller commits.
+    """
+    # Plain columns, not entities: the stats are upserted behind the ORM's back
+    rows = db.session.query(
+        ProductFieldStats.field, ProductFieldStats.count, ProductFieldStats.mean, ProductFieldStats.m2,
+        ProductFieldStats.streak_count, ProductFieldStats.streak_mean, ProductFieldStats.streak_m2
+    ).filter_by(brand=report.brand, product=report.product)
+    stats_by_field = {
+        row.field: RunningStats(row.count, row.mean, row.m2, _streak(row.streak_count, row.streak_mean,
+                                                                     row.streak_m2))
+        for row in rows
+    }
+
+    if superseded is not None:
+        forget_superseded(report.id, superseded, stats_by_field)
+
+    anomalies = check_report(report, stats_by_field)
+
+    # Upsert: the first reports of a new product may be saved concurrently
+    upsert(ProductFieldStats, [
+        {'brand': report.brand, 'product': report.product, 'field': field, **_stats_columns(stats)}
+        for field, stats in stats_by_field.items()
+    ], keys=('brand', 'product', 'field'))
+
+    db.session.add_all(anomalies)
+    return anomalies
+
+
+def scan_history(batch_size=1000):
+    """Rebuild all running stats and anomaly flags from the full report history.
+
+    Streams reports in submission order, so each report is judged only
+    against what came before it. Returns the number of anomalies found.
+    """
+    ReportAnomaly.query.delete()
+    ProductFieldStats.query.delete()
+
+    stats_by_product = {}
+
+    reports = DailyReport.query.order_by(DailyReport.date_report, DailyReport.created_at)\
+        .yield_per(batch_size)
+
+    anomalies = []
+    for report in reports:
+        stats_by_field = stats_by_product.setdefault((report.brand, report.product), {})
+        anomalies.extend(check_report(report, stats_by_field))
+
+    db.session.add_all(anomalies)
+
+    for (brand, product), stats_by_field in stats_by_product.items():
+        for field, stats in stats_by_field.items():
+            db.session.add(ProductFieldStats(brand=brand, product=product, field=field,
+                                             **_stats_columns(stats)))
+
+    db.session.commit()
+    return len(anomalies)
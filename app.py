@@ -1,55 +1,41 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, Response, session
+from flask import Flask, render_template, request, redirect, url_for, flash, Response, session, jsonify, stream_with_context
 from datetime import datetime
 from functools import wraps
 import pandas as pd
 import plotly.express as px
 import plotly.utils
 import json
+from sqlalchemy import func
 import pytz
 import os
-import xml.etree.ElementTree as ET
+import click
 
 from config import Config
-from models import db, DailyReport, AmazonTransaction, ShipmentCost, get_bangkok_now
-
-# Brand list for dropdowns (removed FEMBURN)
-BRANDS = [
-    'ENERZAA', 'LUVOST', 'PEAKSHILAJIT', 'BOXOOS', 'CYLEOX', 'ROBURSTAGE',
-    'CHICADDONS', 'ORANIC EXTRACT', 'ZOVOST', 'VITALIXHAIR', 'SYLIARIX'
-]
-
-# Employee → Brand mapping
-EMPLOYEE_BRAND_MAP = {
-    'Mai Phương': 'ENERZAA',
-    'Việt Khanh': 'LUVOST',
-    'Quỳnh Anh': 'PEAKSHILAJIT',
-    'Nhi (Boxoos)': 'BOXOOS',
-    'Thảo (Cyleox)': 'CYLEOX',
-    'Hoàng Thư': 'ROBURSTAGE',
-    'Diệu Anh': 'CHICADDONS',
-    'Uyên Vi': 'ORANIC EXTRACT',
-    'Phạm Thảo': 'ZOVOST',
-    'Lan Anh': 'VITALIXHAIR',
-    'Thảo Tiên': 'SYLIARIX'
-}
-
-# Brand → Products mapping
-BRAND_PRODUCTS_MAP = {
-    'ENERZAA': ['Creatine Complex Gummies Blue Razz', 'Creatine Complex Gummies Sour Watermelon'],
-    'VITALIXHAIR': ['Vitalix Hair Oil (yellow)', 'Vitalix Hair Growth (pink)'],
-    'SYLIARIX': ['Brain Booster'],
-    'CHICADDONS': ['ChicAddOns Mullein'],
-    'CYLEOX': ['Night time fat burner', 'Balance Gummies'],
-    'ORANIC EXTRACT': ['Pure Shilajit Gummies', '3 in 1 Wellness Gummies'],
-    'LUVOST': ['Luvost Liquid Drops', 'Luvost Sea Moss'],
-    'BOXOOS': ['Estrogen Control'],
-    'ROBURSTAGE': ['Pure NMN'],
-    'PEAKSHILAJIT': ['SHILAJIT GUMMY PLATINUM'],
-    'ZOVOST': ['Super Blend']
-}
-
-# All products list for charts
-ALL_PRODUCTS = [p for products in BRAND_PRODUCTS_MAP.values() for p in products]
+from models import (db, DailyReport, AmazonTransaction, ShipmentCost, ReportAnomaly,
+                    BrandDailyMetrics, SettlementImport, get_bangkok_now)
+from analytics import portfolio_kpis, submission_completeness
+from registry import brand_registry, seed_registry
+from anomalies import scan_history
+from status_events import current_alerts, rebuild_status_events
+from settlement import DuplicateSettlement, parse_settlement_import, record_import, rollback_import
+from coalesce import RequestCoalescer
+from metrics import refresh_all_metrics, refresh_brand_metrics
+from bulk_load import BULK_TABLES, DEFAULT_CHUNK_SIZE, AlreadyLoaded, load_file
+from submissions import commit_report
+from money import CENTS_PER_UNIT, as_float, parse_amount
+from group_commit import CommitPending, GroupCommitWriter, configure_sqlite
+from migrations import run_migrations
+from columnar import cents_to_units, report_store
+from live_updates import report_delta, report_stream, watermark, parse_watermark
+from replica import REPLICA_BIND, read_replica, remember_writes
+from archive import (MONEY_COLUMNS as ARCHIVE_MONEY_COLUMNS, ArchiveUnavailable, archive_closed_months,
+                     partition_transactions, transaction_type_totals, transactions_frame)
+from order_reconciliation import anomalous_orders, order_transactions, summarize_order
+from assets import VENDOR_ASSETS, asset_url, build_assets, send_asset
+from admission import HEAVY, STREAM, AdmissionController, parse_route_limits
+from ad_spend import GAP_PERIODS, ad_spend_gaps, reconcile_all, reconcile_brand, reconcile_transactions
+from pivot import (AGGREGATORS, COLUMN_DIMENSIONS, DIMENSIONS, METRIC_FIELDS, ROW_COUNT, data_version,
+                   parse_spec, run_pivot)
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -62,7 +48,49 @@ db.init_app(app)
 
 # Create tables on first request
 with app.app_context():
+    configure_sqlite(db.engine, app.config['SQLITE_SYNCHRONOUS'])
+    if REPLICA_BIND in db.engines:
+        configure_sqlite(db.engines[REPLICA_BIND], app.config['SQLITE_SYNCHRONOUS'])
     db.create_all()
+    run_migrations()
+    seed_registry()
+    
+    # Load the columnar report cache once per worker
+    report_store.refresh()
+
+# Brands, employees and products come from the registry tables
+brand_registry.ttl_seconds = app.config['BRAND_REGISTRY_TTL']
+
+# End-of-day submissions are committed in batches by a single writer thread
+group_writer = None
+if app.config['GROUP_COMMIT']:
+    group_writer = GroupCommitWriter(app,
+                                     max_batch=app.config['GROUP_COMMIT_MAX_BATCH'],
+                                     max_delay=app.config['GROUP_COMMIT_MAX_DELAY_MS'] / 1000)
+
+# Identical concurrent API reads are computed once and shared
+api_coalescer = RequestCoalescer(ttl_seconds=app.config['API_CACHE_TTL'])
+
+# Pivot results, keyed by query and data version so new reports never read stale
+pivot_cache = RequestCoalescer(ttl_seconds=app.config['PIVOT_CACHE_TTL'])
+
+# After a write, that browser reads from the primary instead of the replica for a while
+app.after_request(remember_writes)
+
+# Per-route concurrency limits; threads are reserved for employee submissions
+admission = None
+if app.config['ADMISSION_CONTROL']:
+    admission = AdmissionController(
+        capacity=app.config['ADMISSION_CAPACITY'],
+        reserved=app.config['ADMISSION_RESERVED'],
+        class_limits={HEAVY: app.config['ADMISSION_HEAVY_LIMIT'], STREAM: app.config['ADMISSION_STREAM_LIMIT']},
+        route_limits=parse_route_limits(app.config['ADMISSION_ROUTE_LIMITS']),
+        queue_seconds=app.config['ADMISSION_QUEUE_SECONDS'],
+        retry_after=app.config['ADMISSION_RETRY_AFTER'])
+    admission.init_app(app)
+
+# Templates link fingerprinted local assets (flask build-assets), else the CDN
+app.jinja_env.globals['asset_url'] = asset_url
 
 
 # =============================================================================
@@ -80,6 +108,26 @@ def login_required(f):
     return decorated_function
 
 
+def api_login_required(f):
+    """Decorator to require manager login for JSON endpoints."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('manager_logged_in'):
+            return jsonify({'error': 'Manager login required.'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# =============================================================================
+# STATIC ASSETS
+# =============================================================================
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    """Fingerprinted asset from static/dist/, cached as immutable."""
+    return send_asset(filename)
+
+
 # =============================================================================
 # LANDING PAGE
 # =============================================================================
@@ -94,6 +142,14 @@ def index():
 # EMPLOYEE ROUTES
 # =============================================================================
 
+def render_employee_form(**context):
+    """Render the employee form with the current registry mappings."""
+    return render_template('employee.html',
+                         employee_brand_map=brand_registry.employee_brand_map(),
+                         brand_products_map=brand_registry.brand_products_map(),
+                         **context)
+
+
 @app.route('/employee', methods=['GET', 'POST'])
 def employee():
     """Employee report submission form."""
@@ -104,7 +160,7 @@ def employee():
             
             # Get employee name and lookup brand
             employee_name = request.form.get('employee_name', '').strip()
-            brand = EMPLOYEE_BRAND_MAP.get(employee_name, request.form.get('brand', '').strip())
+            brand = brand_registry.employee_brand_map().get(employee_name, request.form.get('brand', '').strip())
             product = request.form.get('product', '').strip()
             
             # Create new report with all fields
@@ -117,7 +173,7 @@ def employee():
                 brand=brand,
                 product=product,
                 date_report=request.form.get('date_report', '').strip(),
-                current_balance=float(request.form.get('current_balance', 0) or 0),
+                current_balance=parse_amount(request.form.get('current_balance')),
                 release_date_balance=request.form.get('release_date_balance', '').strip(),
                 
                 # Account Status (required)
@@ -144,9 +200,9 @@ def employee():
                 sub_niche_ranking=int(request.form.get('sub_niche_ranking', 0) or 0),
                 
                 # Advertising
-                ads_spend_total=float(request.form.get('ads_spend_total', 0) or 0),
-                ads_sales_total=float(request.form.get('ads_sales_total', 0) or 0),
-                ads_sales_today=float(request.form.get('ads_sales_today', 0) or 0),
+                ads_spend_total=parse_amount(request.form.get('ads_spend_total')),
+                ads_sales_total=parse_amount(request.form.get('ads_sales_total')),
+                ads_sales_today=parse_amount(request.form.get('ads_sales_today')),
                 acos=float(request.form.get('acos', 0) or 0),
                 impressions=int(request.form.get('impressions', 0) or 0),
                 
@@ -155,34 +211,49 @@ def employee():
                 shopify_total_dpv=int(request.form.get('shopify_total_dpv', 0) or 0),
                 shopify_total_atc=int(request.form.get('shopify_total_atc', 0) or 0),
                 shopify_total_purchases=int(request.form.get('shopify_total_purchases', 0) or 0),
-                shopify_total_product_sales=float(request.form.get('shopify_total_product_sales', 0) or 0)
+                shopify_total_product_sales=parse_amount(request.form.get('shopify_total_product_sales'))
             )
             
             # Validate required fields
             if not report.employee_name:
                 flash('Employee name is required.', 'error')
-                return render_template('employee.html')
+                return render_employee_form()
             
             if not report.brand:
                 flash('Brand is required.', 'error')
-                return render_template('employee.html')
+                return render_employee_form()
+            
+            # Save to database (a resubmission replaces the same day's report)
+            if group_writer is not None:
+                result = group_writer.submit(report)
+            else:
+                result = commit_report(report)
             
-            # Save to database
-            db.session.add(report)
-            db.session.commit()
+            # New brands typed into the form join the registry
+            brand_registry.add_brand(result['brand'])
             
-            flash('Report submitted successfully!', 'success')
-            return render_template('employee.html', success=True)
+            if result['replaced']:
+                flash('Report updated! It replaces your earlier submission for this day.', 'success')
+            else:
+                flash('Report submitted successfully!', 'success')
+            if result['anomalies']:
+                fields = ', '.join(field.replace('_', ' ') for field in result['anomalies'])
+                flash(f'Please double-check these values, they look unusual: {fields}', 'info')
+            return render_employee_form(success=True)
             
         except ValueError as e:
             flash(f'Invalid input: Please check your numeric values.', 'error')
-            return render_template('employee.html')
+            return render_employee_form()
+        except CommitPending:
+            flash('Saving is taking longer than usual. Your report is queued and should be saved shortly; '
+                  'please do not submit it again.', 'info')
+            return render_employee_form()
         except Exception as e:
             db.session.rollback()
             flash(f'Error saving report: {str(e)}', 'error')
-            return render_template('employee.html')
+            return render_employee_form()
     
-    return render_template('employee.html')
+    return render_employee_form()
 
 
 # =============================================================================
@@ -224,6 +295,7 @@ def manager():
 
 @app.route('/manager/daily', methods=['GET', 'POST'])
 @login_required
+@read_replica
 def manager_daily():
     """Manager daily report view."""
     reports = []
@@ -243,53 +315,66 @@ def manager_daily():
                     .order_by(DailyReport.created_at.desc()).all()
                 
                 if reports:
-                    # Generate charts
-                    charts_json = generate_daily_charts(reports)
+                    # Generate charts from the columnar cache
+                    report_store.refresh()
+                    charts_json = generate_daily_charts(
+                        report_store.frame(report_store.rows_where('date_report', date_str)))
                 else:
                     flash(f'No records found for {selected_date.strftime("%d/%m/%Y")}', 'info')
                     
             except ValueError:
                 flash('Invalid date format.', 'error')
     
+    # Starting point for the live updates stream
+    live_reports = [report_delta(r) for r in reports]
+    stream_since = max((watermark(r) for r in reports if r.updated_at), default=None,
+                       key=parse_watermark)
+    
     return render_template('daily_report.html', 
                          reports=reports, 
                          selected_date=selected_date,
-                         charts_json=charts_json)
+                         charts_json=charts_json,
+                         live_reports=live_reports,
+                         stream_since=stream_since)
+
+
+@app.route('/manager/daily/stream')
+@login_required
+def manager_daily_stream():
+    """Server-sent events: reports for ?date= committed after ?since= / Last-Event-ID."""
+    date_str = request.args.get('date', '').strip()
+    since = parse_watermark(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    
+    stream = report_stream(date_str, since,
+                           poll_seconds=app.config['SSE_POLL_SECONDS'],
+                           max_seconds=app.config['SSE_MAX_SECONDS'])
+    return Response(stream_with_context(stream), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/manager/overall')
 @login_required
 def manager_overall():
     """Manager overall report view with brand buttons."""
-    # Get all unique brands
-    brands = db.session.query(DailyReport.brand)\
-        .distinct()\
-        .order_by(DailyReport.brand)\
-        .all()
-    brands = [b[0] for b in brands if b[0]]
+    brands = brand_registry.brands()
     
     return render_template('overall_report.html', brands=brands)
 
 
 @app.route('/manager/overall/<brand>')
 @login_required
+@read_replica
 def manager_overall_brand(brand):
     """Manager overall report for a specific brand."""
-    # Get all unique brands for navigation
-    brands = db.session.query(DailyReport.brand)\
-        .distinct()\
-        .order_by(DailyReport.brand)\
-        .all()
-    brands = [b[0] for b in brands if b[0]]
+    brands = brand_registry.brands()
     
-    # Get reports for selected brand
-    reports = DailyReport.query.filter_by(brand=brand)\
-        .order_by(DailyReport.date_report, DailyReport.created_at)\
-        .all()
+    # Get reports for selected brand from the columnar cache
+    report_store.refresh()
+    df = report_store.frame(report_store.brand_rows(brand))
     
     charts_json = None
-    if reports:
-        charts_json = generate_brand_charts(reports, brand)
+    if not df.empty:
+        charts_json = generate_brand_charts(df, brand, get_brand_daily_metrics(brand))
     
     return render_template('overall_report.html', 
                          brands=brands, 
@@ -297,46 +382,101 @@ def manager_overall_brand(brand):
                          charts_json=charts_json)
 
 
+def parse_date_range_args(args):
+    """Read optional start/end (YYYY-MM-DD) query args, ignoring invalid values."""
+    date_range = []
+    for key in ('start', 'end'):
+        value = args.get(key, '').strip()
+        try:
+            datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            value = None
+        date_range.append(value)
+    return tuple(date_range)
+
+
+@app.route('/manager/portfolio')
+@login_required
+@read_replica
+def manager_portfolio():
+    """Cross-brand comparison dashboard (all brands in one page)."""
+    start_date, end_date = parse_date_range_args(request.args)
+    kpis = portfolio_kpis(start_date, end_date)
+    return render_template('portfolio.html',
+                         kpis=kpis,
+                         start_date=start_date,
+                         end_date=end_date)
+
+
+@app.route('/manager/portfolio/data')
+@login_required
+@read_replica
+def manager_portfolio_data():
+    """Cross-brand KPIs as aligned JSON arrays."""
+    start_date, end_date = parse_date_range_args(request.args)
+    return jsonify(portfolio_kpis(start_date, end_date))
+
+
+def completeness_day(args):
+    """?date=YYYY-MM-DD from the query string, defaulting to today (Bangkok)."""
+    date_str = args.get('date', '').strip()
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return get_bangkok_now().strftime('%Y-%m-%d')
+
+
+@app.route('/manager/completeness')
+@login_required
+def manager_completeness():
+    """Submission board: expected employee/product reports vs. submitted."""
+    board = submission_completeness(completeness_day(request.args))
+    return render_template('completeness.html', board=board)
+
+
+@app.route('/manager/completeness/data')
+@login_required
+def manager_completeness_data():
+    """Submission board as JSON, for polling during the cutoff window."""
+    return jsonify(submission_completeness(completeness_day(request.args)))
+
+
 @app.route('/manager/fulfilment')
 @login_required
+@read_replica
 def manager_fulfilment():
     """Manager fulfilment view - categorizes products by inventory status."""
-    # Get all unique products
-    products = db.session.query(DailyReport.product).distinct().all()
-    products = [p[0] for p in products if p[0]]
+    # Latest report per product, from the columnar cache
+    report_store.refresh()
+    latest = report_store.frame(report_store.latest_per('product'),
+                                fields=('product', 'brand', 'current_inventory', 'average_orders_30_days'))
     
     safe_products = []
     urgent_products = []
     
-    for product_name in products:
-        # Get the latest report for this product
-        latest_report = DailyReport.query.filter_by(product=product_name)\
-            .order_by(DailyReport.created_at.desc())\
-            .first()
+    for row in latest.itertuples(index=False):
+        inventory = int(row.current_inventory)
+        avg_orders = 0 if pd.isna(row.average_orders_30_days) else float(row.average_orders_30_days)
         
-        if latest_report:
-            inventory = latest_report.current_inventory or 0
-            avg_orders = latest_report.average_orders_30_days or 0
-            
-            # Calculate days of stock (flag index)
-            if avg_orders > 0:
-                days_of_stock = inventory / avg_orders
-            else:
-                days_of_stock = float('inf') if inventory > 0 else 0
-            
-            product_data = {
-                'name': product_name,
-                'brand': latest_report.brand,
-                'inventory': inventory,
-                'avg_orders': avg_orders,
-                'days_of_stock': days_of_stock if days_of_stock != float('inf') else 999
-            }
-            
-            # Categorize: <= 60 days = Urgent, > 60 days = Safe
-            if days_of_stock <= 60:
-                urgent_products.append(product_data)
-            else:
-                safe_products.append(product_data)
+        # Calculate days of stock (flag index)
+        if avg_orders > 0:
+            days_of_stock = inventory / avg_orders
+        else:
+            days_of_stock = float('inf') if inventory > 0 else 0
+        
+        product_data = {
+            'name': row.product,
+            'brand': row.brand,
+            'inventory': inventory,
+            'avg_orders': avg_orders,
+            'days_of_stock': days_of_stock if days_of_stock != float('inf') else 999
+        }
+        
+        # Categorize: <= 60 days = Urgent, > 60 days = Safe
+        if days_of_stock <= 60:
+            urgent_products.append(product_data)
+        else:
+            safe_products.append(product_data)
     
     # Sort urgent by days_of_stock (lowest first - most urgent)
     urgent_products.sort(key=lambda x: x['days_of_stock'])
@@ -348,6 +488,61 @@ def manager_fulfilment():
                          urgent_products=urgent_products)
 
 
+@app.route('/manager/brands', methods=['GET', 'POST'])
+@login_required
+def manager_brands():
+    """Manage the brand registry (brands, employees, products)."""
+    if request.method == 'POST':
+        action = request.form.get('action', '')
+        brand = request.form.get('brand', '').strip()
+        
+        if not brand:
+            flash('Brand is required.', 'error')
+        elif action == 'add_brand':
+            if brand_registry.add_brand(brand):
+                flash(f'Brand {brand} added.', 'success')
+            else:
+                flash(f'Brand {brand} already exists.', 'info')
+        elif action == 'add_employee':
+            employee_name = request.form.get('employee_name', '').strip()
+            if employee_name:
+                brand_registry.add_employee(employee_name, brand)
+                flash(f'{employee_name} assigned to {brand}.', 'success')
+            else:
+                flash('Employee name is required.', 'error')
+        elif action == 'add_product':
+            product = request.form.get('product', '').strip()
+            if not product:
+                flash('Product is required.', 'error')
+            elif brand_registry.add_product(brand, product):
+                flash(f'Product {product} added to {brand}.', 'success')
+            else:
+                flash(f'Product {product} already exists for {brand}.', 'info')
+        
+        return redirect(url_for('manager_brands'))
+    
+    return render_template('brands.html',
+                         brands=brand_registry.brands(),
+                         employee_brand_map=brand_registry.employee_brand_map(),
+                         brand_products_map=brand_registry.brand_products_map())
+
+
+@app.route('/manager/anomalies')
+@login_required
+def manager_anomalies():
+    """Recently flagged report values."""
+    anomalies = ReportAnomaly.query.order_by(ReportAnomaly.created_at.desc(), ReportAnomaly.id.desc())\
+        .limit(200).all()
+    return render_template('anomalies.html', anomalies=anomalies)
+
+
+@app.route('/manager/alerts')
+@login_required
+def manager_alerts():
+    """Marketplaces currently Unhealthy/Inactive, and since when."""
+    return render_template('alerts.html', alerts=current_alerts())
+
+
 # =============================================================================
 # REVENUE & COST ROUTES
 # =============================================================================
@@ -363,17 +558,24 @@ def manager_revenue_cost():
 @login_required
 def amazon_transactions_select():
     """Select brand for Amazon transactions."""
-    return render_template('amazon_select.html', brands=BRANDS)
+    return render_template('amazon_select.html', brands=brand_registry.brands())
 
 
 @app.route('/manager/amazon/<brand>')
 @login_required
+@read_replica
 def amazon_transactions(brand):
-    """View Amazon transactions for a brand."""
+    """View Amazon transactions and imported settlements for a brand."""
     transactions = AmazonTransaction.query.filter_by(brand=brand)\
         .order_by(AmazonTransaction.posted_date.desc())\
         .limit(5).all()
-    return render_template('amazon_transactions.html', brand=brand, transactions=transactions)
+    imports = SettlementImport.query.filter_by(brand=brand)\
+        .order_by(SettlementImport.end_date.desc(), SettlementImport.id.desc())\
+        .limit(50).all()
+    # Rows imported before settlement manifests belong to no import and cannot be rolled back
+    legacy_rows = AmazonTransaction.query.filter_by(brand=brand, import_id=None).count()
+    return render_template('amazon_transactions.html', brand=brand, transactions=transactions, imports=imports,
+                           legacy_rows=legacy_rows)
 
 
 @app.route('/manager/amazon/<brand>/upload', methods=['POST'])
@@ -394,147 +596,68 @@ def amazon_upload(brand):
         return redirect(url_for('amazon_transactions', brand=brand))
     
     try:
-        # Parse XML
-        tree = ET.parse(file)
-        root = tree.getroot()
-        
         bangkok_now = get_bangkok_now().replace(tzinfo=None)
-        transactions_added = 0
-        
-        # Find SettlementReport
-        for settlement in root.iter('SettlementReport'):
-            # Parse Orders
-            for order in settlement.findall('.//Order'):
-                order_id = order.findtext('AmazonOrderID', '')
-                marketplace = order.findtext('MarketplaceName', '')
-                
-                for fulfillment in order.findall('.//Fulfillment'):
-                    posted_date_str = fulfillment.findtext('PostedDate', '')
-                    posted_date = None
-                    if posted_date_str:
-                        try:
-                            posted_date = datetime.fromisoformat(posted_date_str.replace('+00:00', ''))
-                        except:
-                            pass
-                    
-                    for item in fulfillment.findall('.//Item'):
-                        sku = item.findtext('SKU', '')
-                        quantity = int(item.findtext('Quantity', '0') or 0)
-                        
-                        # Parse prices
-                        principal = shipping = tax = 0.0
-                        for component in item.findall('.//ItemPrice/Component'):
-                            comp_type = component.findtext('Type', '')
-                            amount = float(component.findtext('Amount', '0') or 0)
-                            if comp_type == 'Principal':
-                                principal = amount
-                            elif comp_type == 'Shipping':
-                                shipping = amount
-                            elif 'Tax' in comp_type and 'Facilitator' not in comp_type:
-                                tax = amount
-                        
-                        # Parse fees
-                        fba_fee = commission = other_fees = 0.0
-                        for fee in item.findall('.//ItemFees/Fee'):
-                            fee_type = fee.findtext('Type', '')
-                            amount = float(fee.findtext('Amount', '0') or 0)
-                            if 'FBA' in fee_type:
-                                fba_fee += amount
-                            elif 'Commission' in fee_type:
-                                commission += amount
-                            else:
-                                other_fees += amount
-                        
-                        total = principal + shipping + tax + fba_fee + commission + other_fees
-                        
-                        trans = AmazonTransaction(
-                            brand=brand,
-                            created_at=bangkok_now,
-                            amazon_order_id=order_id,
-                            posted_date=posted_date,
-                            transaction_type='Order',
-                            marketplace=marketplace,
-                            sku=sku,
-                            quantity=quantity,
-                            principal_amount=principal,
-                            shipping_amount=shipping,
-                            tax_amount=tax,
-                            fba_fee=fba_fee,
-                            commission_fee=commission,
-                            other_fees=other_fees,
-                            total_amount=total
-                        )
-                        db.session.add(trans)
-                        transactions_added += 1
-            
-            # Parse OtherTransaction
-            for other_trans in settlement.findall('.//OtherTransaction'):
-                trans_type = other_trans.findtext('TransactionType', '')
-                amount = float(other_trans.findtext('Amount', '0') or 0)
-                posted_date_str = other_trans.findtext('PostedDate', '')
-                posted_date = None
-                if posted_date_str:
-                    try:
-                        posted_date = datetime.fromisoformat(posted_date_str.replace('+00:00', ''))
-                    except:
-                        pass
-                
-                trans = AmazonTransaction(
-                    brand=brand,
-                    created_at=bangkok_now,
-                    amazon_order_id=other_trans.findtext('AmazonOrderID', ''),
-                    posted_date=posted_date,
-                    transaction_type='OtherTransaction',
-                    description=trans_type,
-                    total_amount=amount
-                )
-                db.session.add(trans)
-                transactions_added += 1
-            
-            # Parse AdvertisingTransactionDetails
-            for ad_trans in settlement.findall('.//AdvertisingTransactionDetails'):
-                trans_type = ad_trans.findtext('TransactionType', '')
-                amount = float(ad_trans.findtext('TransactionAmount', '0') or 0)
-                posted_date_str = ad_trans.findtext('PostedDate', '')
-                posted_date = None
-                if posted_date_str:
-                    try:
-                        posted_date = datetime.fromisoformat(posted_date_str.replace('+00:00', ''))
-                    except:
-                        pass
-                
-                trans = AmazonTransaction(
-                    brand=brand,
-                    created_at=bangkok_now,
-                    posted_date=posted_date,
-                    transaction_type='Advertising',
-                    description=trans_type,
-                    total_amount=amount
-                )
-                db.session.add(trans)
-                transactions_added += 1
-        
+        rows, manifest = parse_settlement_import(file, brand, bangkok_now)
+        settlement_import = record_import(brand, file.filename, rows, manifest, bangkok_now)
+        reconcile_transactions(brand, rows)
         db.session.commit()
-        flash(f'Successfully imported {transactions_added} transactions.', 'success')
+        flash(f'Successfully imported {settlement_import.row_count} transactions '
+              f'(settlement {settlement_import.settlement_id or "-"}, net ${settlement_import.net_total:,.2f}).',
+              'success')
+    except DuplicateSettlement as e:
+        db.session.rollback()
+        flash(str(e), 'error')
     except Exception as e:
+        db.session.rollback()
         flash(f'Error parsing XML: {str(e)}', 'error')
     
     return redirect(url_for('amazon_transactions', brand=brand))
 
 
+@app.route('/manager/amazon/<brand>/imports/<int:import_id>/rollback', methods=['POST'])
+@login_required
+def amazon_import_rollback(brand, import_id):
+    """Remove one imported settlement's transactions and manifest."""
+    settlement_import = SettlementImport.query.filter_by(id=import_id, brand=brand).first_or_404()
+    try:
+        deleted = rollback_import(settlement_import)
+        db.session.commit()
+        flash(f'Rolled back settlement {settlement_import.settlement_id or import_id}: '
+              f'removed {deleted} transactions.', 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
+    
+    return redirect(url_for('amazon_transactions', brand=brand))
+
+
+@app.errorhandler(ArchiveUnavailable)
+def archive_unavailable(error):
+    """Archived months could not be read: say so instead of returning partial data."""
+    message = f'Archived transactions are unavailable: {error}'
+    if request.path.startswith('/api/'):
+        return jsonify({'error': message}), 503
+    flash(message, 'error')
+    brand = (request.view_args or {}).get('brand')
+    return redirect(url_for('amazon_transactions', brand=brand) if brand else url_for('index'))
+
+
 @app.route('/manager/amazon/<brand>/download')
 @login_required
+@read_replica
 def amazon_download(brand):
-    """Download Amazon transactions as CSV."""
-    transactions = AmazonTransaction.query.filter_by(brand=brand)\
-        .order_by(AmazonTransaction.posted_date.desc()).all()
+    """Download Amazon transactions as CSV (including archived months)."""
+    df = transactions_frame(brand)
     
-    if not transactions:
+    if df.empty:
         flash('No data to export.', 'info')
         return redirect(url_for('amazon_transactions', brand=brand))
     
-    data = [t.to_dict() for t in transactions]
-    df = pd.DataFrame(data)
+    df = df.sort_values(['posted_date', 'id'], ascending=False, na_position='last')
+    for column in ('created_at', 'posted_date'):
+        df[column] = df[column].dt.strftime('%d/%m/%Y %H:%M:%S')
+    for column in ARCHIVE_MONEY_COLUMNS:
+        df[column] = df[column] / CENTS_PER_UNIT
     csv_data = df.to_csv(index=False)
     
     return Response(
@@ -544,15 +667,59 @@ def amazon_download(brand):
     )
 
 
+@app.route('/manager/amazon/<brand>/orders')
+@login_required
+@read_replica
+def amazon_orders(brand):
+    """Order lookup and orders with anomalous net amounts."""
+    order_id = request.args.get('order_id', '').strip()
+    order_rows = summary = None
+    if order_id:
+        frame = order_transactions(brand, order_id)
+        summary = summarize_order(frame)
+        for column in ARCHIVE_MONEY_COLUMNS:
+            frame[column] = frame[column] / CENTS_PER_UNIT
+        order_rows = frame.astype(object).where(frame.notna(), None).to_dict('records')
+    anomalies, stats = anomalous_orders(brand)
+    return render_template('amazon_orders.html', brand=brand, order_id=order_id,
+                           order_rows=order_rows, summary=summary, anomalies=anomalies, stats=stats)
+
+
+def ad_spend_args(args):
+    """period (day/week) and gap thresholds from query args, defaulting to the config."""
+    period = args.get('period', 'day')
+    if period not in GAP_PERIODS:
+        period = 'day'
+    amount = args.get('amount', type=float)
+    percent = args.get('percent', type=float)
+    return {
+        'period': period,
+        'amount': app.config['AD_SPEND_GAP_AMOUNT'] if amount is None else amount,
+        'percent': app.config['AD_SPEND_GAP_PERCENT'] if percent is None else percent
+    }
+
+
+@app.route('/manager/amazon/<brand>/ad-spend')
+@login_required
+@read_replica
+def amazon_ad_spend(brand):
+    """Employee-reported ad spend against settled Advertising charges."""
+    options = ad_spend_args(request.args)
+    gaps = ad_spend_gaps(brand, **options)
+    return render_template('amazon_ad_spend.html', brand=brand, gaps=gaps,
+                           flagged=sum(1 for gap in gaps if gap['flagged']), **options)
+
+
 @app.route('/manager/shipment')
 @login_required
 def shipment_cost_select():
     """Select brand for shipment costs."""
-    return render_template('shipment_select.html', brands=BRANDS)
+    return render_template('shipment_select.html', brands=brand_registry.brands())
 
 
 @app.route('/manager/shipment/<brand>')
 @login_required
+@read_replica
 def shipment_cost(brand):
     """View shipment costs for a brand."""
     costs = ShipmentCost.query.filter_by(brand=brand)\
@@ -574,7 +741,7 @@ def shipment_submit(brand):
             cost_date=cost_date,
             product=request.form.get('product', '').strip(),
             cost_type=request.form.get('cost_type', ''),
-            total_amount=float(request.form.get('total_amount', 0) or 0)
+            total_amount=parse_amount(request.form.get('total_amount'))
         )
         
         db.session.add(cost)
@@ -588,6 +755,7 @@ def shipment_submit(brand):
 
 @app.route('/manager/shipment/<brand>/download')
 @login_required
+@read_replica
 def shipment_download(brand):
     """Download shipment costs as CSV."""
     costs = ShipmentCost.query.filter_by(brand=brand)\
@@ -610,6 +778,7 @@ def shipment_download(brand):
 
 @app.route('/manager/export/csv')
 @login_required
+@read_replica
 def export_csv():
     """Export all data as CSV."""
     # Query all reports sorted by date_report (user-entered date)
@@ -674,15 +843,335 @@ def export_csv():
     )
 
 
+# =============================================================================
+# JSON API ROUTES (read-only)
+# =============================================================================
+
+def coalesced_json(compute):
+    """Serve compute() as JSON, shared between identical concurrent requests."""
+    key = (request.path, tuple(sorted(request.args.items(multi=True))))
+    return jsonify(api_coalescer.get(key, compute))
+
+
+def charts_to_dict(charts_json):
+    """Decode the chart JSON strings built for templates."""
+    return {name: json.loads(chart) for name, chart in charts_json.items()}
+
+
+@app.route('/api/reports/daily')
+@api_login_required
+@read_replica
+def api_daily_reports():
+    """Reports and chart data for one date_report (YYYY-MM-DD)."""
+    date_str = request.args.get('date', '').strip()
+    try:
+        datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    
+    def compute():
+        reports = DailyReport.query.filter_by(date_report=date_str)\
+            .order_by(DailyReport.created_at.desc()).all()
+        report_store.refresh()
+        df = report_store.frame(report_store.rows_where('date_report', date_str))
+        return {
+            'date': date_str,
+            'reports': [r.to_dict() for r in reports],
+            'charts': charts_to_dict(generate_daily_charts(df)) if reports else {}
+        }
+    
+    return coalesced_json(compute)
+
+
+@app.route('/api/reports/brand/<brand>')
+@api_login_required
+@read_replica
+def api_brand_charts(brand):
+    """Trend chart data for one brand."""
+    def compute():
+        report_store.refresh()
+        df = report_store.frame(report_store.brand_rows(brand))
+        return {
+            'brand': brand,
+            'charts': charts_to_dict(generate_brand_charts(df, brand, get_brand_daily_metrics(brand)))
+            if not df.empty else {}
+        }
+    
+    return coalesced_json(compute)
+
+
+@app.route('/api/portfolio')
+@api_login_required
+@read_replica
+def api_portfolio():
+    """Cross-brand KPIs as aligned arrays."""
+    start_date, end_date = parse_date_range_args(request.args)
+    return coalesced_json(lambda: portfolio_kpis(start_date, end_date))
+
+
+@app.route('/api/amazon/<brand>/ad-spend')
+@api_login_required
+@read_replica
+def api_amazon_ad_spend(brand):
+    """Reported vs settled ad spend per day or week, with gaps flagged."""
+    options = ad_spend_args(request.args)
+    return coalesced_json(lambda: {'brand': brand, **options, 'periods': ad_spend_gaps(brand, **options)})
+
+
+@app.route('/api/admission')
+@api_login_required
+def admission_stats():
+    """Admission and shed counts for this worker (for monitoring)."""
+    if admission is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, 'pid': os.getpid(), **admission.stats()})
+
+
+@app.route('/api/pivot')
+@api_login_required
+@read_replica
+def api_pivot():
+    """Grouped report metrics: ?dims=brand,month&metrics=new_orders:sum,acos:avg.
+    
+    Optional brand/product/employee filters, start/end dates and limit.
+    """
+    start_date, end_date = parse_date_range_args(request.args)
+    filters = {dimension: request.args.get(dimension, '').strip() for dimension in COLUMN_DIMENSIONS}
+    try:
+        spec = parse_spec(request.args.get('dims', ''), request.args.get('metrics', ''), filters,
+                          start_date, end_date, request.args.get('limit', type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(pivot_cache.get((spec, data_version()), lambda: run_pivot(spec)))
+
+
+@app.route('/api/pivot/schema')
+@api_login_required
+def api_pivot_schema():
+    """Dimensions, metric fields and aggregators the pivot API accepts."""
+    return jsonify({
+        'dimensions': list(DIMENSIONS),
+        'filters': list(COLUMN_DIMENSIONS),
+        'fields': list(METRIC_FIELDS),
+        'aggregators': list(AGGREGATORS),
+        'row_count': ROW_COUNT
+    })
+
+
+@app.route('/api/amazon/<brand>/summary')
+@api_login_required
+@read_replica
+def api_amazon_summary(brand):
+    """Amazon transaction totals per transaction type (including archived months)."""
+    def compute():
+        totals = transaction_type_totals(brand)
+        rows = totals[['transaction_type', 'count', 'principal_amount', 'fba_fee', 'commission_fee',
+                       'other_fees', 'total_amount']].itertuples(index=False)
+        return {
+            'brand': brand,
+            'types': [{
+                'transaction_type': t,
+                'count': int(count),
+                'principal_amount': principal / CENTS_PER_UNIT,
+                'fba_fee': fba_fee / CENTS_PER_UNIT,
+                'commission_fee': commission / CENTS_PER_UNIT,
+                'other_fees': other_fees / CENTS_PER_UNIT,
+                'total_amount': total / CENTS_PER_UNIT
+            } for t, count, principal, fba_fee, commission, other_fees, total in rows]
+        }
+    
+    return coalesced_json(compute)
+
+
+def ledger_json(values):
+    """JSON-safe copy of a ledger row: rounded amounts, ISO dates."""
+    values = dict(values)
+    for key in ('first_posted', 'last_posted'):
+        values[key] = values[key].isoformat() if pd.notna(values[key]) else None
+    for key, value in values.items():
+        if isinstance(value, float):
+            values[key] = round(value, 2)
+    return values
+
+
+@app.route('/api/amazon/<brand>/orders/<order_id>')
+@api_login_required
+@read_replica
+def api_amazon_order(brand, order_id):
+    """All transactions of one order (including archived months) and its net."""
+    frame = order_transactions(brand, order_id)
+    if frame.empty:
+        return jsonify({'error': 'order not found'}), 404
+    
+    summary = ledger_json(summarize_order(frame))
+    for column in ARCHIVE_MONEY_COLUMNS:
+        frame[column] = frame[column] / CENTS_PER_UNIT
+    for column in ('created_at', 'posted_date'):
+        frame[column] = frame[column].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    frame = frame.astype(object).where(frame.notna(), None)
+    return jsonify({
+        'brand': brand,
+        'order_id': order_id,
+        'summary': summary,
+        'transactions': frame.to_dict('records')
+    })
+
+
+@app.route('/api/amazon/<brand>/reconciliation')
+@api_login_required
+@read_replica
+def api_amazon_reconciliation(brand):
+    """Orders with a negative or outlying net (?limit=, ?deviations=)."""
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    deviations = request.args.get('deviations', 3.0, type=float)
+    
+    def compute():
+        orders, stats = anomalous_orders(brand, limit=limit, deviations=deviations)
+        return {'brand': brand, 'stats': stats, 'orders': [ledger_json(order) for order in orders]}
+    
+    return coalesced_json(compute)
+
+
+@app.route('/api/shipment/<brand>/summary')
+@api_login_required
+@read_replica
+def api_shipment_summary(brand):
+    """Shipment cost totals per cost type."""
+    def compute():
+        rows = db.session.query(
+            ShipmentCost.cost_type,
+            func.count(ShipmentCost.id),
+            func.sum(ShipmentCost.total_amount)
+        ).filter(ShipmentCost.brand == brand)\
+            .group_by(ShipmentCost.cost_type)\
+            .all()
+        return {
+            'brand': brand,
+            'types': [{
+                'cost_type': cost_type,
+                'count': count,
+                'total_amount': as_float(total or 0)
+            } for cost_type, count, total in rows]
+        }
+    
+    return coalesced_json(compute)
+
+
+# =============================================================================
+# CLI COMMANDS
+# =============================================================================
+
+@app.cli.command('recompute-metrics')
+def recompute_metrics_command():
+    """Rebuild daily deltas and rolling sums for every brand."""
+    count = refresh_all_metrics()
+    click.echo(f'Recomputed metrics for {count} brands.')
+
+
+@app.cli.command('scan-anomalies')
+def scan_anomalies_command():
+    """Rebuild report statistics and anomaly flags from history."""
+    count = scan_history()
+    click.echo(f'Flagged {count} suspicious values.')
+
+
+@app.cli.command('backfill-status-events')
+def backfill_status_events_command():
+    """Rebuild account/store status change events from history."""
+    count = rebuild_status_events()
+    db.session.commit()
+    click.echo(f'Recorded {count} status events.')
+
+
+@app.cli.command('reconcile-ad-spend')
+def reconcile_ad_spend_command():
+    """Rebuild reported vs settled ad spend for every brand."""
+    brands, rows = reconcile_all()
+    click.echo(f'Reconciled {rows} brand-days across {brands} brands.')
+
+
+@app.cli.command('archive-transactions')
+@click.option('--hot-months', type=int, default=None,
+              help='Previous months to keep in the database (default ARCHIVE_HOT_MONTHS).')
+def archive_transactions_command(hot_months):
+    """Move closed months of Amazon transactions to Parquet files."""
+    try:
+        archived = archive_closed_months(hot_months)
+    except ArchiveUnavailable as e:
+        raise click.ClickException(str(e))
+    for month, rows in archived.items():
+        click.echo(f'{month}: archived {rows} transactions')
+    click.echo(f'Archived {len(archived)} months.')
+
+
+@app.cli.command('partition-transactions')
+@click.option('--months-ahead', default=12, show_default=True, help='Future monthly partitions to create.')
+def partition_transactions_command(months_ahead):
+    """Partition amazon_transactions by posted_date month (PostgreSQL only)."""
+    if db.engine.dialect.name != 'postgresql':
+        click.echo('Native partitioning needs PostgreSQL; on SQLite use archive-transactions '
+                   'with the (brand, posted_date) index instead.')
+        return
+    created = partition_transactions(months_ahead)
+    click.echo(f'Created {len(created)} partitions.')
+
+
+@app.cli.command('build-assets')
+@click.option('--refresh', is_flag=True, help='Download the vendored libraries again.')
+@click.option('--offline', is_flag=True, help='Use only files already in static/vendor/.')
+def build_assets_command(refresh, offline):
+    """Vendor, fingerprint and precompress static assets into static/dist/."""
+    manifest = build_assets(refresh=refresh, offline=offline)
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f'{name} -> {hashed}')
+    for name in sorted(set(VENDOR_ASSETS) - set(manifest)):
+        click.echo(f'{name} -> {VENDOR_ASSETS[name]} (not vendored, served from the CDN)')
+    click.echo(f'Built {len(manifest)} assets.')
+
+
+@app.cli.command('bulk-load')
+@click.argument('table', type=click.Choice(sorted(BULK_TABLES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True,
+              help='Rows validated and written per transaction.')
+def bulk_load_command(table, path, chunk_size):
+    """Load historical rows from a CSV or Parquet file into TABLE."""
+    try:
+        stats = load_file(table, path, chunk_size)
+    except AlreadyLoaded as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Read {stats.read} rows: loaded {stats.loaded}, rejected {stats.rejected}, '
+               f'skipped {stats.duplicates} duplicates in {stats.seconds:.1f}s ({stats.rate:,.0f} rows/s).')
+    if stats.rejected:
+        click.echo(f'Rejected rows and reasons: {path}.rejected.csv')
+    
+    if table == 'daily_reports' and stats.loaded:
+        # Derived tables for the loaded history
+        for brand in sorted(stats.brands):
+            brand_registry.add_brand(brand)
+            refresh_brand_metrics(brand)
+            reconcile_brand(brand)
+        rebuild_status_events()
+        db.session.commit()
+        click.echo(f'Refreshed metrics for {len(stats.brands)} brands and rebuilt status events; '
+                   f'run "flask scan-anomalies" to rebuild anomaly flags.')
+    elif table == 'amazon_transactions' and stats.loaded:
+        for brand in sorted(stats.brands):
+            reconcile_brand(brand)
+        db.session.commit()
+        click.echo(f'Reconciled ad spend for {len(stats.brands)} brands.')
+
+
 # =============================================================================
 # CHART GENERATION FUNCTIONS
 # =============================================================================
 
-def generate_daily_charts(reports):
-    """Generate bar charts for daily report aggregated by brand."""
-    # Convert reports to DataFrame
-    data = [r.to_dict() for r in reports]
-    df = pd.DataFrame(data)
+def generate_daily_charts(df):
+    """Generate bar charts for daily report aggregated by brand.
+    
+    df holds one row per report (see ReportColumnStore.frame).
+    """
     
     # Aggregate by brand (Balance, ACOS, Ads Spend are brand-level)
     agg_df = df.groupby('brand').agg({
@@ -692,6 +1181,7 @@ def generate_daily_charts(reports):
         'ads_sales_today': 'sum',
         'acos': 'first'  # Same for all products in brand
     }).reset_index()
+    cents_to_units(agg_df)
     
     charts = {}
     
@@ -761,11 +1251,19 @@ def generate_daily_charts(reports):
     return charts
 
 
-def generate_brand_charts(reports, brand):
-    """Generate line charts for brand trends over time."""
-    # Convert reports to DataFrame
-    data = [r.to_dict() for r in reports]
-    df = pd.DataFrame(data)
+def get_brand_daily_metrics(brand):
+    """Stored per-day derived metrics for a brand, oldest first."""
+    return BrandDailyMetrics.query.filter_by(brand=brand)\
+        .order_by(BrandDailyMetrics.date_report)\
+        .all()
+
+
+def generate_brand_charts(df, brand, daily_metrics=None):
+    """Generate line charts for brand trends over time.
+    
+    df holds one row per report (see ReportColumnStore.frame).
+    """
+    df = df.sort_values(['date_report', 'id'])
     
     # Convert date_report to datetime for proper sorting (date_report is YYYY-MM-DD from HTML5 date picker)
     df['date'] = pd.to_datetime(df['date_report'], format='%Y-%m-%d', errors='coerce')
@@ -779,7 +1277,7 @@ def generate_brand_charts(reports, brand):
         'acos': 'first'  # Brand-level value
     }).reset_index()
     
-    agg_df = agg_df.sort_values('date')
+    agg_df = cents_to_units(agg_df.sort_values('date'))
     agg_df['date_str'] = agg_df['date'].dt.strftime('%d/%m/%Y')
     
     charts = {}
@@ -843,6 +1341,33 @@ def generate_brand_charts(reports, brand):
     )
     charts['acos'] = json.dumps(fig4, cls=plotly.utils.PlotlyJSONEncoder)
     
+    # Daily Ads Spend / Sales (deltas of the running totals, precomputed)
+    if daily_metrics:
+        daily_df = pd.DataFrame([{
+            'date': datetime.strptime(m.date_report, '%Y-%m-%d'),
+            'Ads Spend': as_float(m.ads_spend_delta),
+            'Ads Sales': as_float(m.ads_sales_delta),
+            'Ads Spend (7 days)': as_float(m.ads_spend_7d)
+        } for m in daily_metrics])
+        daily_df['date_str'] = daily_df['date'].dt.strftime('%d/%m/%Y')
+        
+        fig_daily = px.bar(daily_df, x='date_str', y=['Ads Spend', 'Ads Sales'],
+                           title=f'{brand} - Daily Ads Spend & Sales ($)',
+                           barmode='group',
+                           color_discrete_sequence=['#ffd93d', '#3498db'])
+        fig_daily.add_scatter(x=daily_df['date_str'], y=daily_df['Ads Spend (7 days)'],
+                              name='Ads Spend (7 days)', mode='lines',
+                              line=dict(color='#ff6b6b'))
+        fig_daily.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font_color='#ffffff',
+            xaxis_title='Date',
+            yaxis_title='Amount ($)',
+            legend_title_text=''
+        )
+        charts['ads_daily'] = json.dumps(fig_daily, cls=plotly.utils.PlotlyJSONEncoder)
+    
     # Main Niche Ranking - prepare table data
     if 'product' in df.columns and df['product'].nunique() > 1:
         # Multiple products - show table with product breakdown
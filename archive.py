@@ -0,0 +1,390 @@
+"""Monthly archival of amazon_transactions to compressed Parquet files.
+
+Closed months (posted_date before the hot window) are written to one
+Parquet file per month under ARCHIVE_DIR, recorded in transaction_archives
+and removed from the table, so everyday queries only touch recent rows.
+transactions_frame() and transaction_type_totals() read the table and the
+archived months together for the download and summary paths. Amounts are
+integer cents in the frames and the Parquet files, as in the table.
+
+ARCHIVE_DIR must be set to persistent storage (not the app directory,
+which is replaced on every deploy); archiving refuses to run without it,
+and reads raise ArchiveUnavailable when a recorded file cannot be found.
+Archivers hold a lock file in ARCHIVE_DIR while they write, and only they
+finish or discard the .pending files a run leaves behind; readers never
+touch them.
+
+On PostgreSQL, partition_transactions() turns amazon_transactions into a
+table partitioned by posted_date month; archiving a month then detaches
+and drops its partition instead of deleting rows.
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+from datetime import date
+
+import pandas as pd
+import pyarrow.parquet as pq
+from flask import current_app
+from sqlalchemy import func, inspect, select, text
+
+from models import db, AmazonTransaction, ArchivedOrder, TransactionArchive, get_bangkok_now, upsert
+from money import CENTS_PER_UNIT, Cents, cents, from_cents
+
+TABLE = AmazonTransaction.__tablename__
+DEFAULT_PARTITION = f'{TABLE}_default'
+LOCK_FILE = '.archive.lock'
+PENDING = '.pending'
+
+AMOUNT_COLUMNS = ('principal_amount', 'fba_fee', 'commission_fee', 'other_fees', 'total_amount')
+
+# Every Cents column, read as raw integer cents
+MONEY_COLUMNS = tuple(column.name for column in AmazonTransaction.__table__.columns
+                      if isinstance(column.type, Cents))
+
+
+class ArchiveUnavailable(RuntimeError):
+    """ARCHIVE_DIR is not configured, or an archived month's file is missing."""
+
+
+def _month_start(month):
+    year, month_number = (int(part) for part in month.split('-'))
+    return date(year, month_number, 1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def _partition_name(month):
+    return f'{TABLE}_{month.replace("-", "_")}'
+
+
+def _archive_dir():
+    archive_dir = current_app.config['ARCHIVE_DIR']
+    if not archive_dir:
+        raise ArchiveUnavailable('ARCHIVE_DIR is not set; point it at persistent storage for the '
+                                 'archived Parquet files.')
+    return archive_dir
+
+
+def _archive_path(filename):
+    return os.path.join(_archive_dir(), filename)
+
+
+@contextmanager
+def _archive_lock():
+    """Hold the archiver lock (a lock file in ARCHIVE_DIR) for one write."""
+    os.makedirs(_archive_dir(), exist_ok=True)
+    with open(_archive_path(LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _is_committed(manifest, pending):
+    """Whether a pending file belongs to a committed archive run.
+
+    The manifest's row_count is committed together with the row delete, so
+    a pending file with that many rows was written by a run that committed.
+    """
+    return manifest is not None and pq.ParquetFile(pending).metadata.num_rows == manifest.row_count
+
+
+def _settle_pending(manifest, path):
+    """Finish or discard a file archive_month() wrote before its commit; hold _archive_lock()."""
+    pending = path + PENDING
+    if not os.path.exists(pending):
+        return
+    if _is_committed(manifest, pending):
+        os.replace(pending, path)
+    else:
+        os.remove(pending)
+
+
+def settle_pending_archives():
+    """Settle the pending files of every archived month (after a crashed run). Returns the count."""
+    settled = 0
+    with _archive_lock():
+        for manifest in TransactionArchive.query:
+            path = _archive_path(manifest.filename)
+            if os.path.exists(path + PENDING):
+                _settle_pending(manifest, path)
+                settled += 1
+    return settled
+
+
+def hot_cutoff(hot_months=None):
+    """First day of the oldest month kept in the database."""
+    if hot_months is None:
+        hot_months = current_app.config['ARCHIVE_HOT_MONTHS']
+    today = get_bangkok_now().date()
+    year, month = divmod(today.year * 12 + today.month - 1 - hot_months, 12)
+    return date(year, month + 1, 1)
+
+
+def months_to_archive(cutoff):
+    """'YYYY-MM' months that still have rows in the table before cutoff."""
+    month = func.strftime('%Y-%m', AmazonTransaction.posted_date) \
+        if db.engine.dialect.name == 'sqlite' \
+        else func.to_char(AmazonTransaction.posted_date, 'YYYY-MM')
+    rows = db.session.query(month).filter(AmazonTransaction.posted_date < cutoff)\
+        .distinct().order_by(month).all()
+    return [row[0] for row in rows]
+
+
+def _table_frame(*criteria):
+    table = AmazonTransaction.__table__
+    rows = db.session.execute(select(*[
+        cents(column).label(column.name) if column.name in MONEY_COLUMNS else column
+        for column in table.columns
+    ]).where(*criteria)).all()
+    frame = pd.DataFrame(rows, columns=[column.name for column in table.columns])
+    for column in ('quantity', 'import_id', *MONEY_COLUMNS):
+        frame[column] = frame[column].astype('Int64')
+    for column in ('created_at', 'posted_date'):
+        frame[column] = pd.to_datetime(frame[column])
+    return frame
+
+
+def _is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table"
+    ), {'table': TABLE}).scalar())
+
+
+def _write_parquet(frame, path):
+    # Write next to the target and rename, so a crash never leaves half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame.to_parquet(path + '.tmp', index=False, compression='zstd')
+    os.replace(path + '.tmp', path)
+
+
+def archive_month(month):
+    """Move one month of transactions to its Parquet file. Returns rows archived.
+
+    Rows that arrive for a month after it was archived (late settlements)
+    are merged into the existing file the next time it is archived. The
+    new file is written as <file>.pending and only replaces the old one
+    once the row delete has committed, so a failed commit leaves the rows
+    in the table and the file as it was. Runs under the archiver lock.
+    """
+    with _archive_lock():
+        return _archive_month(month)
+
+
+def _archive_month(month):
+    filename = f'{TABLE}_{month}.parquet'
+    path = _archive_path(filename)
+    start = _month_start(month)
+    end = _next_month(start)
+    in_month = (AmazonTransaction.posted_date >= start, AmazonTransaction.posted_date < end)
+
+    frame = _table_frame(*in_month)
+    moved = len(frame)
+    if not moved:
+        return 0
+    record_archived_orders(frame)
+
+    manifest = TransactionArchive.query.filter_by(month=month).first()
+    _settle_pending(manifest, path)
+    if manifest is not None:
+        frame = pd.concat([_read_archive(manifest), frame], ignore_index=True)
+
+    _write_parquet(frame.sort_values('id'), path + PENDING)
+
+    if manifest is None:
+        manifest = TransactionArchive(month=month, filename=filename,
+                                      archived_at=get_bangkok_now().replace(tzinfo=None))
+        db.session.add(manifest)
+    manifest.row_count = len(frame)
+    manifest.total_amount = from_cents(frame['total_amount'].fillna(0).sum())
+    manifest.updated_at = get_bangkok_now().replace(tzinfo=None)
+
+    partition = _partition_name(month)
+    if _is_partitioned() and inspect(db.engine).has_table(partition):
+        # Late rows in the default partition were copied above as well
+        db.session.execute(text(f'ALTER TABLE {TABLE} DETACH PARTITION {partition}'))
+        db.session.execute(text(f'DROP TABLE {partition}'))
+    AmazonTransaction.query.filter(*in_month).delete(synchronize_session=False)
+
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(path + PENDING)
+        raise
+    os.replace(path + PENDING, path)
+    return moved
+
+
+def archive_closed_months(hot_months=None):
+    """Archive every month older than the hot window. Returns {month: rows}."""
+    settle_pending_archives()
+    return {month: archive_month(month) for month in months_to_archive(hot_cutoff(hot_months))}
+
+
+def _read_archive(manifest, filters=None, columns=None):
+    """Read an archived month without changing its files.
+
+    Between an archive run's commit and its rename (or after a crash there)
+    the committed rows are in the pending file, so that is read instead.
+    """
+    path = _archive_path(manifest.filename)
+    pending = path + PENDING
+    for candidate in (pending, path):
+        try:
+            if candidate == pending and not _is_committed(manifest, pending):
+                continue
+            return pd.read_parquet(candidate, filters=filters, columns=columns)
+        except FileNotFoundError:
+            # The archiver renamed the pending file meanwhile; read the file it became
+            continue
+    raise ArchiveUnavailable(f'The archive of {manifest.month} ({manifest.row_count} transactions) '
+                             f'is missing from ARCHIVE_DIR.')
+
+
+def _archived_frames(brand, order_id=None):
+    filters = [('brand', '==', brand)]
+    if order_id is not None:
+        filters.append(('amazon_order_id', '==', order_id))
+    for manifest in TransactionArchive.query.order_by(TransactionArchive.month):
+        yield _read_archive(manifest, filters)
+
+
+def record_archived_orders(frame):
+    """Add the orders of rows being archived to archived_orders; the caller commits."""
+    orders = frame[['brand', 'amazon_order_id']].dropna()
+    orders = orders[orders['amazon_order_id'] != ''].drop_duplicates()
+    upsert(ArchivedOrder, orders.to_dict('records'), keys=('brand', 'amazon_order_id'))
+    return len(orders)
+
+
+def index_archived_orders():
+    """Fill archived_orders from the existing archive files (migration 0009). Returns the orders."""
+    recorded = 0
+    for manifest in TransactionArchive.query.order_by(TransactionArchive.month):
+        recorded += record_archived_orders(_read_archive(manifest, columns=['brand', 'amazon_order_id']))
+    return recorded
+
+
+def transactions_frame(brand, order_id=None):
+    """A brand's transactions, or one order's: table rows plus archived months."""
+    criteria = [AmazonTransaction.brand == brand]
+    if order_id is not None:
+        criteria.append(AmazonTransaction.amazon_order_id == order_id)
+    frames = [_table_frame(*criteria), *_archived_frames(brand, order_id)]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return _table_frame(*criteria)
+    return pd.concat(frames, ignore_index=True)
+
+
+def transaction_type_totals(brand):
+    """Count and amount sums (in cents) per transaction type, table and archive combined."""
+    rows = db.session.query(
+        AmazonTransaction.transaction_type,
+        func.count(AmazonTransaction.id).label('count'),
+        *[func.sum(cents(getattr(AmazonTransaction, column))).label(column) for column in AMOUNT_COLUMNS]
+    ).filter(AmazonTransaction.brand == brand)\
+        .group_by(AmazonTransaction.transaction_type)\
+        .all()
+    totals = pd.DataFrame(rows, columns=['transaction_type', 'count', *AMOUNT_COLUMNS])
+
+    for frame in _archived_frames(brand):
+        if frame.empty:
+            continue
+        archived = frame.groupby('transaction_type').agg(
+            count=('id', 'count'), **{column: (column, 'sum') for column in AMOUNT_COLUMNS}
+        ).reset_index()
+        totals = pd.concat([totals, archived], ignore_index=True)
+
+    if totals.empty:
+        return totals
+    totals = totals.fillna({column: 0 for column in AMOUNT_COLUMNS})\
+        .groupby('transaction_type', as_index=False).sum()
+    return totals.astype({column: 'int64' for column in AMOUNT_COLUMNS})
+
+
+def archive_amounts_to_cents():
+    """Rewrite archive files that still hold float amounts with integer cents.
+
+    Files written before amounts were stored as cents; used by migration
+    0006. Returns the number of files rewritten.
+    """
+    rewritten = 0
+    manifests = TransactionArchive.query.order_by(TransactionArchive.month).all()
+    if not manifests:
+        return rewritten
+    with _archive_lock():
+        for manifest in manifests:
+            path = _archive_path(manifest.filename)
+            if not os.path.exists(path):
+                continue
+            frame = pd.read_parquet(path)
+            floats = [column for column in MONEY_COLUMNS if column in frame and frame[column].dtype.kind == 'f']
+            if not floats:
+                continue
+            for column in floats:
+                frame[column] = (frame[column] * CENTS_PER_UNIT).round().astype('Int64')
+            _write_parquet(frame, path)
+            rewritten += 1
+    return rewritten
+
+
+def partition_transactions(months_ahead=12, oldest=None):
+    """Convert amazon_transactions to monthly RANGE partitions (PostgreSQL).
+
+    Safe to re-run: it only adds the missing monthly partitions, from the
+    oldest row (or the given oldest datetime, for a table about to be
+    filled) up to months_ahead months from now, moving rows out of the
+    default partition where needed. Returns the partitions created.
+    """
+    if not _is_partitioned():
+        db.session.execute(text(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned'))
+        # The parent can't have a primary key without posted_date in it;
+        # partitions get an index on id instead
+        db.session.execute(text(
+            f'CREATE TABLE {TABLE} (LIKE {TABLE}_unpartitioned INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (posted_date)'
+        ))
+        db.session.execute(text(f'ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id'))
+        db.session.execute(text(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT'))
+        db.session.execute(text(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_unpartitioned'))
+        db.session.execute(text(f'DROP TABLE {TABLE}_unpartitioned'))
+        db.session.execute(text(f'CREATE INDEX ix_{TABLE}_id ON {TABLE} (id)'))
+        db.session.execute(text(f'CREATE INDEX ix_{TABLE}_brand ON {TABLE} (brand)'))
+        db.session.execute(text(f'CREATE INDEX ix_amazon_tx_brand_posted ON {TABLE} (brand, posted_date)'))
+        db.session.execute(text(f'CREATE INDEX ix_amazon_tx_brand_order ON {TABLE} (brand, amazon_order_id)'))
+
+    # rollback_import deletes by import_id; IF NOT EXISTS also repairs tables partitioned without it
+    db.session.execute(text(f'CREATE INDEX IF NOT EXISTS ix_amazon_tx_import ON {TABLE} (import_id)'))
+
+    stored = db.session.query(func.min(AmazonTransaction.posted_date)).scalar()
+    oldest = min(filter(None, (oldest, stored)), default=None)
+    month = (oldest.date() if oldest else get_bangkok_now().date()).replace(day=1)
+    last = hot_cutoff(-months_ahead)  # First day of the month months_ahead from now
+
+    archived = {manifest.month for manifest in TransactionArchive.query}
+    created = []
+    while month <= last:
+        name = _partition_name(month.strftime('%Y-%m'))
+        if month.strftime('%Y-%m') not in archived and not inspect(db.engine).has_table(name):
+            start, end = month.isoformat(), _next_month(month).isoformat()
+            in_range = f"posted_date >= '{start}' AND posted_date < '{end}'"
+            db.session.execute(text(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)'))
+            db.session.execute(text(f'INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}'))
+            db.session.execute(text(f'DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}'))
+            db.session.execute(text(
+                f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+            created.append(name)
+        month = _next_month(month)
+
+    db.session.commit()
+    return created
@@ -0,0 +1,214 @@
+"""Self-hosted, fingerprinted and precompressed static assets.
+
+`flask build-assets` downloads the vendored libraries into static/vendor/,
+then copies them and the local assets into static/dist/ under content-hashed
+names (style.3f2a9c1b04de.css), with .gz and .br variants for text files,
+and records name → hashed file in static/dist/manifest.json. The Procfile
+runs it before gunicorn on every deploy.
+
+The vendored libraries are not committed (static/vendor/ is gitignored),
+so they come from the CDN at build time. A library that cannot be
+downloaded is logged and skipped: the local assets are still built, and
+that library keeps loading from its CDN URL. That CDN fallback is the
+offline behaviour; an air-gapped install must copy the files into
+static/vendor/ and build with --offline to serve them itself.
+
+Templates call asset_url(name). With a manifest it points at /assets/, which
+serves the hashed file (precompressed when the browser accepts it) with an
+immutable one-year Cache-Control and Range support; without one, vendored
+libraries fall back to their CDN URL and local files to /static/.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import urllib.error
+import urllib.request
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped without the brotli package
+    brotli = None
+
+# Vendored libraries: local name → CDN URL (also the fallback before a build)
+VENDOR_ASSETS = {
+    'bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+    'bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+    'plotly.min.js': 'https://cdn.plot.ly/plotly-2.27.0.min.js',
+    # Partial bundle with the scatter, bar and pie traces (the charts use bar and scatter)
+    'plotly-basic.min.js': 'https://cdn.plot.ly/plotly-basic-2.27.0.min.js',
+}
+
+# Files under static/ that are fingerprinted alongside the vendored ones
+LOCAL_ASSETS = ('css/style.css', 'video_motion.mp4')
+
+# Text types worth precompressing; media such as the MP4 is already compressed
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json')
+
+# Browser-preferred encodings, best first, with the variant suffix on disk
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+HASH_LENGTH = 12
+ONE_YEAR = 365 * 24 * 3600
+VENDOR_DIR = 'vendor'
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+
+_manifest = {'mtime': None, 'entries': {}}
+
+
+def _static_path(*parts):
+    return os.path.join(current_app.static_folder, *parts)
+
+
+def _fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def _hashed_name(name, fingerprint):
+    stem, suffix = os.path.splitext(name)
+    if stem.endswith('.min'):
+        stem, suffix = stem[:-4], '.min' + suffix
+    return f'{stem}.{fingerprint}{suffix}'
+
+
+def download_vendor_assets(refresh=False):
+    """Fetch the vendored libraries into static/vendor/; returns the names downloaded.
+
+    A file that cannot be downloaded is logged and skipped (it stays on the
+    CDN), so one unreachable host does not stop the build.
+    """
+    os.makedirs(_static_path(VENDOR_DIR), exist_ok=True)
+    downloaded = []
+    for name, url in VENDOR_ASSETS.items():
+        path = _static_path(VENDOR_DIR, name)
+        if os.path.exists(path) and not refresh:
+            continue
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response, open(path + '.tmp', 'wb') as f:
+                shutil.copyfileobj(response, f)
+        except (urllib.error.URLError, OSError) as e:
+            current_app.logger.warning('Could not download %s from %s (%s); it is served from the CDN.',
+                                       name, url, e)
+            if os.path.exists(path + '.tmp'):
+                os.remove(path + '.tmp')
+            continue
+        os.replace(path + '.tmp', path)
+        downloaded.append(name)
+    return downloaded
+
+
+def _write_variants(path):
+    """Write .gz (and .br when brotli is installed) next to a hashed file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    # mtime=0 keeps the .gz byte-identical across builds
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_assets(refresh=False, offline=False):
+    """Download, fingerprint and precompress every asset, then write the manifest.
+
+    Returns the manifest (name → hashed path under static/dist/). Vendored
+    files that are missing, offline or after a failed download, are left to
+    their CDN fallback.
+    """
+    if not offline:
+        download_vendor_assets(refresh)
+
+    sources = {name: _static_path(VENDOR_DIR, name) for name in VENDOR_ASSETS}
+    sources.update({name: _static_path(name) for name in LOCAL_ASSETS})
+
+    dist = _static_path(DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name, source in sources.items():
+        if not os.path.exists(source):
+            continue
+        hashed = _hashed_name(name, _fingerprint(source))
+        target = os.path.join(dist, hashed)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target + '.tmp')
+            os.replace(target + '.tmp', target)
+        if os.path.splitext(name)[1] in COMPRESSIBLE:
+            _write_variants(target)
+        manifest[name] = hashed.replace(os.sep, '/')
+
+    # Drop files from earlier builds; the new manifest no longer points at them
+    keep = {MANIFEST}
+    for hashed in manifest.values():
+        keep.update(hashed + suffix for suffix in ('', '.gz', '.br'))
+    for root, _, files in os.walk(dist):
+        for filename in files:
+            relative = os.path.relpath(os.path.join(root, filename), dist).replace(os.sep, '/')
+            if relative not in keep:
+                os.remove(os.path.join(root, filename))
+
+    path = os.path.join(dist, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def load_manifest():
+    """The built manifest, reloaded when build-assets rewrites it ({} before a build)."""
+    path = _static_path(DIST_DIR, MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return {}
+    if _manifest['mtime'] != mtime:
+        with open(path) as f:
+            _manifest['entries'] = json.load(f)
+        _manifest['mtime'] = mtime
+    return _manifest['entries']
+
+
+def asset_url(name):
+    """URL of an asset: the hashed build if there is one, else the CDN or /static/ copy."""
+    hashed = load_manifest().get(name)
+    if hashed:
+        return url_for('asset', filename=hashed)
+    if name in VENDOR_ASSETS:
+        return VENDOR_ASSETS[name]
+    return url_for('static', filename=name)
+
+
+def send_asset(filename):
+    """Serve a hashed file from static/dist/ with immutable caching.
+
+    Text files are sent as their .br or .gz variant when the browser accepts
+    it. Range requests (video seeking) get the identity file, which
+    send_from_directory answers with 206 partial content.
+    """
+    directory = _static_path(DIST_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding, variant = None, filename
+    if 'Range' not in request.headers and os.path.splitext(filename)[1] in COMPRESSIBLE:
+        for candidate, suffix in ENCODINGS:
+            if request.accept_encodings[candidate] and os.path.exists(os.path.join(directory, filename + suffix)):
+                encoding, variant = candidate, filename + suffix
+                break
+
+    response = send_from_directory(directory, variant, mimetype=mimetype, max_age=ONE_YEAR, conditional=True)
+    if encoding:
+        response.content_encoding = encoding
+    if os.path.splitext(filename)[1] in COMPRESSIBLE:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
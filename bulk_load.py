@@ -0,0 +1,286 @@
+"""Bulk loader for historical spreadsheets (CSV or Parquet).
+
+Input is read and validated in pandas chunks; each valid chunk is written
+with COPY FROM STDIN on PostgreSQL (through a staging table, so rows that
+hit a unique constraint are skipped rather than failing the chunk) and with
+a batched executemany INSERT OR IGNORE on SQLite. Invalid
+rows are written next to the input as <file>.rejected.csv with a reason.
+
+Only daily_reports has a unique key (brand, product, date_report): the
+first row for a day wins, and days already in the table are skipped.
+amazon_transactions and shipment_costs have no natural key, so a load is
+refused when the file's first rows are already in the table; a file that
+overlaps an earlier load only partly must be trimmed by hand.
+"""
+import csv
+import io
+import os
+import time
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import UniqueConstraint, and_, exists, insert, select
+
+from models import db, DailyReport, AmazonTransaction, ShipmentCost, get_bangkok_now
+from money import Cents, cents, from_cents, to_cents
+
+BULK_TABLES = {
+    'daily_reports': DailyReport,
+    'amazon_transactions': AmazonTransaction,
+    'shipment_costs': ShipmentCost,
+}
+
+# Accepted date formats: ISO, and the dd/mm/yyyy format of the app's own CSV exports
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+DATETIME_FORMATS = ('ISO8601', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y')
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Filled in at load time, so never part of a row's identity
+LOAD_COLUMNS = ('created_at', 'updated_at', 'import_id')
+
+
+class AlreadyLoaded(ValueError):
+    """A file for a table without a unique key has rows that are already loaded."""
+
+
+class LoadStats:
+    """Counters for one bulk load."""
+
+    def __init__(self):
+        self.read = 0
+        self.loaded = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.seconds = 0.0
+        self.brands = set()
+
+    @property
+    def rate(self):
+        return self.loaded / self.seconds if self.seconds else 0.0
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield DataFrames of at most chunk_size rows from a CSV or Parquet file."""
+    if path.lower().endswith(('.parquet', '.pq')):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Loading Parquet files requires pyarrow (pip install pyarrow).')
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+
+    # utf-8-sig: the app's exports start with a byte order mark
+    yield from pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                           encoding='utf-8-sig')
+
+
+def _parse_datetimes(values, formats):
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for fmt in formats:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors='coerce')
+    return parsed
+
+
+def _blank(values):
+    return values.isna() | (values.astype(str).str.strip() == '')
+
+
+def validate_chunk(model, chunk, loaded_at):
+    """Coerce a chunk to the model's column types, vectorized.
+
+    Returns (valid DataFrame with one column per table column except id,
+    money columns in integer cents; rejected DataFrame with a 'reason' column).
+    """
+    chunk = chunk.rename(columns=lambda name: str(name).lstrip('\ufeff').strip())
+    chunk = chunk.reset_index(drop=True)
+    reasons = pd.Series('', index=chunk.index)
+    out = pd.DataFrame(index=chunk.index)
+
+    def reject(mask, reason):
+        reasons[mask & (reasons == '')] = reason
+
+    for column in model.__table__.columns:
+        name = column.name
+        if name == 'id':
+            continue
+        raw = chunk[name] if name in chunk else pd.Series(None, index=chunk.index, dtype=object)
+        blank = _blank(raw)
+        python_type = column.type.python_type
+
+        if python_type is int or python_type is float:
+            values = pd.to_numeric(raw.where(~blank), errors='coerce')
+            reject(values.isna() & ~blank, f'{name} is not a number')
+            if python_type is int:
+                fractional = values.notna() & (values != values.round())
+                reject(fractional, f'{name} is not a whole number')
+                values = values.where(~fractional).astype('Int64')
+        elif python_type is Decimal:
+            numbers = pd.to_numeric(raw.where(~blank), errors='coerce')
+            reject(numbers.isna() & ~blank, f'{name} is not a number')
+            # Through Decimal, so half cents round like typed-in amounts (not via binary floats)
+            values = raw.where(numbers.notna()).map(to_cents, na_action='ignore').astype('Int64')
+        elif python_type.__name__ == 'date':
+            values = _parse_datetimes(raw.where(~blank).astype(object), DATE_FORMATS)
+            reject(values.isna() & ~blank, f'{name} is not a date')
+            values = values.dt.date.where(values.notna(), None)
+        elif python_type.__name__ == 'datetime':
+            values = _parse_datetimes(raw.where(~blank).astype(object), DATETIME_FORMATS)
+            reject(values.isna() & ~blank, f'{name} is not a date/time')
+            values = values.dt.to_pydatetime()
+            values = pd.Series(values, index=chunk.index, dtype=object).where(~pd.isna(values), None)
+        else:
+            values = raw.astype(object).map(lambda v: None if pd.isna(v) else str(v).strip()).where(~blank, None)
+            length = getattr(column.type, 'length', None)
+            if length:
+                reject(values.str.len() > length, f'{name} is longer than {length} characters')
+
+        if column.default is not None and column.default.is_scalar:
+            values = values.where(pd.notna(values), column.default.arg)
+        out[name] = values
+
+    # Filled in by the loader when absent
+    if 'created_at' in out:
+        out['created_at'] = out['created_at'].where(pd.notna(out['created_at']), loaded_at)
+    if model is DailyReport:
+        report_day = _parse_datetimes(out['date_report'].astype(object), DATE_FORMATS)
+        reject(report_day.isna() & out['date_report'].notna(), 'date_report is not a date')
+        out['date_report'] = report_day.dt.strftime('%Y-%m-%d').where(report_day.notna(), None)
+        out['report_date'] = out['report_date'].where(out['report_date'].notna(), report_day.dt.date)
+        out['updated_at'] = out['created_at']
+
+    for column in model.__table__.columns:
+        if column.name != 'id' and not column.nullable:
+            reject(out[column.name].isna(), f'{column.name} is required')
+
+    valid = reasons == ''
+    rejected = chunk[~valid].assign(reason=reasons[~valid])
+    return out[valid], rejected
+
+
+def _records(frame):
+    frame = frame.astype(object).where(frame.notna(), None)
+    records = frame.to_dict('records')
+    for record in records:
+        for key, value in record.items():
+            if isinstance(value, np.generic):
+                record[key] = value.item()
+    return records
+
+
+def has_unique_key(model):
+    """Whether a table has a unique key besides id, so INSERT can skip reloaded rows."""
+    table = model.__table__
+    return any(index.unique for index in table.indexes) or any(
+        isinstance(constraint, UniqueConstraint) for constraint in table.constraints)
+
+
+def already_loaded(model, frame):
+    """Whether the first or last row of a validated chunk is already in the table."""
+    clauses_by_row = []
+    for record in _records(frame.iloc[[0, -1]]):
+        clauses = []
+        for name, value in record.items():
+            if name in LOAD_COLUMNS:
+                continue
+            column = getattr(model, name)
+            if isinstance(column.type, Cents):
+                column = cents(column)
+            clauses.append(column.is_not_distinct_from(value))
+        clauses_by_row.append(and_(*clauses))
+    return any(db.session.execute(select(exists().where(clauses))).scalar() for clauses in clauses_by_row)
+
+
+def copy_buffer(frame):
+    """A validated chunk as the CSV text COPY ... WITH (FORMAT csv, NULL '') reads."""
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, na_rep='', quoting=csv.QUOTE_MINIMAL,
+                 date_format='%Y-%m-%d %H:%M:%S.%f')
+    buffer.seek(0)
+    return buffer
+
+
+def _copy_postgres(model, frame):
+    """COPY a chunk through a temp staging table; returns rows inserted."""
+    table = model.__table__.name
+    columns = ', '.join(frame.columns)
+    buffer = copy_buffer(frame)
+
+    connection = db.session.connection().connection
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMP TABLE bulk_staging (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP')
+        cursor.copy_expert(f"COPY bulk_staging ({columns}) FROM STDIN WITH (FORMAT csv, NULL '')", buffer)
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) SELECT {columns} FROM bulk_staging '
+            f'ON CONFLICT DO NOTHING'
+        )
+        return cursor.rowcount
+
+
+def _insert_executemany(model, frame):
+    """Batched executemany INSERT that skips unique-constraint conflicts."""
+    statement = insert(model.__table__)
+    if db.engine.dialect.name == 'sqlite':
+        statement = statement.prefix_with('OR IGNORE')
+    records = _records(frame)
+    money = [column.name for column in model.__table__.columns if isinstance(column.type, Cents)]
+    for record in records:
+        for name in money:
+            record[name] = from_cents(record[name])
+    return db.session.execute(statement, records).rowcount
+
+
+def load_file(table, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Validate and load one file into table, one transaction per chunk.
+
+    Raises AlreadyLoaded, before writing anything, when the table has no
+    unique key and the file's first rows are already in it.
+    """
+    model = BULK_TABLES[table]
+    check_reload = not has_unique_key(model)
+    stats = LoadStats()
+    loaded_at = get_bangkok_now().replace(tzinfo=None)
+    write = _copy_postgres if db.engine.dialect.name == 'postgresql' else _insert_executemany
+    rejected_path = f'{path}.rejected.csv'
+    wrote_rejects = False
+
+    started = time.perf_counter()
+    for chunk in read_chunks(path, chunk_size):
+        stats.read += len(chunk)
+        valid, rejected = validate_chunk(model, chunk, loaded_at)
+
+        if not rejected.empty:
+            rejected.to_csv(rejected_path, mode='a' if wrote_rejects else 'w',
+                            header=not wrote_rejects, index=False)
+            wrote_rejects = True
+            stats.rejected += len(rejected)
+
+        if model is DailyReport:
+            # One report per brand/product/day. INSERT OR IGNORE keeps the row from
+            # an earlier chunk, so the first row in the file wins here too
+            before = len(valid)
+            valid = valid.drop_duplicates(['brand', 'product', 'date_report'], keep='first')
+            stats.duplicates += before - len(valid)
+
+        if valid.empty:
+            continue
+        if check_reload:
+            if already_loaded(model, valid):
+                raise AlreadyLoaded(f'{table} already has rows from {os.path.basename(path)}; '
+                                    f'it has no unique key, so loading it again would duplicate them.')
+            check_reload = False
+        inserted = write(model, valid)
+        db.session.commit()
+        stats.loaded += inserted
+        stats.duplicates += len(valid) - inserted
+        stats.brands.update(valid['brand'].unique())
+
+    stats.seconds = time.perf_counter() - started
+    if not wrote_rejects and os.path.exists(rejected_path):
+        os.remove(rejected_path)
+    return stats
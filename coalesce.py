@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Share one computation between identical concurrent requests.
+
+    The first caller for a key computes the value; callers arriving while
+    it runs wait for that result instead of repeating the work ("single
+    flight"). Results are then kept for ttl_seconds so a burst of reloads
+    is served from memory. Cached values are shared, so treat them as
+    read-only.
+    """
+
+    def __init__(self, ttl_seconds=5, max_entries=256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._inflight = {}
+
+    def get(self, key, compute):
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl_seconds:
+                return cached[1]
+
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call.error is None:
+                    self._cache[key] = (time.monotonic(), call.result)
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+            call.event.set()
+
+        return call.result
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,264 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, or_, select
+
+from models import db, DailyReport
+from money import CENTS_PER_UNIT, cents
+
+# Low-cardinality text columns, stored as int32 codes into a category list
+CATEGORICAL_FIELDS = (
+    'brand', 'product', 'employee_name', 'date_report',
+    'account_status_us', 'account_status_mexico', 'account_status_canada',
+    'store_status_us', 'store_status_mexico', 'store_status_canada'
+)
+
+# Numeric report columns (NULL integers load as 0, NULL floats as NaN)
+INTEGER_FIELDS = (
+    'new_orders', 'vine_total_orders', 'current_inventory', 'total_unit_sales',
+    'new_reviews', 'main_niche_ranking', 'sub_niche_ranking', 'impressions',
+    'shopify_click_throughs', 'shopify_total_dpv', 'shopify_total_atc',
+    'shopify_total_purchases'
+)
+FLOAT_FIELDS = ('average_orders_30_days', 'average_rating', 'acos')
+
+# Money columns, held as int64 cents (MONEY_NULL marks NULL) and returned
+# by frame() as nullable Int64 cents
+MONEY_FIELDS = (
+    'current_balance', 'ads_spend_total', 'ads_sales_total', 'ads_sales_today',
+    'shopify_total_product_sales'
+)
+MONEY_NULL = np.iinfo(np.int64).min
+
+FIELDS = CATEGORICAL_FIELDS + INTEGER_FIELDS + FLOAT_FIELDS + MONEY_FIELDS
+
+INITIAL_CAPACITY = 1024
+
+# updated_at is stamped when a report is submitted, not when it commits, so a
+# slow or batched commit can land behind rows already read. Each refresh
+# re-reads this trailing window of updated_at to pick such rows up.
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+def cents_to_units(frame):
+    """Convert the money columns of a frame from cents to float amounts, in place."""
+    for field in MONEY_FIELDS:
+        if field in frame:
+            frame[field] = (frame[field] / CENTS_PER_UNIT).to_numpy(dtype=float, na_value=np.nan)
+    return frame
+
+
+def _execute_on_primary(query):
+    # An explicit bind bypasses the @read_replica routing
+    return db.session.execute(query, bind_arguments={'bind': db.engine})
+
+
+class ReportColumnStore:
+    """Process-wide columnar copy of the daily_reports table for analytics.
+
+    One NumPy array per field (int32 codes for text columns, int64 cents
+    for money columns), plus a row
+    index per brand. Loaded once, then kept current incrementally: each
+    refresh() only fetches rows with an id above the watermark (new reports)
+    or an updated_at within REFRESH_OVERLAP of the watermark (resubmissions
+    updated in place, and rows that committed late). Rows deleted from the
+    table are dropped when the table's row count stops matching.
+
+    The store is shared by every request, so it always reads the primary:
+    rows a lagging replica has not replayed yet would look deleted, and
+    the watermark would skip past them.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._size = 0
+        self._capacity = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._positions = {}
+        self._updated_at = {}
+        self._columns = {}
+        self._categories = {field: [] for field in CATEGORICAL_FIELDS}
+        self._category_codes = {field: {} for field in CATEGORICAL_FIELDS}
+        self._brand_rows = {}
+        self._brand_row_arrays = {}
+        self._max_id = 0
+        self._max_updated_at = None
+
+    def _grow(self, needed):
+        capacity = max(INITIAL_CAPACITY, self._capacity)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+
+        def resized(array, dtype, fill):
+            new = np.full(capacity, fill, dtype=dtype)
+            new[:self._size] = array[:self._size]
+            return new
+
+        self._ids = resized(self._ids, np.int64, 0)
+        for field in CATEGORICAL_FIELDS:
+            self._columns[field] = resized(self._columns.get(field, np.empty(0)), np.int32, -1)
+        for field in INTEGER_FIELDS:
+            self._columns[field] = resized(self._columns.get(field, np.empty(0)), np.int64, 0)
+        for field in FLOAT_FIELDS:
+            self._columns[field] = resized(self._columns.get(field, np.empty(0)), np.float64, np.nan)
+        for field in MONEY_FIELDS:
+            self._columns[field] = resized(self._columns.get(field, np.empty(0)), np.int64, MONEY_NULL)
+        self._capacity = capacity
+
+    def _code(self, field, value):
+        if value is None:
+            return -1
+        codes = self._category_codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._categories[field])
+            self._categories[field].append(value)
+        return code
+
+    def _write_row(self, position, row):
+        for field in CATEGORICAL_FIELDS:
+            self._columns[field][position] = self._code(field, getattr(row, field))
+        for field in INTEGER_FIELDS:
+            self._columns[field][position] = getattr(row, field) or 0
+        for field in FLOAT_FIELDS:
+            value = getattr(row, field)
+            self._columns[field][position] = np.nan if value is None else value
+        for field in MONEY_FIELDS:
+            value = getattr(row, field)
+            self._columns[field][position] = MONEY_NULL if value is None else value
+
+    def refresh(self):
+        """Pull new, resubmitted and late-committed rows, and drop deleted ones."""
+        columns = [DailyReport.id, DailyReport.updated_at] + [
+            getattr(DailyReport, field)
+            for field in CATEGORICAL_FIELDS + INTEGER_FIELDS + FLOAT_FIELDS
+        ] + [cents(getattr(DailyReport, field)).label(field) for field in MONEY_FIELDS]
+        with self._lock:
+            query = select(*columns)
+            if self._max_id:
+                changed = DailyReport.id > self._max_id
+                if self._max_updated_at is not None:
+                    changed = or_(changed, DailyReport.updated_at > self._max_updated_at - REFRESH_OVERLAP)
+                query = query.where(changed)
+            rows = _execute_on_primary(query.order_by(DailyReport.id)).all()
+
+            # The trailing window re-reads rows already held; skip unchanged ones
+            rows = [row for row in rows if row.id not in self._positions
+                    or self._updated_at[row.id] != row.updated_at]
+            self._grow(self._size + sum(row.id not in self._positions for row in rows))
+
+            for row in rows:
+                position = self._positions.get(row.id)
+                if position is None:
+                    # New, or committed after rows with higher ids were read
+                    position = self._positions[row.id] = self._size
+                    self._ids[position] = row.id
+                    self._size += 1
+                    self._max_id = max(self._max_id, row.id)
+                else:
+                    self._unindex(position)
+
+                self._write_row(position, row)
+                self._updated_at[row.id] = row.updated_at
+                brand_code = self._columns['brand'][position]
+                self._brand_rows.setdefault(brand_code, []).append(position)
+                self._brand_row_arrays.pop(brand_code, None)
+
+                if row.updated_at is not None and (
+                        self._max_updated_at is None or row.updated_at > self._max_updated_at):
+                    self._max_updated_at = row.updated_at
+
+            return len(rows) + self._drop_deleted()
+
+    def _unindex(self, position):
+        brand_code = self._columns['brand'][position]
+        self._brand_rows.get(brand_code, []).remove(position)
+        self._brand_row_arrays.pop(brand_code, None)
+
+    def _drop_deleted(self):
+        """Drop rows deleted from the table; a count query unless the counts differ."""
+        if _execute_on_primary(select(func.count(DailyReport.id))).scalar() == len(self._positions):
+            return 0
+        existing = set(_execute_on_primary(select(DailyReport.id)).scalars())
+        deleted = [report_id for report_id in self._positions if report_id not in existing]
+        for report_id in deleted:
+            position = self._positions.pop(report_id)
+            del self._updated_at[report_id]
+            self._unindex(position)
+            # Dead rows keep their slot but match no category
+            for field in CATEGORICAL_FIELDS:
+                self._columns[field][position] = -1
+        return len(deleted)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _live_rows(self):
+        return np.flatnonzero(self._columns['brand'][:self._size] >= 0) if self._size else np.arange(0)
+
+    def nbytes(self):
+        """Approximate memory used by the column arrays."""
+        return self._ids.nbytes + sum(array.nbytes for array in self._columns.values())
+
+    def brand_rows(self, brand):
+        """Row positions for a brand, in load order."""
+        with self._lock:
+            code = self._category_codes['brand'].get(brand)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            rows = self._brand_row_arrays.get(code)
+            if rows is None:
+                rows = self._brand_row_arrays[code] = np.array(
+                    sorted(self._brand_rows.get(code, [])), dtype=np.int64)
+            return rows
+
+    def rows_where(self, field, value):
+        """Row positions where a categorical field equals value (vectorized scan)."""
+        with self._lock:
+            code = self._category_codes[field].get(value)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            return np.flatnonzero(self._columns[field][:self._size] == code)
+
+    def frame(self, rows=None, fields=None):
+        """DataFrame of the selected rows (all rows if None) and fields."""
+        with self._lock:
+            if rows is None:
+                rows = self._live_rows()
+            fields = fields or FIELDS
+            data = {'id': self._ids[rows]}
+            for field in fields:
+                values = self._columns[field][rows]
+                if field in MONEY_FIELDS:
+                    values = pd.arrays.IntegerArray(values, values == MONEY_NULL)
+                elif field in CATEGORICAL_FIELDS:
+                    values = pd.Categorical.from_codes(values, categories=self._categories[field]) \
+                        if self._categories[field] else pd.Categorical([None] * len(rows))
+                    values = np.asarray(values, dtype=object)
+                data[field] = values
+            return pd.DataFrame(data)
+
+    def latest_per(self, field, rows=None):
+        """Row position of the latest date_report for each value of a categorical field."""
+        with self._lock:
+            if rows is None:
+                rows = self._live_rows()
+            keys = self._columns[field][rows]
+            dates = self._columns['date_report'][rows]
+            # date_report codes are in arrival order, so rank by the date string
+            date_rank = np.argsort(np.argsort(np.array(self._categories['date_report'] or [''], dtype=object)))
+            order = np.lexsort((self._ids[rows], np.where(dates >= 0, date_rank[dates], -1), keys))
+            sorted_keys = keys[order]
+            last = np.append(sorted_keys[1:] != sorted_keys[:-1], True) if len(order) else order
+            latest = rows[order[last]]
+            return latest[self._columns[field][latest] >= 0]
+
+
+report_store = ReportColumnStore()
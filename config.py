@@ -17,8 +17,71 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Optional read replica for manager analytics (see replica.py)
+    DATABASE_READ_URL = os.environ.get('DATABASE_READ_URL')
+    if DATABASE_READ_URL and DATABASE_READ_URL.startswith('postgres://'):
+        DATABASE_READ_URL = DATABASE_READ_URL.replace('postgres://', 'postgresql://', 1)
+    SQLALCHEMY_BINDS = {'replica': DATABASE_READ_URL} if DATABASE_READ_URL else {}
+    
+    # Seconds a browser reads from the primary after writing, and the most replica lag tolerated
+    READ_AFTER_WRITE_SECONDS = int(os.environ.get('READ_AFTER_WRITE_SECONDS', 10))
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    
+    # SQLite runs in WAL mode; FULL keeps each acknowledged commit durable
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'FULL')
+    
+    # Group commit: queue report submissions and commit them in small batches
+    GROUP_COMMIT = os.environ.get('GROUP_COMMIT', '0') == '1'
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 32))
+    GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get('GROUP_COMMIT_MAX_DELAY_MS', 10))
+    
     # Secret key for sessions (use environment variable in production)
     SECRET_KEY = os.environ.get('SECRET_KEY', 'psa-report-tool-secret-key-2026')
     
     # Timezone
     TIMEZONE = 'Asia/Bangkok'
+    
+    # Settlement ingest daemon (ingest_daemon.py)
+    INGEST_DIR = os.environ.get('INGEST_DIR', os.path.join(BASE_DIR, 'settlement_drop'))
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', os.cpu_count() or 2))
+    
+    # Closed months of amazon_transactions are moved to Parquet files here,
+    # keeping the current month and this many previous months in the database.
+    # No default: it must be persistent storage (e.g. a Render disk), since the
+    # app directory is replaced on every deploy; archiving refuses to run unset
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')
+    ARCHIVE_HOT_MONTHS = int(os.environ.get('ARCHIVE_HOT_MONTHS', 3))
+    
+    # Ad spend reconciliation flags a period whose reported vs settled gap is at
+    # least this many dollars and this percent of the larger side
+    AD_SPEND_GAP_AMOUNT = float(os.environ.get('AD_SPEND_GAP_AMOUNT', 10))
+    AD_SPEND_GAP_PERCENT = float(os.environ.get('AD_SPEND_GAP_PERCENT', 10))
+    
+    # Seconds identical JSON API reads are shared from memory
+    API_CACHE_TTL = float(os.environ.get('API_CACHE_TTL', 5))
+    
+    # Admission control (admission.py), per gunicorn worker: threads available,
+    # threads kept for employee submissions, limits for heavy and streaming
+    # routes and single routes, and how long a request may queue before a 503
+    ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', '1') == '1'
+    ADMISSION_CAPACITY = int(os.environ.get('GUNICORN_THREADS', 8))
+    ADMISSION_RESERVED = int(os.environ.get('ADMISSION_RESERVED', 2))
+    ADMISSION_HEAVY_LIMIT = int(os.environ.get('ADMISSION_HEAVY_LIMIT', 2))
+    ADMISSION_STREAM_LIMIT = int(os.environ.get('ADMISSION_STREAM_LIMIT', 2))
+    ADMISSION_ROUTE_LIMITS = os.environ.get('ADMISSION_ROUTE_LIMITS', 'export_csv=1,amazon_upload=1')
+    ADMISSION_QUEUE_SECONDS = float(os.environ.get('ADMISSION_QUEUE_SECONDS', 5))
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 10))
+    
+    # Seconds a pivot result is kept; entries are keyed by data version, so this only bounds memory
+    PIVOT_CACHE_TTL = float(os.environ.get('PIVOT_CACHE_TTL', 3600))
+    
+    # Seconds before a worker reloads the brand registry written by other workers
+    BRAND_REGISTRY_TTL = int(os.environ.get('BRAND_REGISTRY_TTL', 60))
+    
+    # Live daily dashboard (server-sent events): poll interval and stream lifetime
+    SSE_POLL_SECONDS = float(os.environ.get('SSE_POLL_SECONDS', 2))
+    SSE_MAX_SECONDS = int(os.environ.get('SSE_MAX_SECONDS', 300))
+    
+    # Plotly build loaded by base.html: 'full', or 'basic' for the smaller
+    # partial bundle (scatter and bar traces are all the charts use)
+    PLOTLY_BUNDLE = os.environ.get('PLOTLY_BUNDLE', 'full')
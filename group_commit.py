@@ -0,0 +1,158 @@
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from sqlalchemy import event
+
+from models import db, DailyReport
+from metrics import refresh_report_metrics
+from ad_spend import reconcile_report
+from submissions import save_report, summarize, commit_report
+
+
+def configure_sqlite(engine, synchronous='FULL'):
+    """Put SQLite connections in WAL mode with a busy timeout.
+
+    WAL lets readers run while a write commits, and the busy timeout makes
+    concurrent writers wait for the lock instead of failing with
+    "database is locked"; save_report takes the lock up front with
+    models.begin_write(). No-op for other databases.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA synchronous={synchronous}')
+        cursor.execute('PRAGMA busy_timeout=5000')
+        cursor.close()
+
+    # Connections opened before the listener was registered
+    engine.dispose()
+
+
+class CommitPending(Exception):
+    """The report is in a batch that has not committed yet; it may still be saved."""
+
+
+class GroupCommitWriter:
+    """Single writer thread that commits queued reports in small batches.
+
+    Request threads call submit(), which blocks until the report's batch has
+    been committed, so the employee still only sees success once the data is
+    durable. Batching turns a burst of N submissions into a few commits (and
+    fsyncs) instead of N competing ones, and derived metrics are refreshed
+    once per report after the whole batch is saved.
+    """
+
+    def __init__(self, app, max_batch=32, max_delay=0.01):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily so each forked gunicorn worker gets its own thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+
+    def submit(self, report, timeout=30):
+        """Queue an unsaved report and wait for its commit. Returns summarize(...).
+
+        On timeout a report still in the queue is withdrawn and TimeoutError
+        raised, so it is certainly not saved; one already taken into a batch
+        raises CommitPending, as that batch may still commit.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((report, future))
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise TimeoutError('The server is busy; the report was not saved.') from None
+            raise CommitPending('The report is still being saved.') from None
+
+    def _take(self, block=True, timeout=None):
+        """Next queued entry that was not withdrawn by a timed-out submit()."""
+        while True:
+            entry = self._queue.get(block=block, timeout=timeout)
+            if entry[1].set_running_or_notify_cancel():
+                return entry
+
+    def _next_batch(self):
+        batch = [self._take()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._take(timeout=self.max_delay))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        batch = []
+        try:
+            while True:
+                batch = self._next_batch()
+                try:
+                    with self.app.app_context():
+                        self._commit_batch(batch)
+                except Exception as e:
+                    self._fail(batch, e)
+        finally:
+            # The thread is dying: fail what it held and what is queued instead
+            # of leaving the requests to wait out their timeout. The next
+            # submit() starts a new thread.
+            error = RuntimeError('The report writer stopped; the report was not saved.')
+            self._fail(batch, error)
+            while True:
+                try:
+                    _, future = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(error)
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _commit_batch(self, batch):
+        try:
+            results = []
+            report_days = set()
+            for report, _ in batch:
+                results.append(summarize(*save_report(report, refresh_metrics=False)))
+                report_days.add((report.brand, report.product, report.date_report))
+            for brand, product, day in sorted(report_days, key=lambda key: (key[0], key[2] or '', key[1])):
+                refresh_report_metrics(brand, product, day)
+            for brand, day in {(brand, day) for brand, _, day in report_days}:
+                reconcile_report(brand, day)
+            db.session.commit()
+        except Exception:
+            # One bad report must not fail the others: redo them one by one
+            db.session.rollback()
+            self._commit_individually(batch)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _commit_individually(self, batch):
+        for report, future in batch:
+            # Fresh copy: the rolled-back batch may have left state on the original
+            fresh = DailyReport()
+            fresh.copy_fields_from(report)
+            try:
+                future.set_result(commit_report(fresh))
+            except Exception as e:
+                db.session.rollback()
+                future.set_exception(e)
@@ -0,0 +1,154 @@
+"""Settlement ingest daemon.
+
+Watches a local drop directory for Amazon settlement XML files and imports
+them without going through the browser upload:
+
+    python ingest_daemon.py --dir /data/settlements --workers 4
+
+The brand of each file comes from a sidecar manifest next to it
+(``report.xml.json`` or ``report.json`` containing ``{"brand": "LUVOST"}``)
+or, failing that, from a ``BRAND__`` filename prefix (``LUVOST__june.xml``).
+Files are parsed concurrently in a process pool with the same parser as the
+upload page, each file is committed as one bulk insert with its
+settlement_imports manifest, and the file is then moved to ``done/`` (or
+``failed/`` with an ``.error`` note, e.g. when it was already imported).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from models import db, get_bangkok_now
+from registry import brand_registry
+from settlement import parse_settlement_import, record_import
+from ad_spend import reconcile_transactions
+
+# Ignore files modified more recently than this (still being copied in)
+SETTLE_SECONDS = 5
+
+
+def find_manifest(path):
+    for candidate in (path + '.json', os.path.splitext(path)[0] + '.json'):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def resolve_brand(path, known_brands):
+    """Work out the brand for a settlement file, or None if unknown."""
+    manifest = find_manifest(path)
+    if manifest:
+        with open(manifest, encoding='utf-8') as f:
+            brand = (json.load(f).get('brand') or '').strip()
+        return brand or None
+
+    name = os.path.basename(path)
+    if '__' in name:
+        prefix = name.split('__', 1)[0].replace('_', ' ').strip().upper()
+        if prefix in known_brands:
+            return prefix
+    return None
+
+
+def pending_files(drop_dir):
+    """Settlement files in the drop directory that are ready to import."""
+    now = time.time()
+    for name in sorted(os.listdir(drop_dir)):
+        path = os.path.join(drop_dir, name)
+        if not name.lower().endswith('.xml') or not os.path.isfile(path):
+            continue
+        if now - os.path.getmtime(path) < SETTLE_SECONDS:
+            continue
+        yield path
+
+
+def move_done(path, drop_dir, subdir, error=None):
+    target_dir = os.path.join(drop_dir, subdir)
+    os.makedirs(target_dir, exist_ok=True)
+    manifest = find_manifest(path)
+    target = os.path.join(target_dir, os.path.basename(path))
+    shutil.move(path, target)
+    if manifest:
+        shutil.move(manifest, os.path.join(target_dir, os.path.basename(manifest)))
+    if error:
+        with open(target + '.error', 'w', encoding='utf-8') as f:
+            f.write(error)
+
+
+def ingest_once(app, pool, drop_dir):
+    """Import every ready file in drop_dir. Returns (files, rows) imported."""
+    with app.app_context():
+        known_brands = set(brand_registry.brands())
+
+    jobs = {}
+    for path in pending_files(drop_dir):
+        try:
+            brand = resolve_brand(path, known_brands)
+        except (OSError, ValueError) as e:
+            move_done(path, drop_dir, 'failed', f'Invalid manifest: {e}')
+            continue
+        if not brand:
+            # Wait for a manifest to be dropped next to it
+            continue
+        created_at = get_bangkok_now().replace(tzinfo=None)
+        jobs[pool.submit(parse_settlement_import, path, brand, created_at)] = (path, brand, created_at)
+
+    files = rows_added = 0
+    for future in as_completed(jobs):
+        path, brand, created_at = jobs[future]
+        try:
+            rows, manifest = future.result()
+            with app.app_context():
+                brand_registry.add_brand(brand)
+                record_import(brand, os.path.basename(path), rows, manifest, created_at)
+                reconcile_transactions(brand, rows)
+                db.session.commit()
+        except BrokenProcessPool:
+            # Not the file's fault; leave it in place for the next run
+            raise
+        except Exception as e:
+            with app.app_context():
+                db.session.rollback()
+            move_done(path, drop_dir, 'failed', str(e))
+            print(f'Failed {os.path.basename(path)}: {e}', flush=True)
+            continue
+
+        move_done(path, drop_dir, 'done')
+        files += 1
+        rows_added += len(rows)
+        print(f'Imported {len(rows)} transactions for {brand} from {os.path.basename(path)}', flush=True)
+
+    return files, rows_added
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Import Amazon settlement XML files from a drop directory.')
+    parser.add_argument('--dir', default=Config.INGEST_DIR, help='Directory to watch')
+    parser.add_argument('--workers', type=int, default=Config.INGEST_WORKERS, help='Parser processes')
+    parser.add_argument('--interval', type=float, default=10, help='Seconds between scans')
+    parser.add_argument('--once', action='store_true', help='Import what is there and exit')
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+
+    from app import app
+
+    # Spawned (not forked) so parser processes don't inherit database connections
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        print(f'Watching {args.dir} with {args.workers} parser processes', flush=True)
+        while True:
+            ingest_once(app, pool, args.dir)
+            if args.once:
+                break
+            time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import json
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from models import db, DailyReport
+from money import as_float
+from columnar import REFRESH_OVERLAP
+
+# Report fields the daily charts are built from (see generate_daily_charts)
+DELTA_FIELDS = ('brand', 'product', 'current_balance', 'new_orders',
+                'ads_spend_total', 'ads_sales_today', 'acos')
+
+
+def report_delta(report):
+    """Compact form of a report for pushing to open daily dashboards."""
+    delta = {'id': report.id}
+    for field in DELTA_FIELDS:
+        value = getattr(report, field)
+        delta[field] = as_float(value) if isinstance(value, Decimal) else value
+    return delta
+
+
+def watermark(report):
+    """Position of a report in (updated_at, id) order, as an SSE event id."""
+    return f'{report.updated_at.isoformat()}|{report.id}'
+
+
+def parse_watermark(value):
+    """Inverse of watermark(); None if missing or malformed."""
+    try:
+        updated_at, report_id = value.split('|')
+        return datetime.fromisoformat(updated_at), int(report_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def report_stream(date_str, since, poll_seconds=2, max_seconds=300):
+    """Server-sent events for reports on date_str committed after since.
+
+    Polls daily_reports from the (updated_at, id) watermark, so new reports
+    and resubmissions both arrive, each as one 'report' event. Each poll
+    reaches REFRESH_OVERLAP behind the watermark for reports that committed
+    late, and skips versions this stream already sent. Ends after
+    max_seconds so a long-lived page does not hold a worker thread forever;
+    the browser's EventSource reconnects with Last-Event-ID and resumes.
+    """
+    yield f'retry: {int(poll_seconds * 1000)}\n\n'
+    deadline = time.monotonic() + max_seconds
+    sent = {}
+
+    while time.monotonic() < deadline:
+        query = DailyReport.query.filter(
+            DailyReport.date_report == date_str,
+            DailyReport.updated_at.isnot(None)
+        )
+        if since is not None:
+            query = query.filter(DailyReport.updated_at > since[0] - REFRESH_OVERLAP)
+        events = [(watermark(report), report_delta(report))
+                  for report in query.order_by(DailyReport.updated_at, DailyReport.id)
+                  if sent.get(report.id) != report.updated_at]
+        # End the read transaction so the next poll sees new commits
+        db.session.remove()
+
+        for event_id, delta in events:
+            position = parse_watermark(event_id)
+            sent[delta['id']] = position[0]
+            since = max(since, position) if since is not None else position
+            # The id never moves back, even for a late report, so a reconnect resumes at the newest
+            yield f'id: {since[0].isoformat()}|{since[1]}\nevent: report\ndata: {json.dumps(delta)}\n\n'
+        if not events:
+            # Heartbeat; a write to a closed connection ends the generator
+            yield ': keep-alive\n\n'
+
+        time.sleep(poll_seconds)
@@ -0,0 +1,74 @@
+"""Concurrent submission load test for the employee write path.
+
+Runs against a throwaway SQLite database (never DATABASE_URL):
+
+    python load_test.py --threads 16 --reports 400
+    GROUP_COMMIT=1 python load_test.py --threads 16 --reports 400
+
+Prints sustained submissions per second and any failed submissions.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Submit reports concurrently and measure throughput.')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--reports', type=int, default=400, help='Total submissions')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp_dir, 'load_test.db')
+
+    from app import app, brand_registry, group_writer
+
+    with app.app_context():
+        employees = list(brand_registry.employee_brand_map().items())
+        products = brand_registry.brand_products_map()
+
+    failures = []
+    counter = iter(range(args.reports))
+    counter_lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with counter_lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            employee_name, brand = employees[n % len(employees)]
+            response = client.post('/employee', data={
+                'employee_name': employee_name,
+                'product': random.choice(products[brand]),
+                # Mostly distinct days, with some resubmissions
+                'date_report': f'2026-{1 + n % 12:02d}-{1 + (n // 12) % 28:02d}',
+                'current_balance': random.uniform(0, 5000),
+                'new_orders': random.randint(0, 50),
+                'current_inventory': random.randint(100, 1000),
+                'ads_spend_total': random.uniform(0, 1000),
+                'ads_sales_total': random.uniform(0, 4000),
+                'acos': random.uniform(10, 40),
+            })
+            if b'alert-success' not in response.data:
+                failures.append(n)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    mode = 'group commit' if group_writer is not None else 'per-request commit'
+    print(f'{mode}: {args.reports} submissions from {args.threads} threads in {elapsed:.2f}s '
+          f'= {args.reports / elapsed:.1f} submissions/s, {len(failures)} failed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, func, insert
+
+from models import db, DailyReport, ReportMetrics, BrandDailyMetrics, upsert
+from money import Cents, cents, from_cents
+
+# Running totals on DailyReport → the daily delta column derived from each
+CUMULATIVE_FIELDS = {
+    'ads_spend_total': 'ads_spend_delta',
+    'ads_sales_total': 'ads_sales_delta',
+    'total_unit_sales': 'unit_sales_delta',
+    'vine_total_orders': 'vine_orders_delta',
+}
+
+# Brand-level running totals (the same value is entered on every product)
+BRAND_LEVEL_FIELDS = ('ads_spend_total', 'ads_sales_total')
+
+ROLLING_WINDOWS = (7, 30)
+
+INTEGER_COLUMNS = (
+    'unit_sales_delta', 'vine_orders_delta', 'unit_sales_7d', 'unit_sales_30d'
+)
+
+# Money columns of the metrics tables; computed in integer cents
+MONEY_COLUMNS = tuple(column.name for column in BrandDailyMetrics.__table__.columns
+                      if isinstance(column.type, Cents))
+
+
+def _report_column(field):
+    """A DailyReport column for the SQL below, money as raw integer cents."""
+    column = getattr(DailyReport, field)
+    return cents(column) if isinstance(column.type, Cents) else column
+
+
+def _sql_delta(column):
+    """Change since the product's previous report, via LAG.
+
+    A total lower than the previous one is read as a counter reset, so the
+    new total itself is the delta. NULL for a product's first report.
+    """
+    previous = func.lag(column).over(
+        partition_by=(DailyReport.brand, DailyReport.product),
+        order_by=(DailyReport.date_report, DailyReport.created_at, DailyReport.id)
+    )
+    return case(
+        (previous.is_(None), None),
+        (column < previous, column),
+        else_=column - previous
+    )
+
+
+def report_deltas(brand, product=None, first=None, last=None):
+    """Per-report deltas and recomputed ACOS for one brand, computed in SQL.
+
+    Optionally only one product's reports dated first..last; the first of
+    those then has no previous report and a NULL delta. Money totals and
+    deltas are integer cents.
+    """
+    rows = db.session.query(
+        DailyReport.id.label('report_id'),
+        DailyReport.brand,
+        DailyReport.product,
+        DailyReport.date_report,
+        *[_report_column(field).label(field) for field in CUMULATIVE_FIELDS],
+        *[_sql_delta(_report_column(field)).label(delta)
+          for field, delta in CUMULATIVE_FIELDS.items()],
+        case(
+            (cents(DailyReport.ads_sales_total) > 0,
+             cents(DailyReport.ads_spend_total) * 100.0 / cents(DailyReport.ads_sales_total)),
+            else_=None
+        ).label('acos_derived')
+    ).filter(DailyReport.brand == brand)
+    if product is not None:
+        rows = rows.filter(DailyReport.product == product, DailyReport.date_report.between(first, last))
+
+    columns = ['report_id', 'brand', 'product', 'date_report', *CUMULATIVE_FIELDS,
+               *CUMULATIVE_FIELDS.values(), 'acos_derived']
+    return pd.DataFrame([tuple(r) for r in rows.all()], columns=columns)
+
+
+def add_daily_deltas(df, keys=('brand', 'product'), fields=CUMULATIVE_FIELDS):
+    """Vectorized pandas equivalent of the SQL deltas.
+
+    df must be sorted by date within each key group. Adds one delta column
+    per running-total field, with the same reset rule as _sql_delta.
+    """
+    grouped = df.groupby(list(keys), sort=False)
+    for field in fields:
+        delta = CUMULATIVE_FIELDS[field]
+        previous = grouped[field].shift()
+        current = df[field].astype(float)
+        df[delta] = np.where(current < previous, current, current - previous)
+        df.loc[previous.isna(), delta] = np.nan
+    return df
+
+
+def brand_daily_metrics(frame):
+    """Roll per-report deltas up to one row per brand per day, with rolling sums."""
+    frame = frame.assign(date=pd.to_datetime(frame['date_report'], format='%Y-%m-%d', errors='coerce'))
+    frame = frame.dropna(subset=['date'])
+    if frame.empty:
+        return frame
+
+    daily = frame.groupby(['brand', 'date']).agg(
+        ads_spend_total=('ads_spend_total', 'max'),
+        ads_sales_total=('ads_sales_total', 'max'),
+        unit_sales_delta=('unit_sales_delta', 'sum'),
+        vine_orders_delta=('vine_orders_delta', 'sum')
+    ).reset_index().sort_values(['brand', 'date'])
+
+    # Ads totals are brand-level, so take the delta of the brand's daily value
+    add_daily_deltas(daily, keys=('brand',), fields=BRAND_LEVEL_FIELDS)
+
+    sales = daily['ads_sales_delta']
+    daily['acos_derived'] = (daily['ads_spend_delta'] * 100.0 / sales).where(sales > 0)
+
+    rolling_source = daily.set_index('date').groupby('brand')[
+        ['ads_spend_delta', 'ads_sales_delta', 'unit_sales_delta']
+    ]
+    for window in ROLLING_WINDOWS:
+        rolled = rolling_source.rolling(f'{window}D').sum()
+        daily[f'ads_spend_{window}d'] = rolled['ads_spend_delta'].to_numpy()
+        daily[f'ads_sales_{window}d'] = rolled['ads_sales_delta'].to_numpy()
+        daily[f'unit_sales_{window}d'] = rolled['unit_sales_delta'].to_numpy()
+
+    daily['date_report'] = daily['date'].dt.strftime('%Y-%m-%d')
+    return daily
+
+
+def _records(df, columns):
+    """DataFrame rows as insert dicts: NaN → None, whole-number columns as int, money from cents."""
+    records = []
+    for row in df[columns].to_dict('records'):
+        for key, value in row.items():
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                row[key] = None
+            elif key in INTEGER_COLUMNS:
+                row[key] = int(round(value))
+            elif key in MONEY_COLUMNS:
+                row[key] = from_cents(round(value))
+            elif isinstance(value, np.generic):
+                row[key] = value.item()
+        records.append(row)
+    return records
+
+
+REPORT_METRIC_COLUMNS = ['report_id', 'brand', 'product', 'date_report',
+                         *CUMULATIVE_FIELDS.values(), 'acos_derived']
+
+DAILY_METRIC_COLUMNS = ['brand', 'date_report', *CUMULATIVE_FIELDS.values(), 'acos_derived'] + [
+    f'{field}_{window}d' for window in ROLLING_WINDOWS for field in ('ads_spend', 'ads_sales', 'unit_sales')
+]
+
+
+def refresh_brand_metrics(brand):
+    """Recompute and store the derived metrics for one brand; the caller commits."""
+    frame = report_deltas(brand)
+
+    ReportMetrics.query.filter_by(brand=brand).delete()
+    BrandDailyMetrics.query.filter_by(brand=brand).delete()
+    if frame.empty:
+        return
+
+    db.session.execute(insert(ReportMetrics), _records(frame, REPORT_METRIC_COLUMNS))
+
+    daily = brand_daily_metrics(frame)
+    if not daily.empty:
+        db.session.execute(insert(BrandDailyMetrics), _records(daily, DAILY_METRIC_COLUMNS))
+
+
+def _iso_day(value, days=0):
+    return (datetime.strptime(value, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def _neighbour_day(brand, before=None, after=None, product=None):
+    """The brand's (or product's) closest report date before/after a date, or None."""
+    column = DailyReport.date_report
+    query = db.session.query(func.max(column) if before else func.min(column))\
+        .filter(DailyReport.brand == brand, column.like('____-__-__'))
+    if product is not None:
+        query = query.filter(DailyReport.product == product)
+    return query.filter(column < before if before else column > after).scalar()
+
+
+def _stored_daily_frame(brand, first, last):
+    """Stored per-report deltas joined to their totals, for the brand's days first..last."""
+    rows = db.session.query(
+        DailyReport.brand,
+        DailyReport.date_report,
+        *[_report_column(field).label(field) for field in BRAND_LEVEL_FIELDS],
+        ReportMetrics.unit_sales_delta,
+        ReportMetrics.vine_orders_delta
+    ).join(ReportMetrics, ReportMetrics.report_id == DailyReport.id).filter(
+        DailyReport.brand == brand,
+        DailyReport.date_report.between(first, last)
+    ).all()
+    columns = ['brand', 'date_report', *BRAND_LEVEL_FIELDS, 'unit_sales_delta', 'vine_orders_delta']
+    return pd.DataFrame([tuple(r) for r in rows], columns=columns)
+
+
+def refresh_report_metrics(brand, product, date_report):
+    """Update the derived metrics touched by one saved report; the caller commits.
+
+    Recomputes the report's own deltas and those of the product's next
+    report, then the brand-day rows whose daily deltas or rolling windows
+    include the changed days. Rows are upserted, so concurrent submits for
+    the same brand overwrite each other's rows instead of failing.
+    """
+    try:
+        _iso_day(date_report)
+    except (TypeError, ValueError):
+        # Hand-typed dates have no brand-day rows; recompute the brand as before
+        refresh_brand_metrics(brand)
+        return
+
+    # The product's previous report is read only as the base of the LAG
+    previous = _neighbour_day(brand, before=date_report, product=product) or date_report
+    following = _neighbour_day(brand, after=date_report, product=product)
+    frame = report_deltas(brand, product, previous, following or date_report)
+    frame = frame[frame['date_report'] >= date_report]
+    upsert(ReportMetrics, _records(frame, REPORT_METRIC_COLUMNS), keys=('report_id',))
+
+    # Changed daily deltas: this day, the brand's next day (ads totals are
+    # brand-level) and the product's next day; rolling windows run 29 days on
+    changed = [day for day in (date_report, _neighbour_day(brand, after=date_report), following) if day]
+    last = _iso_day(max(changed), max(ROLLING_WINDOWS) - 1)
+    lookback = _iso_day(date_report, -(max(ROLLING_WINDOWS) - 1))
+    # One earlier day as the base of that day's brand-level delta
+    first = _neighbour_day(brand, before=lookback) or lookback
+
+    daily = brand_daily_metrics(_stored_daily_frame(brand, first, last))
+    if not daily.empty:
+        daily = daily[daily['date_report'] >= date_report]
+        upsert(BrandDailyMetrics, _records(daily, DAILY_METRIC_COLUMNS), keys=('brand', 'date_report'))
+
+
+def refresh_all_metrics():
+    """Recompute derived metrics for every brand. Returns the number of brands."""
+    brands = [b[0] for b in db.session.query(DailyReport.brand).distinct().all() if b[0]]
+    for brand in brands:
+        refresh_brand_metrics(brand)
+    db.session.commit()
+    return len(brands)
@@ -0,0 +1,184 @@
+"""Schema upgrades for databases created by an older version of the app.
+
+db.create_all() only creates missing tables, so changes to existing tables
+are applied here, once each, in order. Each migration must also be safe on
+a fresh database where create_all already built the current schema.
+"""
+from sqlalchemy import Integer, inspect, text
+
+from models import db, DailyReportFields, get_bangkok_now
+from money import Cents
+from status_events import rebuild_status_events
+from archive import archive_amounts_to_cents, index_archived_orders
+
+
+def _columns(table):
+    return {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+
+def add_column_if_missing(table, column, ddl_type):
+    if column not in _columns(table):
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+
+
+def migrate_daily_report_unique_day():
+    """One report per brand/product/day: archive duplicates, add the unique index."""
+    add_column_if_missing('daily_reports', 'updated_at', 'TIMESTAMP')
+    db.session.execute(text('UPDATE daily_reports SET updated_at = created_at WHERE updated_at IS NULL'))
+
+    # Keep the latest submission of each day; older ones go to the history table
+    fields = DailyReportFields.field_names()
+    ranked = f'''
+        SELECT {', '.join(fields)}, id,
+            FIRST_VALUE(id) OVER (
+                PARTITION BY brand, product, date_report ORDER BY created_at DESC, id DESC
+            ) AS keep_id,
+            ROW_NUMBER() OVER (
+                PARTITION BY brand, product, date_report ORDER BY created_at DESC, id DESC
+            ) AS rn
+        FROM daily_reports
+        WHERE date_report IS NOT NULL
+    '''
+    db.session.execute(text(f'''
+        INSERT INTO daily_report_history (report_id, superseded_at, {', '.join(fields)})
+        SELECT keep_id, :now, {', '.join(fields)}
+        FROM ({ranked}) ranked
+        WHERE rn > 1
+    '''), {'now': get_bangkok_now().replace(tzinfo=None)})
+    db.session.execute(text(f'''
+        DELETE FROM daily_reports
+        WHERE id IN (SELECT id FROM ({ranked}) ranked WHERE rn > 1)
+    '''))
+
+    db.session.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_report_day '
+        'ON daily_reports (brand, product, date_report)'
+    ))
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_daily_reports_updated_at ON daily_reports (updated_at)'
+    ))
+
+
+def backfill_status_events():
+    """Derive status_events from the reports submitted before it existed."""
+    rebuild_status_events()
+
+
+def add_employee_day_index():
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_daily_report_employee_day '
+        'ON daily_reports (employee_name, date_report)'
+    ))
+
+
+def add_transaction_brand_posted_index():
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_amazon_tx_brand_posted '
+        'ON amazon_transactions (brand, posted_date)'
+    ))
+
+
+def add_transaction_brand_order_index():
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_amazon_tx_brand_order '
+        'ON amazon_transactions (brand, amazon_order_id)'
+    ))
+
+
+def add_transaction_import_id():
+    """Link amazon_transactions rows to their settlement_imports manifest."""
+    add_column_if_missing('amazon_transactions', 'import_id', 'INTEGER')
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_amazon_tx_import ON amazon_transactions (import_id)'
+    ))
+
+
+def add_field_stats_streak():
+    """Track runs of flagged values so a sustained level shift joins the baseline."""
+    add_column_if_missing('product_field_stats', 'streak_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column_if_missing('product_field_stats', 'streak_mean', 'FLOAT NOT NULL DEFAULT 0')
+    add_column_if_missing('product_field_stats', 'streak_m2', 'FLOAT NOT NULL DEFAULT 0')
+
+
+def backfill_archived_orders():
+    """Record the orders of months archived before archived_orders existed."""
+    index_archived_orders()
+
+
+def _rebuild_sqlite_table(table, money_columns, existing_columns, indexes):
+    """SQLite can't change a column's type: copy the rows into a fresh table."""
+    old = f'{table.name}_before_cents'
+    for index in indexes:
+        db.session.execute(text(f'DROP INDEX {index}'))
+    db.session.execute(text(f'ALTER TABLE {table.name} RENAME TO {old}'))
+    table.create(db.session.connection())
+
+    names = [column.name for column in table.columns if column.name in existing_columns]
+    values = [f'CAST(ROUND({name} * 100) AS INTEGER)' if name in money_columns else name for name in names]
+    db.session.execute(text(
+        f'INSERT INTO {table.name} ({", ".join(names)}) SELECT {", ".join(values)} FROM {old}'
+    ))
+    db.session.execute(text(f'DROP TABLE {old}'))
+
+
+def migrate_money_to_cents():
+    """Store money columns as BIGINT cents instead of floats (see money.py)."""
+    for table in db.metadata.sorted_tables:
+        inspector = inspect(db.session.connection())
+        if not inspector.has_table(table.name):
+            continue
+        columns = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        money_columns = [column.name for column in table.columns
+                         if isinstance(column.type, Cents) and column.name in columns
+                         and not isinstance(columns[column.name], Integer)]
+        if not money_columns:
+            continue
+
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text(f'ALTER TABLE {table.name} ' + ', '.join(
+                f'ALTER COLUMN {column} TYPE BIGINT USING ROUND({column} * 100)::BIGINT'
+                for column in money_columns
+            )))
+        else:
+            indexes = [index['name'] for index in inspector.get_indexes(table.name)]
+            _rebuild_sqlite_table(table, money_columns, columns, indexes)
+
+    archive_amounts_to_cents()
+
+
+# (version, function) in the order they must run
+MIGRATIONS = [
+    ('0001_daily_report_unique_day', migrate_daily_report_unique_day),
+    ('0002_status_events', backfill_status_events),
+    ('0003_daily_report_employee_day', add_employee_day_index),
+    ('0004_amazon_tx_brand_posted', add_transaction_brand_posted_index),
+    ('0005_amazon_tx_brand_order', add_transaction_brand_order_index),
+    ('0006_money_cents', migrate_money_to_cents),
+    ('0007_settlement_imports', add_transaction_import_id),
+    ('0008_field_stats_streak', add_field_stats_streak),
+    ('0009_archived_orders', backfill_archived_orders),
+]
+
+
+def run_migrations():
+    """Apply pending migrations. Returns the versions applied."""
+    db.session.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)'
+    ))
+    db.session.commit()
+    applied = {row[0] for row in db.session.execute(text('SELECT version FROM schema_migrations'))}
+
+    newly_applied = []
+    for version, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate()
+        db.session.execute(
+            text('INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)'),
+            {'version': version, 'applied_at': get_bangkok_now().replace(tzinfo=None)}
+        )
+        db.session.commit()
+        newly_applied.append(version)
+
+    return newly_applied
@@ -1,20 +1,80 @@
 from flask_sqlalchemy import SQLAlchemy
+from contextlib import contextmanager
 from datetime import datetime
+import threading
 import pytz
+from sqlalchemy.dialects import postgresql, sqlite
 
-db = SQLAlchemy()
+from money import Cents, as_float
+from replica import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def get_bangkok_now():
     """Get current datetime in Bangkok timezone."""
     bangkok_tz = pytz.timezone('Asia/Bangkok')
     return datetime.now(bangkok_tz)
 
-class DailyReport(db.Model):
-    """Model for daily employee reports."""
-    
-    __tablename__ = 'daily_reports'
+def upsert(model, records, keys):
+    """INSERT records (dicts) into model's table, updating rows that clash on keys; the caller commits.
+
+    keys must match a unique constraint. Uses ON CONFLICT ... DO UPDATE, so
+    concurrent writers of the same row overwrite instead of failing; records
+    with only the key columns are inserted with ON CONFLICT DO NOTHING.
+    """
+    if not records:
+        return
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(model.__table__)
+    updates = {name: statement.excluded[name] for name in records[0] if name not in keys}
+    if updates:
+        statement = statement.on_conflict_do_update(index_elements=list(keys), set_=updates)
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=list(keys))
+    db.session.execute(statement, records)
+
+def begin_write():
+    """Take the write lock for the session's transaction now (SQLite only).
+
+    pysqlite starts a deferred transaction at the first INSERT/UPDATE/DELETE,
+    so concurrent writers fight over the lock mid-transaction and can give up
+    with "database is locked". BEGIN IMMEDIATE queues them on the busy
+    timeout before their first read instead. No-op elsewhere or when the
+    transaction has already written.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    connection = db.session.connection()
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+_sqlite_writer = threading.Lock()
+
+@contextmanager
+def serialized_write():
+    """Run a write transaction one thread at a time in this process (SQLite only).
+
+    SQLite's busy handler polls, so with many threads in one worker a
+    writer can lose every retry until busy_timeout expires. Threads queue
+    on a lock instead; other workers still wait on the busy timeout.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        yield
+        return
+    with _sqlite_writer:
+        yield
+
+def bump_version(name):
+    """Add one to a DataVersion counter in the session's transaction; the caller commits."""
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(DataVersion.__table__).values(name=name, version=1)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['name'], set_={'version': DataVersion.__table__.c.version + 1}
+    ))
+
+class DailyReportFields:
+    """Columns shared by daily reports and their superseded versions."""
     
-    id = db.Column(db.Integer, primary_key=True)
     report_date = db.Column(db.Date, nullable=False, index=True)
     created_at = db.Column(db.DateTime, nullable=False)
     
@@ -23,7 +83,7 @@ class DailyReport(db.Model):
     brand = db.Column(db.String(100), nullable=False, index=True)
     product = db.Column(db.String(200), nullable=False, index=True)  # Product name
     date_report = db.Column(db.String(20), nullable=True)  # User-typed date
-    current_balance = db.Column(db.Float, nullable=False, default=0.0)
+    current_balance = db.Column(Cents, nullable=False, default=0)
     release_date_balance = db.Column(db.String(20), nullable=True)  # Date money transferred
     
     # Account Status (required) - Healthy/Unhealthy
@@ -50,9 +110,9 @@ class DailyReport(db.Model):
     sub_niche_ranking = db.Column(db.Integer, nullable=True, default=0)
     
     # Advertising
-    ads_spend_total = db.Column(db.Float, nullable=True, default=0.0)
-    ads_sales_total = db.Column(db.Float, nullable=True, default=0.0)
-    ads_sales_today = db.Column(db.Float, nullable=True, default=0.0)  # NEW
+    ads_spend_total = db.Column(Cents, nullable=True, default=0)
+    ads_sales_total = db.Column(Cents, nullable=True, default=0)
+    ads_sales_today = db.Column(Cents, nullable=True, default=0)  # NEW
     acos = db.Column(db.Float, nullable=True, default=0.0)
     impressions = db.Column(db.Integer, nullable=True, default=0)
     
@@ -61,11 +121,34 @@ class DailyReport(db.Model):
     shopify_total_dpv = db.Column(db.Integer, nullable=True, default=0)
     shopify_total_atc = db.Column(db.Integer, nullable=True, default=0)
     shopify_total_purchases = db.Column(db.Integer, nullable=True, default=0)
-    shopify_total_product_sales = db.Column(db.Float, nullable=True, default=0.0)
+    shopify_total_product_sales = db.Column(Cents, nullable=True, default=0)
+    
+    def copy_fields_from(self, other):
+        """Copy every report field (not id/timestamps) from another report."""
+        for column in DailyReportFields.field_names():
+            setattr(self, column, getattr(other, column))
+    
+    @staticmethod
+    def field_names():
+        return [name for name, value in vars(DailyReportFields).items()
+                if isinstance(value, db.Column)]
+
+
+class DailyReport(DailyReportFields, db.Model):
+    """Model for daily employee reports (one per brand, product and day)."""
+    
+    __tablename__ = 'daily_reports'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    updated_at = db.Column(db.DateTime, nullable=True, index=True)  # Last resubmission
     
-    # Composite index for brand + report_date queries
     __table_args__ = (
+        # Composite index for brand + report_date queries
         db.Index('ix_brand_report_date', 'brand', 'report_date'),
+        # Resubmissions for the same day replace the report (see submissions.py)
+        db.Index('uq_daily_report_day', 'brand', 'product', 'date_report', unique=True),
+        # Completeness board: who has reported for a given day
+        db.Index('ix_daily_report_employee_day', 'employee_name', 'date_report'),
     )
     
     def __repr__(self):
@@ -81,7 +164,7 @@ class DailyReport(db.Model):
             'brand': self.brand,
             'product': self.product,
             'date_report': self.date_report,
-            'current_balance': self.current_balance,
+            'current_balance': as_float(self.current_balance),
             'release_date_balance': self.release_date_balance,
             'new_orders': self.new_orders,
             'vine_total_orders': self.vine_total_orders,
@@ -92,16 +175,16 @@ class DailyReport(db.Model):
             'average_rating': self.average_rating,
             'main_niche_ranking': self.main_niche_ranking,
             'sub_niche_ranking': self.sub_niche_ranking,
-            'ads_spend_total': self.ads_spend_total,
-            'ads_sales_total': self.ads_sales_total,
-            'ads_sales_today': self.ads_sales_today,
+            'ads_spend_total': as_float(self.ads_spend_total),
+            'ads_sales_total': as_float(self.ads_sales_total),
+            'ads_sales_today': as_float(self.ads_sales_today),
             'acos': self.acos,
             'impressions': self.impressions,
             'shopify_click_throughs': self.shopify_click_throughs,
             'shopify_total_dpv': self.shopify_total_dpv,
             'shopify_total_atc': self.shopify_total_atc,
             'shopify_total_purchases': self.shopify_total_purchases,
-            'shopify_total_product_sales': self.shopify_total_product_sales,
+            'shopify_total_product_sales': as_float(self.shopify_total_product_sales),
             'account_status_us': self.account_status_us,
             'account_status_mexico': self.account_status_mexico,
             'account_status_canada': self.account_status_canada,
@@ -111,6 +194,215 @@ class DailyReport(db.Model):
         }
 
 
+class DailyReportHistory(DailyReportFields, db.Model):
+    """Superseded versions of daily reports, kept when a report is resubmitted."""
+    
+    __tablename__ = 'daily_report_history'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.Integer, nullable=False, index=True)  # DailyReport.id it was replaced in
+    superseded_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<DailyReportHistory {self.report_id} - {self.superseded_at}>'
+
+
+class DataVersion(db.Model):
+    """Named counter bumped in the same transaction as each change to a table.
+
+    Commits are serialized on the row, so a higher version always includes
+    every change of a lower one (unlike max(updated_at), which a late commit
+    can leave unchanged).
+    """
+    
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)  # Table name
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.name} - {self.version}>'
+
+
+class ReportMetrics(db.Model):
+    """Daily deltas derived from the running totals on each report."""
+    
+    __tablename__ = 'report_metrics'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.Integer, nullable=False, unique=True)
+    brand = db.Column(db.String(100), nullable=False, index=True)
+    product = db.Column(db.String(200), nullable=False)
+    date_report = db.Column(db.String(20), nullable=True)
+    
+    # Change since the product's previous report (None for the first report)
+    ads_spend_delta = db.Column(Cents, nullable=True)
+    ads_sales_delta = db.Column(Cents, nullable=True)
+    unit_sales_delta = db.Column(db.Integer, nullable=True)
+    vine_orders_delta = db.Column(db.Integer, nullable=True)
+    
+    # ACOS recomputed from the running totals instead of the typed-in value
+    acos_derived = db.Column(db.Float, nullable=True)
+    
+    def __repr__(self):
+        return f'<ReportMetrics {self.report_id}>'
+
+
+class BrandDailyMetrics(db.Model):
+    """Per-brand daily deltas and rolling sums."""
+    
+    __tablename__ = 'brand_daily_metrics'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    brand = db.Column(db.String(100), nullable=False)
+    date_report = db.Column(db.String(20), nullable=False)
+    
+    ads_spend_delta = db.Column(Cents, nullable=True)
+    ads_sales_delta = db.Column(Cents, nullable=True)
+    unit_sales_delta = db.Column(db.Integer, nullable=True)
+    vine_orders_delta = db.Column(db.Integer, nullable=True)
+    acos_derived = db.Column(db.Float, nullable=True)  # Daily spend ÷ daily sales
+    
+    # Rolling sums over the last 7 / 30 calendar days
+    ads_spend_7d = db.Column(Cents, nullable=True)
+    ads_sales_7d = db.Column(Cents, nullable=True)
+    unit_sales_7d = db.Column(db.Integer, nullable=True)
+    ads_spend_30d = db.Column(Cents, nullable=True)
+    ads_sales_30d = db.Column(Cents, nullable=True)
+    unit_sales_30d = db.Column(db.Integer, nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('brand', 'date_report', name='uq_brand_daily_metrics'),
+    )
+    
+    def __repr__(self):
+        return f'<BrandDailyMetrics {self.brand} - {self.date_report}>'
+
+
+class ProductFieldStats(db.Model):
+    """Running mean/variance of a report field per product (Welford)."""
+    
+    __tablename__ = 'product_field_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    brand = db.Column(db.String(100), nullable=False)
+    product = db.Column(db.String(200), nullable=False)
+    field = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0.0)
+    m2 = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # Latest run of flagged values on one side of the mean (a possible new level)
+    streak_count = db.Column(db.Integer, nullable=False, default=0)
+    streak_mean = db.Column(db.Float, nullable=False, default=0.0)
+    streak_m2 = db.Column(db.Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('brand', 'product', 'field', name='uq_product_field_stats'),
+    )
+    
+    def __repr__(self):
+        return f'<ProductFieldStats {self.brand} - {self.product} - {self.field}>'
+
+
+class ReportAnomaly(db.Model):
+    """Model for suspicious values flagged on a daily report."""
+    
+    __tablename__ = 'report_anomalies'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.Integer, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    brand = db.Column(db.String(100), nullable=False, index=True)
+    product = db.Column(db.String(200), nullable=False)
+    employee_name = db.Column(db.String(100), nullable=True)
+    date_report = db.Column(db.String(20), nullable=True)
+    
+    field = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.Float, nullable=True)
+    expected = db.Column(db.Float, nullable=True)  # Running mean at the time
+    z_score = db.Column(db.Float, nullable=True)
+    reason = db.Column(db.String(200), nullable=False)
+    
+    def __repr__(self):
+        return f'<ReportAnomaly {self.report_id} - {self.field} - {self.reason}>'
+
+
+class StatusEvent(db.Model):
+    """Model for account/store status transitions derived from daily reports.
+
+    One row per product, status field and day on which the status differs
+    from the product's previous report (previous_status is NULL for the
+    first report), so the latest event per field is the current status.
+    """
+
+    __tablename__ = 'status_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.Integer, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    
+    brand = db.Column(db.String(100), nullable=False)
+    product = db.Column(db.String(200), nullable=False)
+    employee_name = db.Column(db.String(100), nullable=True)
+    date_report = db.Column(db.String(20), nullable=False)
+    
+    field = db.Column(db.String(50), nullable=False)  # e.g. account_status_us
+    previous_status = db.Column(db.String(20), nullable=True)
+    status = db.Column(db.String(20), nullable=False, index=True)
+    
+    __table_args__ = (
+        db.Index('ix_status_event_product_field', 'brand', 'product', 'field', 'date_report'),
+    )
+    
+    def __repr__(self):
+        return f'<StatusEvent {self.brand} - {self.product} - {self.field}: {self.status}>'
+
+
+class Brand(db.Model):
+    """Model for the brand registry."""
+    
+    __tablename__ = 'brands'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<Brand {self.name}>'
+
+
+class BrandEmployee(db.Model):
+    """Model for the employee → brand assignment."""
+    
+    __tablename__ = 'brand_employees'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    employee_name = db.Column(db.String(100), nullable=False, unique=True)
+    brand = db.Column(db.String(100), nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<BrandEmployee {self.employee_name} - {self.brand}>'
+
+
+class BrandProduct(db.Model):
+    """Model for the brand → product list."""
+    
+    __tablename__ = 'brand_products'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    brand = db.Column(db.String(100), nullable=False, index=True)
+    product = db.Column(db.String(200), nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('brand', 'product', name='uq_brand_product'),
+    )
+    
+    def __repr__(self):
+        return f'<BrandProduct {self.brand} - {self.product}>'
+
+
 class AmazonTransaction(db.Model):
     """Model for Amazon settlement transactions parsed from XML."""
     
@@ -123,7 +415,7 @@ class AmazonTransaction(db.Model):
     # Transaction info
     amazon_order_id = db.Column(db.String(50), nullable=True)
     posted_date = db.Column(db.DateTime, nullable=True)
-    transaction_type = db.Column(db.String(100), nullable=False)  # Order, OtherTransaction, Advertising
+    transaction_type = db.Column(db.String(100), nullable=False)  # Order, Refund, OtherTransaction, Advertising
     marketplace = db.Column(db.String(50), nullable=True)
     
     # Item info (for orders)
@@ -131,17 +423,29 @@ class AmazonTransaction(db.Model):
     quantity = db.Column(db.Integer, nullable=True, default=0)
     
     # Amounts
-    principal_amount = db.Column(db.Float, nullable=True, default=0.0)
-    shipping_amount = db.Column(db.Float, nullable=True, default=0.0)
-    tax_amount = db.Column(db.Float, nullable=True, default=0.0)
-    commission_fee = db.Column(db.Float, nullable=True, default=0.0)
-    fba_fee = db.Column(db.Float, nullable=True, default=0.0)
-    other_fees = db.Column(db.Float, nullable=True, default=0.0)
-    total_amount = db.Column(db.Float, nullable=True, default=0.0)
+    principal_amount = db.Column(Cents, nullable=True, default=0)
+    shipping_amount = db.Column(Cents, nullable=True, default=0)
+    tax_amount = db.Column(Cents, nullable=True, default=0)
+    commission_fee = db.Column(Cents, nullable=True, default=0)
+    fba_fee = db.Column(Cents, nullable=True, default=0)
+    other_fees = db.Column(Cents, nullable=True, default=0)
+    total_amount = db.Column(Cents, nullable=True, default=0)
     
     # Description for non-order transactions
     description = db.Column(db.String(200), nullable=True)
     
+    # SettlementImport the row came from (NULL for rows loaded before manifests)
+    import_id = db.Column(db.Integer, nullable=True)
+    
+    __table_args__ = (
+        # Date-range reads per brand and monthly archival (see archive.py)
+        db.Index('ix_amazon_tx_brand_posted', 'brand', 'posted_date'),
+        # Order lookup and per-order reconciliation (see order_reconciliation.py)
+        db.Index('ix_amazon_tx_brand_order', 'brand', 'amazon_order_id'),
+        # Rolling back one settlement import (see settlement.rollback_import)
+        db.Index('ix_amazon_tx_import', 'import_id'),
+    )
+    
     def __repr__(self):
         return f'<AmazonTransaction {self.brand} - {self.transaction_type} - {self.total_amount}>'
     
@@ -156,17 +460,134 @@ class AmazonTransaction(db.Model):
             'marketplace': self.marketplace,
             'sku': self.sku,
             'quantity': self.quantity,
-            'principal_amount': self.principal_amount,
-            'shipping_amount': self.shipping_amount,
-            'tax_amount': self.tax_amount,
-            'commission_fee': self.commission_fee,
-            'fba_fee': self.fba_fee,
-            'other_fees': self.other_fees,
-            'total_amount': self.total_amount,
-            'description': self.description
+            'principal_amount': as_float(self.principal_amount),
+            'shipping_amount': as_float(self.shipping_amount),
+            'tax_amount': as_float(self.tax_amount),
+            'commission_fee': as_float(self.commission_fee),
+            'fba_fee': as_float(self.fba_fee),
+            'other_fees': as_float(self.other_fees),
+            'total_amount': as_float(self.total_amount),
+            'description': self.description,
+            'import_id': self.import_id
+        }
+
+
+class SettlementImport(db.Model):
+    """Manifest of one imported settlement file, summarized while parsing."""
+    
+    __tablename__ = 'settlement_imports'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    brand = db.Column(db.String(100), nullable=False, index=True)
+    settlement_id = db.Column(db.String(50), nullable=True)  # AmazonSettlementID
+    filename = db.Column(db.String(200), nullable=True)
+    file_hash = db.Column(db.String(64), nullable=False, unique=True)  # SHA-256 of the file
+    imported_at = db.Column(db.DateTime, nullable=False)
+    
+    # Settlement period (StartDate/EndDate, else the posted date range) and deposit
+    start_date = db.Column(db.DateTime, nullable=True)
+    end_date = db.Column(db.DateTime, nullable=True)
+    deposit_total = db.Column(Cents, nullable=True)  # TotalAmount
+    
+    # Rows by transaction type
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    order_rows = db.Column(db.Integer, nullable=False, default=0)
+    refund_rows = db.Column(db.Integer, nullable=False, default=0)
+    other_rows = db.Column(db.Integer, nullable=False, default=0)
+    advertising_rows = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Totals over the imported rows
+    principal_total = db.Column(Cents, nullable=False, default=0)  # Order + Refund principal
+    fees_total = db.Column(Cents, nullable=False, default=0)  # FBA, commission and other fees
+    advertising_total = db.Column(Cents, nullable=False, default=0)
+    net_total = db.Column(Cents, nullable=False, default=0)  # Sum of total_amount
+    
+    def __repr__(self):
+        return f'<SettlementImport {self.brand} - {self.settlement_id} - {self.row_count}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'brand': self.brand,
+            'settlement_id': self.settlement_id,
+            'filename': self.filename,
+            'file_hash': self.file_hash,
+            'imported_at': self.imported_at.strftime('%d/%m/%Y %H:%M:%S') if self.imported_at else None,
+            'start_date': self.start_date.strftime('%d/%m/%Y') if self.start_date else None,
+            'end_date': self.end_date.strftime('%d/%m/%Y') if self.end_date else None,
+            'deposit_total': as_float(self.deposit_total),
+            'row_count': self.row_count,
+            'order_rows': self.order_rows,
+            'refund_rows': self.refund_rows,
+            'other_rows': self.other_rows,
+            'advertising_rows': self.advertising_rows,
+            'principal_total': as_float(self.principal_total),
+            'fees_total': as_float(self.fees_total),
+            'advertising_total': as_float(self.advertising_total),
+            'net_total': as_float(self.net_total)
         }
 
 
+class TransactionArchive(db.Model):
+    """Manifest of amazon_transactions months moved to Parquet files."""
+    
+    __tablename__ = 'transaction_archives'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.String(7), nullable=False, unique=True)  # YYYY-MM of posted_date
+    filename = db.Column(db.String(200), nullable=False)  # Relative to ARCHIVE_DIR
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(Cents, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=True)  # Last merge of late rows
+    
+    def __repr__(self):
+        return f'<TransactionArchive {self.month} - {self.row_count}>'
+
+
+class ArchivedOrder(db.Model):
+    """An order with rows in an archived month, recorded when the month is archived.
+
+    Lets the order ledger leave out orders split across the archive with an
+    anti-join instead of reading the Parquet files.
+    """
+    
+    __tablename__ = 'archived_orders'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    brand = db.Column(db.String(100), nullable=False)
+    amazon_order_id = db.Column(db.String(50), nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('brand', 'amazon_order_id', name='uq_archived_order'),
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedOrder {self.brand} - {self.amazon_order_id}>'
+
+
+class AdSpendReconciliation(db.Model):
+    """Employee-reported vs settled ad spend per brand per day (see ad_spend.py)."""
+    
+    __tablename__ = 'ad_spend_reconciliation'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    brand = db.Column(db.String(100), nullable=False)
+    date_report = db.Column(db.String(20), nullable=False)  # YYYY-MM-DD
+    
+    reported_spend = db.Column(Cents, nullable=True)  # BrandDailyMetrics.ads_spend_delta
+    settled_spend = db.Column(Cents, nullable=False, default=0)  # Advertising rows posted that day
+    variance = db.Column(Cents, nullable=False, default=0)  # Reported - settled
+    updated_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('brand', 'date_report', name='uq_ad_spend_reconciliation'),
+    )
+    
+    def __repr__(self):
+        return f'<AdSpendReconciliation {self.brand} - {self.date_report} - {self.variance}>'
+
+
 class ShipmentCost(db.Model):
     """Model for manual shipment/order cost entries."""
     
@@ -180,7 +601,7 @@ class ShipmentCost(db.Model):
     cost_date = db.Column(db.Date, nullable=False)
     product = db.Column(db.String(200), nullable=False)
     cost_type = db.Column(db.String(100), nullable=False)
-    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    total_amount = db.Column(Cents, nullable=False, default=0)
     
     def __repr__(self):
         return f'<ShipmentCost {self.brand} - {self.product} - {self.total_amount}>'
@@ -193,5 +614,5 @@ class ShipmentCost(db.Model):
             'cost_date': self.cost_date.strftime('%d/%m/%Y') if self.cost_date else None,
             'product': self.product,
             'cost_type': self.cost_type,
-            'total_amount': self.total_amount
+            'total_amount': as_float(self.total_amount)
         }
@@ -0,0 +1,70 @@
+"""Money amounts stored as integer cents.
+
+Cents columns hold BIGINT minor units in the database and Decimal values
+in Python, so sums are exact integer SUMs in SQL and exact Decimal sums in
+Python. Aggregation code that works on whole columns selects the raw
+integers with cents() and converts back at the edge.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from sqlalchemy import BigInteger, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+CENTS_PER_UNIT = 100
+
+CENT = Decimal('0.01')
+
+
+def parse_amount(value):
+    """A typed-in or parsed amount as a Decimal rounded to the cent (blank → 0)."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return Decimal('0.00')
+    try:
+        # str() first so a float converts at its shortest repr (0.1, not 0.1000000000000000055)
+        amount = Decimal(str(value).strip().replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value!r}')
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount: {value!r}')
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_cents(value):
+    """Integer cents for an amount (Decimal, str, int or float); None stays None."""
+    if value is None:
+        return None
+    return int(parse_amount(value) * CENTS_PER_UNIT)
+
+
+def from_cents(cents):
+    """Decimal amount for integer cents; None stays None."""
+    if cents is None:
+        return None
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def as_float(amount):
+    """An amount for JSON and charts; None stays None."""
+    return None if amount is None else float(amount)
+
+
+def cents(column):
+    """A Cents column (or expression) as its raw integer cents."""
+    return type_coerce(column, BigInteger)
+
+
+class Cents(TypeDecorator):
+    """Money column: BIGINT cents in the database, Decimal in Python."""
+
+    impl = BigInteger
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return Decimal
+
+    def process_bind_param(self, value, dialect):
+        return to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return from_cents(value)
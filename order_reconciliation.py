@@ -0,0 +1,150 @@
+"""Per-order reconciliation of Amazon settlement transactions.
+
+An order's charge, refund, fee and OtherTransaction rows share its
+amazon_order_id; they are grouped per (brand, amazon_order_id), which the
+ix_amazon_tx_brand_order index serves, and netted in SQL as integer cents.
+Results are returned in currency units.
+
+The ledger reads the table only. Orders that also have rows in archived
+months (e.g. a charge archived, its refund still in the table) would show
+a partial net, so anomalous_orders() leaves them out with an anti-join on
+archived_orders (filled when a month is archived) and counts them;
+order_transactions() reads both and shows the whole order.
+"""
+from sqlalchemy import and_, case, exists, func, or_, select, true
+
+from models import db, AmazonTransaction, ArchivedOrder
+from archive import transactions_frame
+from money import CENTS_PER_UNIT, cents
+
+# Ledger column -> (transaction types, amount columns summed over them).
+# Together they add up to the net, the sum of total_amount.
+LEDGER_COLUMNS = {
+    'principal': (('Order',), ('principal_amount',)),
+    'shipping_and_tax': (('Order',), ('shipping_amount', 'tax_amount')),
+    'fees': (('Order', 'Refund'), ('fba_fee', 'commission_fee', 'other_fees')),
+    'refunds': (('Refund',), ('principal_amount', 'shipping_amount', 'tax_amount')),
+    'adjustments': (('OtherTransaction',), ('total_amount',)),
+}
+
+# An order is flagged when its net is negative or this many standard
+# deviations away from the brand's mean order net
+DEFAULT_DEVIATIONS = 3.0
+
+
+def _is_archived():
+    """Whether the transaction row's order also has rows in archived months (uq_archived_order)."""
+    return exists().where(and_(
+        ArchivedOrder.brand == AmazonTransaction.brand,
+        ArchivedOrder.amazon_order_id == AmazonTransaction.amazon_order_id
+    ))
+
+
+def split_order_count(brand):
+    """How many orders of a brand have rows both in the table and in archived months."""
+    return db.session.execute(
+        select(func.count(AmazonTransaction.amazon_order_id.distinct()))
+        .where(AmazonTransaction.brand == brand, _is_archived())
+    ).scalar()
+
+
+def ledger_query(brand, exclude_split=False):
+    """One row per order of a brand: row count, posted range, ledger columns and net (cents).
+
+    With exclude_split, orders that also have archived rows are left out.
+    """
+    def amount(column):
+        return func.coalesce(cents(getattr(AmazonTransaction, column)), 0)
+
+    ledger_columns = []
+    for name, (types, columns) in LEDGER_COLUMNS.items():
+        total = sum((amount(column) for column in columns[1:]), amount(columns[0]))
+        ledger_columns.append(func.sum(
+            case((AmazonTransaction.transaction_type.in_(types), total), else_=0)
+        ).label(name))
+
+    return select(
+        AmazonTransaction.amazon_order_id.label('order_id'),
+        func.count().label('rows'),
+        func.min(AmazonTransaction.posted_date).label('first_posted'),
+        func.max(AmazonTransaction.posted_date).label('last_posted'),
+        *ledger_columns,
+        func.sum(amount('total_amount')).label('net'),
+    ).where(
+        AmazonTransaction.brand == brand,
+        AmazonTransaction.amazon_order_id.isnot(None),
+        AmazonTransaction.amazon_order_id != '',
+        ~_is_archived() if exclude_split else true()
+    ).group_by(AmazonTransaction.amazon_order_id)
+
+
+def order_transactions(brand, order_id):
+    """All rows of one order, archived months included, oldest first."""
+    frame = transactions_frame(brand, order_id)
+    return frame.sort_values(['posted_date', 'id'], na_position='first')
+
+
+def summarize_order(frame):
+    """The ledger row of one order, computed from its transaction rows."""
+    summary = {
+        'rows': len(frame),
+        'first_posted': frame['posted_date'].min() if len(frame) else None,
+        'last_posted': frame['posted_date'].max() if len(frame) else None,
+    }
+    for name, (types, columns) in LEDGER_COLUMNS.items():
+        selected = frame.loc[frame['transaction_type'].isin(types), list(columns)]
+        summary[name] = int(selected.fillna(0).to_numpy().sum()) / CENTS_PER_UNIT
+    summary['net'] = int(frame['total_amount'].fillna(0).sum()) / CENTS_PER_UNIT
+    return summary
+
+
+def anomalous_orders(brand, limit=100, deviations=DEFAULT_DEVIATIONS):
+    """Orders with a negative or outlying net, worst first.
+
+    Grouping, the brand's mean and variance of order nets and the filter
+    all run in one SQL statement, so only the flagged orders are returned.
+    Returns (orders, stats) where stats has the order count, mean and
+    standard deviation the flags were computed against, and how many split
+    orders (see split_order_count) were left out.
+    """
+    ledger = ledger_query(brand, exclude_split=True).cte('ledger')
+    stats = select(
+        func.count().label('orders'),
+        func.avg(ledger.c.net).label('mean'),
+        func.avg(ledger.c.net * ledger.c.net).label('mean_square'),
+    ).cte('ledger_stats')
+
+    variance = stats.c.mean_square - stats.c.mean * stats.c.mean
+    deviation = (ledger.c.net - stats.c.mean) * (ledger.c.net - stats.c.mean)
+    negative = ledger.c.net < 0
+
+    rows = db.session.execute(
+        select(
+            ledger,
+            case((negative, 'negative net'), else_='outlier').label('reason'),
+            stats.c.orders, stats.c.mean, variance.label('variance'),
+        ).select_from(ledger.join(stats, true()))
+        .where(or_(negative, deviation > deviations * deviations * variance))
+        .order_by(case((negative, 0), else_=1), deviation.desc())
+        .limit(limit)
+    ).all()
+
+    orders = []
+    for row in rows:
+        order = {column: row._mapping[column] for column in ('order_id', 'rows', 'first_posted', 'last_posted',
+                                                             'reason')}
+        for column in (*LEDGER_COLUMNS, 'net'):
+            order[column] = int(row._mapping[column]) / CENTS_PER_UNIT
+        orders.append(order)
+    if rows:
+        stats_row = rows[0]
+    else:
+        stats_row = db.session.execute(select(stats.c.orders, stats.c.mean, variance.label('variance'))).one()
+    stats = {
+        'orders': stats_row.orders or 0,
+        'mean': round(float(stats_row.mean or 0) / CENTS_PER_UNIT, 2),
+        'std': round(max(float(stats_row.variance or 0), 0) ** 0.5 / CENTS_PER_UNIT, 2),
+        'deviations': deviations,
+        'split_orders': split_order_count(brand),
+    }
+    return orders, stats
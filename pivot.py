@@ -0,0 +1,185 @@
+"""Ad-hoc pivot queries over daily_reports.
+
+A pivot is a list of dimensions (brand, product, employee, day, week, month)
+and metrics ('field:aggregator', e.g. new_orders:sum or acos:avg), plus
+optional brand/product/employee filters and a date range. Both lists are
+checked against allow-lists and compiled to one grouped SELECT, so any
+combination runs as a single round trip and no request text reaches the SQL.
+
+Results are cached by the normalized spec plus data_version(): a counter
+that every saved report bumps in its own transaction, plus the row count for
+rows loaded in bulk. A commit always moves the version forward, so a cached
+answer is never served after a change it does not include.
+"""
+from sqlalchemy import func, literal_column, select
+
+from models import db, DailyReport, DataVersion
+from columnar import FLOAT_FIELDS, INTEGER_FIELDS, MONEY_FIELDS
+from money import CENTS_PER_UNIT, cents
+
+# Dimension name → DailyReport column; day/week/month are derived from date_report
+COLUMN_DIMENSIONS = {
+    'brand': 'brand',
+    'product': 'product',
+    'employee': 'employee_name',
+}
+TIME_DIMENSIONS = ('day', 'week', 'month')
+DIMENSIONS = tuple(COLUMN_DIMENSIONS) + TIME_DIMENSIONS
+
+METRIC_FIELDS = INTEGER_FIELDS + FLOAT_FIELDS + MONEY_FIELDS
+
+AGGREGATORS = {
+    'sum': func.sum,
+    'avg': func.avg,
+    'min': func.min,
+    'max': func.max,
+    'count': func.count,
+}
+
+# 'reports' counts rows rather than aggregating a field
+ROW_COUNT = 'reports'
+
+MAX_DIMENSIONS = 3
+MAX_METRICS = 10
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+
+def _split(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return [part.strip() for part in value or () if part and part.strip()]
+
+
+def parse_spec(dimensions, metrics, filters=None, start_date=None, end_date=None, limit=None):
+    """Validate a pivot request into a hashable spec; raises ValueError.
+
+    dimensions and metrics are lists or comma-separated strings; filters maps
+    column dimensions (brand, product, employee) to the value to match.
+    """
+    dimensions = _split(dimensions)
+    for dimension in dimensions:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f'Unknown dimension {dimension!r}; expected one of {", ".join(DIMENSIONS)}')
+    if len(set(dimensions)) != len(dimensions):
+        raise ValueError('Each dimension may appear once')
+    if len(dimensions) > MAX_DIMENSIONS:
+        raise ValueError(f'At most {MAX_DIMENSIONS} dimensions')
+    if sum(dimension in TIME_DIMENSIONS for dimension in dimensions) > 1:
+        raise ValueError('Use only one of day, week and month')
+
+    parsed_metrics = []
+    for metric in _split(metrics) or [ROW_COUNT]:
+        if metric == ROW_COUNT:
+            parsed_metrics.append((ROW_COUNT, 'count'))
+            continue
+        field, _, aggregator = metric.partition(':')
+        if field not in METRIC_FIELDS:
+            raise ValueError(f'Unknown metric field {field!r}')
+        aggregator = aggregator or 'sum'
+        if aggregator not in AGGREGATORS:
+            raise ValueError(f'Unknown aggregator {aggregator!r}; expected one of {", ".join(AGGREGATORS)}')
+        parsed_metrics.append((field, aggregator))
+    if len(parsed_metrics) > MAX_METRICS:
+        raise ValueError(f'At most {MAX_METRICS} metrics')
+    if len(set(parsed_metrics)) != len(parsed_metrics):
+        raise ValueError('Each metric may appear once')
+
+    parsed_filters = []
+    for dimension, value in sorted((filters or {}).items()):
+        if dimension not in COLUMN_DIMENSIONS:
+            raise ValueError(f'Cannot filter on {dimension!r}')
+        if value:
+            parsed_filters.append((dimension, value))
+
+    limit = DEFAULT_LIMIT if limit is None else int(limit)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+
+    return (tuple(dimensions), tuple(parsed_metrics), tuple(parsed_filters), start_date, end_date, limit)
+
+
+def _metric_label(field, aggregator):
+    return ROW_COUNT if field == ROW_COUNT else f'{field}_{aggregator}'
+
+
+def time_bucket(column, dimension, dialect):
+    """A 'YYYY-MM-DD' text column truncated to a day, week (Monday) or month, as text."""
+    if dimension == 'day':
+        return column
+    if dimension == 'month':
+        return func.substr(column, 1, 7)
+    if dialect == 'postgresql':
+        return func.to_char(func.date_trunc('week', func.to_date(column, 'YYYY-MM-DD')), 'YYYY-MM-DD')
+    # SQLite: back six days, then forward to the next Monday
+    return func.date(column, '-6 days', 'weekday 1')
+
+
+def compile_pivot(spec, dialect):
+    """The single grouped SELECT for a spec from parse_spec()."""
+    dimensions, metrics, filters, start_date, end_date, limit = spec
+
+    group_columns = []
+    for dimension in dimensions:
+        if dimension in TIME_DIMENSIONS:
+            column = time_bucket(DailyReport.date_report, dimension, dialect)
+        else:
+            column = getattr(DailyReport, COLUMN_DIMENSIONS[dimension])
+        group_columns.append(column.label(dimension))
+
+    metric_columns = []
+    for field, aggregator in metrics:
+        if field == ROW_COUNT:
+            metric_columns.append(func.count().label(ROW_COUNT))
+            continue
+        column = getattr(DailyReport, field)
+        if field in MONEY_FIELDS:
+            column = cents(column)
+        metric_columns.append(AGGREGATORS[aggregator](column).label(_metric_label(field, aggregator)))
+
+    query = select(*group_columns, *metric_columns).select_from(DailyReport)
+    for dimension, value in filters:
+        query = query.where(getattr(DailyReport, COLUMN_DIMENSIONS[dimension]) == value)
+    if start_date:
+        query = query.where(DailyReport.date_report >= start_date)
+    if end_date:
+        query = query.where(DailyReport.date_report <= end_date)
+    if any(dimension in TIME_DIMENSIONS for dimension in dimensions):
+        # Skip hand-typed dates that are not YYYY-MM-DD
+        query = query.where(DailyReport.date_report.like('____-__-__'))
+    if group_columns:
+        positions = [literal_column(str(position)) for position in range(1, len(group_columns) + 1)]
+        query = query.group_by(*positions).order_by(*positions)
+    return query.limit(limit)
+
+
+def data_version():
+    """Changes with every committed save (DataVersion) and every insert or delete (the count)."""
+    version = db.session.query(DataVersion.version).filter_by(name=DailyReport.__tablename__).scalar()
+    return version or 0, db.session.query(func.count(DailyReport.id)).scalar()
+
+
+def run_pivot(spec):
+    """Execute a spec; money metrics come back in currency units."""
+    dimensions, metrics = spec[0], spec[1]
+    rows = db.session.execute(compile_pivot(spec, db.engine.dialect.name)).all()
+
+    columns = list(dimensions) + [_metric_label(field, aggregator) for field, aggregator in metrics]
+    money = {_metric_label(field, aggregator) for field, aggregator in metrics
+             if field in MONEY_FIELDS and aggregator != 'count'}
+    results = []
+    for row in rows:
+        record = {}
+        for column, value in zip(columns, row):
+            if value is not None and column in money:
+                value = round(float(value) / CENTS_PER_UNIT, 2)
+            elif value is not None and not isinstance(value, (str, int)):
+                value = float(value)
+            record[column] = value
+        results.append(record)
+    return {
+        'dimensions': list(dimensions),
+        'metrics': columns[len(dimensions):],
+        'rows': results,
+        'truncated': len(results) == spec[5],
+    }
@@ -0,0 +1,168 @@
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, DailyReport, Brand, BrandEmployee, BrandProduct, get_bangkok_now
+
+# Seed data for a fresh database (removed FEMBURN)
+DEFAULT_BRANDS = [
+    'ENERZAA', 'LUVOST', 'PEAKSHILAJIT', 'BOXOOS', 'CYLEOX', 'ROBURSTAGE',
+    'CHICADDONS', 'ORANIC EXTRACT', 'ZOVOST', 'VITALIXHAIR', 'SYLIARIX'
+]
+
+DEFAULT_EMPLOYEE_BRAND_MAP = {
+    'Mai Phương': 'ENERZAA',
+    'Việt Khanh': 'LUVOST',
+    'Quỳnh Anh': 'PEAKSHILAJIT',
+    'Nhi (Boxoos)': 'BOXOOS',
+    'Thảo (Cyleox)': 'CYLEOX',
+    'Hoàng Thư': 'ROBURSTAGE',
+    'Diệu Anh': 'CHICADDONS',
+    'Uyên Vi': 'ORANIC EXTRACT',
+    'Phạm Thảo': 'ZOVOST',
+    'Lan Anh': 'VITALIXHAIR',
+    'Thảo Tiên': 'SYLIARIX'
+}
+
+DEFAULT_BRAND_PRODUCTS_MAP = {
+    'ENERZAA': ['Creatine Complex Gummies Blue Razz', 'Creatine Complex Gummies Sour Watermelon'],
+    'VITALIXHAIR': ['Vitalix Hair Oil (yellow)', 'Vitalix Hair Growth (pink)'],
+    'SYLIARIX': ['Brain Booster'],
+    'CHICADDONS': ['ChicAddOns Mullein'],
+    'CYLEOX': ['Night time fat burner', 'Balance Gummies'],
+    'ORANIC EXTRACT': ['Pure Shilajit Gummies', '3 in 1 Wellness Gummies'],
+    'LUVOST': ['Luvost Liquid Drops', 'Luvost Sea Moss'],
+    'BOXOOS': ['Estrogen Control'],
+    'ROBURSTAGE': ['Pure NMN'],
+    'PEAKSHILAJIT': ['SHILAJIT GUMMY PLATINUM'],
+    'ZOVOST': ['Super Blend']
+}
+
+
+class BrandRegistry:
+    """In-memory cache of the brand registry tables.
+
+    The snapshot is rebuilt from the (small) registry tables when this
+    process changes the registry, or after ttl_seconds so that changes
+    made by other workers show up without a restart.
+    """
+
+    def __init__(self, ttl_seconds=60):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._loaded_at = 0.0
+
+    def _load(self):
+        brands = [b.name for b in Brand.query.order_by(Brand.name).all()]
+
+        employee_brand_map = {
+            e.employee_name: e.brand
+            for e in BrandEmployee.query.order_by(BrandEmployee.id).all()
+        }
+
+        brand_products_map = {brand: [] for brand in brands}
+        for p in BrandProduct.query.order_by(BrandProduct.id).all():
+            brand_products_map.setdefault(p.brand, []).append(p.product)
+
+        return {
+            'brands': brands,
+            'brand_set': frozenset(brands),
+            'employee_brand_map': employee_brand_map,
+            'brand_products_map': brand_products_map,
+        }
+
+    def snapshot(self):
+        """Return the cached registry, reloading it if stale."""
+        with self._lock:
+            expired = time.monotonic() - self._loaded_at > self.ttl_seconds
+            if self._snapshot is None or expired:
+                self._snapshot = self._load()
+                self._loaded_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def brands(self):
+        """Sorted list of all registered brands."""
+        return self.snapshot()['brands']
+
+    def employee_brand_map(self):
+        return self.snapshot()['employee_brand_map']
+
+    def brand_products_map(self):
+        return self.snapshot()['brand_products_map']
+
+    def has_brand(self, name):
+        return name in self.snapshot()['brand_set']
+
+    def add_brand(self, name):
+        """Register a brand. Returns False if it already exists."""
+        if self.has_brand(name):
+            return False
+        try:
+            db.session.add(Brand(name=name, created_at=get_bangkok_now().replace(tzinfo=None)))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            # Registered concurrently by another worker
+            db.session.rollback()
+            return False
+        finally:
+            self.invalidate()
+
+    def add_employee(self, employee_name, brand):
+        """Assign an employee to a brand (reassigns if already registered)."""
+        self.add_brand(brand)
+        employee = BrandEmployee.query.filter_by(employee_name=employee_name).first()
+        if employee:
+            employee.brand = brand
+        else:
+            db.session.add(BrandEmployee(employee_name=employee_name, brand=brand))
+        db.session.commit()
+        self.invalidate()
+
+    def add_product(self, brand, product):
+        """Add a product to a brand. Returns False if it already exists."""
+        self.add_brand(brand)
+        if product in self.brand_products_map().get(brand, []):
+            return False
+        try:
+            db.session.add(BrandProduct(brand=brand, product=product))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        finally:
+            self.invalidate()
+
+
+brand_registry = BrandRegistry()
+
+
+def seed_registry():
+    """Fill an empty registry from the defaults and existing report brands."""
+    if Brand.query.first() is not None:
+        return
+
+    created_at = get_bangkok_now().replace(tzinfo=None)
+    report_brands = [b[0] for b in db.session.query(DailyReport.brand).distinct().all() if b[0]]
+
+    for name in sorted(set(DEFAULT_BRANDS) | set(report_brands)):
+        db.session.add(Brand(name=name, created_at=created_at))
+    for employee_name, brand in DEFAULT_EMPLOYEE_BRAND_MAP.items():
+        db.session.add(BrandEmployee(employee_name=employee_name, brand=brand))
+    for brand, products in DEFAULT_BRAND_PRODUCTS_MAP.items():
+        for product in products:
+            db.session.add(BrandProduct(brand=brand, product=product))
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker seeded the registry first
+        db.session.rollback()
+    brand_registry.invalidate()
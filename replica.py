@@ -0,0 +1,91 @@
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+REPLICA_BIND = 'replica'
+
+# Seconds a measured replica lag is reused before probing again
+LAG_PROBE_INTERVAL = 5
+
+# Seconds behind the primary; 0 when the replay position matches what was received
+PG_LAG_SQL = '''
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+_lag_lock = threading.Lock()
+_lag_cache = {'checked_at': 0.0, 'lag': 0.0}
+
+
+def read_replica(f):
+    """Let a read-only view send its SELECTs to the DATABASE_READ_URL replica."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.read_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def replica_lag(engine):
+    """Replica lag in seconds, probed at most every LAG_PROBE_INTERVAL.
+
+    Only PostgreSQL standbys report lag; other replicas (e.g. a second
+    SQLite file in development) count as current. A failed probe counts
+    as infinitely behind, so reads fall back to the primary.
+    """
+    with _lag_lock:
+        if time.monotonic() - _lag_cache['checked_at'] < LAG_PROBE_INTERVAL:
+            return _lag_cache['lag']
+
+        lag = 0.0
+        if engine.dialect.name == 'postgresql':
+            try:
+                with engine.connect() as connection:
+                    lag = float(connection.execute(text(PG_LAG_SQL)).scalar() or 0)
+            except Exception:
+                lag = float('inf')
+
+        _lag_cache.update(checked_at=time.monotonic(), lag=lag)
+        return lag
+
+
+def _use_replica(engines):
+    if REPLICA_BIND not in engines or not has_request_context() or not g.get('read_replica'):
+        return False
+    # Read-your-writes: this browser wrote recently, the replica may not have it yet
+    if session.get('read_primary_until', 0) > time.time():
+        return False
+    return replica_lag(engines[REPLICA_BIND]) <= current_app.config['REPLICA_MAX_LAG_SECONDS']
+
+
+class RoutingSession(Session):
+    """Session that sends reads from @read_replica views to the replica bind.
+
+    SELECTs go to the replica; flushes, INSERT/UPDATE/DELETE and raw SQL go
+    to the primary. A write during a request starts a short window
+    (READ_AFTER_WRITE_SECONDS) in which that browser reads from the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            is_select = clause is not None and getattr(clause, 'is_select', False)
+            if is_select and _use_replica(self._db.engines):
+                return self._db.engines[REPLICA_BIND]
+            if not is_select and has_request_context():
+                g.wrote_primary = True
+        elif self._flushing and has_request_context():
+            g.wrote_primary = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def remember_writes(response):
+    """after_request hook: start the read-from-primary window after a write."""
+    if g.get('wrote_primary'):
+        session['read_primary_until'] = time.time() + current_app.config['READ_AFTER_WRITE_SECONDS']
+    return response
@@ -0,0 +1,306 @@
+import hashlib
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from sqlalchemy import and_, exists, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AmazonTransaction, SettlementImport, TransactionArchive
+from money import cents, parse_amount, to_cents
+from ad_spend import ADVERTISING, reconcile_dates
+
+# SettlementImport row-count column for each transaction type
+ROW_COUNT_COLUMNS = {
+    'Order': 'order_rows',
+    'Refund': 'refund_rows',
+    'OtherTransaction': 'other_rows',
+    'Advertising': 'advertising_rows',
+}
+
+# Columns matched to spot a settlement's rows imported before manifests (import_id NULL)
+LEGACY_MATCH_COLUMNS = ('posted_date', 'transaction_type', 'amazon_order_id', 'sku')
+
+
+class DuplicateSettlement(ValueError):
+    """The same settlement file, or its transactions, were imported before."""
+
+
+def parse_posted_date(posted_date_str):
+    """Parse an Amazon PostedDate (ISO 8601, UTC) into a naive datetime."""
+    if not posted_date_str:
+        return None
+    try:
+        return datetime.fromisoformat(posted_date_str.replace('+00:00', ''))
+    except ValueError:
+        return None
+
+
+def parse_item_amounts(item, prices_tag, fees_tag):
+    """Price components and fees of one settlement Item / AdjustedItem (exact Decimals)."""
+    principal = shipping = tax = parse_amount(0)
+    for component in item.findall(f'.//{prices_tag}/Component'):
+        comp_type = component.findtext('Type', '')
+        amount = parse_amount(component.findtext('Amount', '0'))
+        if comp_type == 'Principal':
+            principal = amount
+        elif comp_type == 'Shipping':
+            shipping = amount
+        elif 'Tax' in comp_type and 'Facilitator' not in comp_type:
+            tax = amount
+
+    fba_fee = commission = other_fees = parse_amount(0)
+    for fee in item.findall(f'.//{fees_tag}/Fee'):
+        fee_type = fee.findtext('Type', '')
+        amount = parse_amount(fee.findtext('Amount', '0'))
+        if 'FBA' in fee_type:
+            fba_fee += amount
+        elif 'Commission' in fee_type:
+            commission += amount
+        else:
+            other_fees += amount
+
+    return {
+        'principal_amount': principal,
+        'shipping_amount': shipping,
+        'tax_amount': tax,
+        'fba_fee': fba_fee,
+        'commission_fee': commission,
+        'other_fees': other_fees,
+        'total_amount': principal + shipping + tax + fba_fee + commission + other_fees
+    }
+
+
+def _new_manifest():
+    zero = parse_amount(0)
+    manifest = {column: 0 for column in ROW_COUNT_COLUMNS.values()}
+    manifest.update({
+        'settlement_id': None, 'start_date': None, 'end_date': None, 'deposit_total': None,
+        'row_count': 0, 'principal_total': zero, 'fees_total': zero,
+        'advertising_total': zero, 'net_total': zero,
+    })
+    return manifest
+
+
+def _count_row(manifest, posted_range, row):
+    """Add one parsed row to the manifest counts and totals."""
+    transaction_type = row['transaction_type']
+    total = row.get('total_amount', 0)
+    manifest['row_count'] += 1
+    manifest[ROW_COUNT_COLUMNS[transaction_type]] += 1
+    manifest['net_total'] += total
+    if transaction_type in ('Order', 'Refund'):
+        manifest['principal_total'] += row['principal_amount']
+        manifest['fees_total'] += row['fba_fee'] + row['commission_fee'] + row['other_fees']
+    elif transaction_type == ADVERTISING:
+        manifest['advertising_total'] += total
+
+    posted = row.get('posted_date')
+    if posted is not None:
+        posted_range[0] = posted if posted_range[0] is None else min(posted_range[0], posted)
+        posted_range[1] = posted if posted_range[1] is None else max(posted_range[1], posted)
+
+
+def _read_settlement_data(settlement, manifest):
+    """Settlement ID, period and deposit total from a SettlementData block."""
+    data = settlement.find('SettlementData')
+    if data is None:
+        return
+    manifest['settlement_id'] = manifest['settlement_id'] or data.findtext('AmazonSettlementID') or None
+    start = parse_posted_date(data.findtext('StartDate', ''))
+    end = parse_posted_date(data.findtext('EndDate', ''))
+    if start is not None:
+        manifest['start_date'] = min(filter(None, (manifest['start_date'], start)))
+    if end is not None:
+        manifest['end_date'] = max(filter(None, (manifest['end_date'], end)))
+    deposit = data.findtext('TotalAmount')
+    if deposit:
+        manifest['deposit_total'] = (manifest['deposit_total'] or 0) + parse_amount(deposit)
+
+
+def parse_settlement_import(source, brand, created_at):
+    """Parse an Amazon settlement XML file into (rows, manifest).
+
+    source is a path or file object. rows are dicts ready for a bulk insert;
+    manifest holds the SettlementImport fields (file hash, settlement ID,
+    period, row counts by type and totals), accumulated while the rows are
+    built. No database access, so this can run in a worker process.
+    """
+    if hasattr(source, 'read'):
+        data = source.read()
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+    root = ET.fromstring(data)
+    rows = []
+    manifest = _new_manifest()
+    manifest['file_hash'] = hashlib.sha256(data).hexdigest()
+    posted_range = [None, None]
+
+    def add(row):
+        rows.append(row)
+        _count_row(manifest, posted_range, row)
+
+    # Find SettlementReport
+    for settlement in root.iter('SettlementReport'):
+        _read_settlement_data(settlement, manifest)
+
+        # Parse Orders (charges) and Refunds (their adjustments, usually negative)
+        for transaction_type, item_tag, prices_tag, fees_tag in (
+            ('Order', 'Item', 'ItemPrice', 'ItemFees'),
+            ('Refund', 'AdjustedItem', 'ItemPriceAdjustments', 'ItemFeeAdjustments'),
+        ):
+            for order in settlement.findall(f'.//{transaction_type}'):
+                order_id = order.findtext('AmazonOrderID', '')
+                marketplace = order.findtext('MarketplaceName', '')
+
+                for fulfillment in order.findall('.//Fulfillment'):
+                    posted_date = parse_posted_date(fulfillment.findtext('PostedDate', ''))
+
+                    for item in fulfillment.findall(f'.//{item_tag}'):
+                        amounts = parse_item_amounts(item, prices_tag, fees_tag)
+                        add({
+                            'brand': brand,
+                            'created_at': created_at,
+                            'amazon_order_id': order_id,
+                            'posted_date': posted_date,
+                            'transaction_type': transaction_type,
+                            'marketplace': marketplace,
+                            'sku': item.findtext('SKU', ''),
+                            'quantity': int(item.findtext('Quantity', '0') or 0),
+                            **amounts
+                        })
+
+        # Parse OtherTransaction
+        for other_trans in settlement.findall('.//OtherTransaction'):
+            add({
+                'brand': brand,
+                'created_at': created_at,
+                'amazon_order_id': other_trans.findtext('AmazonOrderID', ''),
+                'posted_date': parse_posted_date(other_trans.findtext('PostedDate', '')),
+                'transaction_type': 'OtherTransaction',
+                'description': other_trans.findtext('TransactionType', ''),
+                'total_amount': parse_amount(other_trans.findtext('Amount', '0'))
+            })
+
+        # Parse AdvertisingTransactionDetails
+        for ad_trans in settlement.findall('.//AdvertisingTransactionDetails'):
+            add({
+                'brand': brand,
+                'created_at': created_at,
+                'posted_date': parse_posted_date(ad_trans.findtext('PostedDate', '')),
+                'transaction_type': 'Advertising',
+                'description': ad_trans.findtext('TransactionType', ''),
+                'total_amount': parse_amount(ad_trans.findtext('TransactionAmount', '0'))
+            })
+
+    # Without a SettlementData period, the range of posted dates
+    manifest['start_date'] = manifest['start_date'] or posted_range[0]
+    manifest['end_date'] = manifest['end_date'] or posted_range[1]
+    return rows, manifest
+
+
+def parse_settlement(source, brand, created_at):
+    """Parse an Amazon settlement XML file into AmazonTransaction rows (see parse_settlement_import)."""
+    return parse_settlement_import(source, brand, created_at)[0]
+
+
+def insert_transactions(rows):
+    """Bulk insert parsed settlement rows (executemany); the caller commits."""
+    if rows:
+        db.session.execute(insert(AmazonTransaction), rows)
+    return len(rows)
+
+
+def _duplicate(existing):
+    return DuplicateSettlement(
+        f'Settlement {existing.settlement_id or existing.file_hash[:12]} was already imported '
+        f'for {existing.brand} on {existing.imported_at:%d/%m/%Y %H:%M} (import #{existing.id}).'
+    )
+
+
+def _previous_import(brand, manifest):
+    """An import of the same file, or of the same settlement ID for this brand."""
+    same = SettlementImport.file_hash == manifest['file_hash']
+    if manifest['settlement_id']:
+        same = or_(same, and_(SettlementImport.brand == brand,
+                              SettlementImport.settlement_id == manifest['settlement_id']))
+    return SettlementImport.query.filter(same).order_by(SettlementImport.id).first()
+
+
+def _legacy_rows_present(brand, rows):
+    """Whether the first or last dated row is already in the table without an import.
+
+    Rows imported before settlement manifests (migration 0007) have no
+    import_id, so neither the file hash nor the settlement ID catches a
+    re-upload of their file.
+    """
+    dated = [row for row in rows if row.get('posted_date') is not None]
+    for row in dated[:1] + dated[-1:]:
+        clauses = [AmazonTransaction.brand == brand, AmazonTransaction.import_id.is_(None),
+                   cents(AmazonTransaction.total_amount) == to_cents(row.get('total_amount', 0))]
+        clauses += [getattr(AmazonTransaction, name).is_not_distinct_from(row.get(name))
+                    for name in LEGACY_MATCH_COLUMNS]
+        if db.session.execute(select(exists().where(*clauses))).scalar():
+            return True
+    return False
+
+
+def record_import(brand, filename, rows, manifest, imported_at):
+    """Insert a parsed settlement with its manifest; the caller commits.
+
+    Every row is tagged with the manifest's id. Raises DuplicateSettlement
+    if the same file or settlement ID was imported before, or its rows were
+    imported before manifests existed. Returns the SettlementImport.
+    """
+    existing = _previous_import(brand, manifest)
+    if existing is not None:
+        raise _duplicate(existing)
+    if _legacy_rows_present(brand, rows):
+        raise DuplicateSettlement(
+            f'The transactions of settlement {manifest["settlement_id"] or manifest["file_hash"][:12]} '
+            f'were already imported for {brand} before settlement imports were tracked.'
+        )
+
+    settlement_import = SettlementImport(brand=brand, filename=(filename or '')[:200] or None,
+                                         imported_at=imported_at, **manifest)
+    db.session.add(settlement_import)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # The same file imported concurrently: uq on file_hash
+        db.session.rollback()
+        existing = SettlementImport.query.filter_by(file_hash=manifest['file_hash']).first()
+        if existing is None:
+            raise
+        raise _duplicate(existing) from None
+    insert_transactions([{**row, 'import_id': settlement_import.id} for row in rows])
+    return settlement_import
+
+
+def rollback_import(settlement_import):
+    """Delete an imported settlement's rows and manifest; the caller commits.
+
+    The rows are found through ix_amazon_tx_import. Raises ValueError if a
+    month of the settlement was archived, as those rows are no longer in the
+    table. Returns the number of transactions deleted.
+    """
+    first = settlement_import.start_date or settlement_import.end_date
+    last = settlement_import.end_date or first
+    if first is not None:
+        archived = db.session.query(TransactionArchive.month).filter(
+            TransactionArchive.month.between(f'{first:%Y-%m}', f'{last:%Y-%m}')
+        ).first()
+        if archived is not None:
+            raise ValueError(f'Month {archived.month} of this settlement has been archived; '
+                             f'it can no longer be rolled back.')
+
+    of_import = AmazonTransaction.import_id == settlement_import.id
+    ad_days = db.session.execute(
+        select(func.date(AmazonTransaction.posted_date)).distinct()
+        .where(of_import, AmazonTransaction.transaction_type == ADVERTISING)
+    ).scalars().all()
+
+    deleted = AmazonTransaction.query.filter(of_import).delete(synchronize_session=False)
+    db.session.delete(settlement_import)
+    reconcile_dates(settlement_import.brand, [str(day)[:10] for day in ad_days if day])
+    return deleted
@@ -0,0 +1,149 @@
+import pandas as pd
+from sqlalchemy import and_, func, insert, or_, select
+from sqlalchemy.orm import aliased
+
+from models import db, DailyReport, StatusEvent, get_bangkok_now
+
+# Status columns on DailyReport → the values that need attention
+STATUS_FIELDS = {
+    'account_status_us': 'Unhealthy',
+    'account_status_mexico': 'Unhealthy',
+    'account_status_canada': 'Unhealthy',
+    'store_status_us': 'Inactive',
+    'store_status_mexico': 'Inactive',
+    'store_status_canada': 'Inactive',
+}
+
+EVENT_COLUMNS = ['report_id', 'brand', 'product', 'employee_name', 'date_report',
+                 'field', 'previous_status', 'status']
+
+
+def derive_status_events(frame):
+    """Status transitions in a frame of reports, in one vectorized pass.
+
+    frame has one row per report with report_id, brand, product,
+    employee_name, date_report and the STATUS_FIELDS columns. Returns one
+    row per product, field and report where the status differs from the
+    product's previous report (by date_report), including its first report.
+    """
+    frame = frame.dropna(subset=['date_report']).sort_values(['brand', 'product', 'date_report'])
+    if frame.empty:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    long = frame.melt(
+        id_vars=['report_id', 'brand', 'product', 'employee_name', 'date_report'],
+        value_vars=list(STATUS_FIELDS), var_name='field', value_name='status'
+    )
+    # melt keeps the date order within each field, so shift() is the previous report
+    long['previous_status'] = long.groupby(['brand', 'product', 'field'], sort=False)['status'].shift()
+    changed = long['previous_status'].isna() | (long['status'] != long['previous_status'])
+    events = long[changed].dropna(subset=['status'])
+    return events[EVENT_COLUMNS]
+
+
+def _insert_events(events):
+    if events.empty:
+        return 0
+    created_at = get_bangkok_now().replace(tzinfo=None)
+    records = events.astype(object).where(events.notna(), None).to_dict('records')
+    for record in records:
+        record['report_id'] = int(record['report_id'])
+        record['created_at'] = created_at
+    db.session.execute(insert(StatusEvent), records)
+    return len(records)
+
+
+def _report_frame(*criteria):
+    columns = [DailyReport.id.label('report_id'), DailyReport.brand, DailyReport.product,
+               DailyReport.employee_name, DailyReport.date_report,
+               *[getattr(DailyReport, field) for field in STATUS_FIELDS]]
+    rows = db.session.execute(select(*columns).where(*criteria)).all()
+    return pd.DataFrame(rows, columns=['report_id', 'brand', 'product', 'employee_name',
+                                       'date_report', *STATUS_FIELDS])
+
+
+def rebuild_status_events(brand=None, product=None):
+    """Re-derive status events from report history; the caller commits.
+
+    Limited to one product when brand and product are given. Returns the
+    number of events written.
+    """
+    criteria = []
+    events = StatusEvent.query
+    if brand is not None:
+        criteria = [DailyReport.brand == brand, DailyReport.product == product]
+        events = events.filter_by(brand=brand, product=product)
+    events.delete()
+    return _insert_events(derive_status_events(_report_frame(*criteria)))
+
+
+def record_status_changes(report):
+    """Write status events for a new (flushed) report; the caller commits.
+
+    Compares the report with the product's previous day only. A report
+    dated before the product's latest one changes the transitions after
+    it, so that product's events are rebuilt instead.
+    """
+    if not report.date_report:
+        return 0
+
+    later = db.session.query(DailyReport.id).filter(
+        DailyReport.brand == report.brand,
+        DailyReport.product == report.product,
+        DailyReport.date_report > report.date_report
+    ).first()
+    if later is not None:
+        return rebuild_status_events(report.brand, report.product)
+
+    previous = DailyReport.query.filter(
+        DailyReport.brand == report.brand,
+        DailyReport.product == report.product,
+        DailyReport.date_report < report.date_report
+    ).order_by(DailyReport.date_report.desc()).first()
+
+    # A resubmission replaces the events recorded for that day
+    StatusEvent.query.filter_by(brand=report.brand, product=report.product,
+                                date_report=report.date_report).delete()
+
+    created_at = get_bangkok_now().replace(tzinfo=None)
+    count = 0
+    for field in STATUS_FIELDS:
+        status = getattr(report, field)
+        previous_status = getattr(previous, field) if previous is not None else None
+        if status is None or status == previous_status:
+            continue
+        db.session.add(StatusEvent(
+            report_id=report.id,
+            created_at=created_at,
+            brand=report.brand,
+            product=report.product,
+            employee_name=report.employee_name,
+            date_report=report.date_report,
+            field=field,
+            previous_status=previous_status,
+            status=status
+        ))
+        count += 1
+    return count
+
+
+def current_alerts():
+    """Products whose latest status is unhealthy/inactive, with the day it started.
+
+    Reads only status_events: the latest event per product and field is the
+    current status, and its date_report is when that status began.
+    """
+    ranked = select(
+        StatusEvent,
+        func.row_number().over(
+            partition_by=(StatusEvent.brand, StatusEvent.product, StatusEvent.field),
+            order_by=(StatusEvent.date_report.desc(), StatusEvent.id.desc())
+        ).label('rn')
+    ).subquery()
+
+    latest = aliased(StatusEvent, ranked)
+    return db.session.query(latest).filter(
+        ranked.c.rn == 1,
+        or_(*[and_(latest.field == field, latest.status == status)
+              for field, status in STATUS_FIELDS.items()])
+    ).order_by(latest.date_report, latest.brand, latest.product).all()
@@ -0,0 +1,82 @@
+from sqlalchemy.exc import IntegrityError
+
+from models import db, DailyReport, DailyReportHistory, begin_write, bump_version, serialized_write
+from anomalies import detect_report_anomalies
+from status_events import record_status_changes
+from metrics import refresh_report_metrics
+from ad_spend import reconcile_report
+
+
+def save_report(report, refresh_metrics=True):
+    """Save a new (unsaved) report, replacing any report for the same day.
+
+    There is one canonical report per brand, product and date_report. A
+    resubmission updates that row in place and moves the superseded version
+    to daily_report_history. Also runs the anomaly checks, refreshes the
+    derived metrics and ad spend reconciliation the report touches (unless
+    the caller batches that) and records status transitions. The caller
+    commits.
+
+    Returns (saved report, replaced, anomalies).
+    """
+    begin_write()
+    submitted_at = report.created_at
+    existing = DailyReport.query.filter_by(
+        brand=report.brand,
+        product=report.product,
+        date_report=report.date_report
+    ).first()
+
+    replaced = existing is not None
+    history = None
+    if replaced:
+        history = DailyReportHistory(report_id=existing.id, superseded_at=submitted_at)
+        history.copy_fields_from(existing)
+        db.session.add(history)
+
+        # Keep the original creation time; updated_at records the resubmission
+        created_at = existing.created_at
+        existing.copy_fields_from(report)
+        existing.created_at = created_at
+        existing.updated_at = submitted_at
+        report = existing
+    else:
+        report.updated_at = submitted_at
+        db.session.add(report)
+
+    db.session.flush()
+    anomalies = detect_report_anomalies(report, superseded=history)
+    record_status_changes(report)
+    if refresh_metrics:
+        refresh_report_metrics(report.brand, report.product, report.date_report)
+        reconcile_report(report.brand, report.date_report)
+
+    # Last, so the row lock on the counter is held only until the commit
+    bump_version(DailyReport.__tablename__)
+    return report, replaced, anomalies
+
+
+def summarize(report, replaced, anomalies):
+    """Plain-data result of a save, safe to hand across threads."""
+    return {
+        'id': report.id,
+        'brand': report.brand,
+        'replaced': replaced,
+        'anomalies': [a.field for a in anomalies]
+    }
+
+
+def commit_report(report):
+    """Save and commit a single report. Returns summarize(...)."""
+    with serialized_write():
+        try:
+            result = summarize(*save_report(report))
+            db.session.commit()
+        except IntegrityError:
+            # Same brand/product/day saved concurrently; retry as an update
+            db.session.rollback()
+            retry = DailyReport()
+            retry.copy_fields_from(report)
+            result = summarize(*save_report(retry))
+            db.session.commit()
+    return result
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py binds the database when it is imported, so point it at a scratch file first
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ.pop('DATABASE_READ_URL', None)
+
+
+@pytest.fixture
+def app():
+    from app import app as flask_app
+    with flask_app.app_context():
+        yield flask_app
+
+
+@pytest.fixture(scope='session')
+def shared_archive_dir(tmp_path_factory):
+    # Archive manifests of every test share one database, so their files share one directory
+    return tmp_path_factory.mktemp('archive')
+
+
+@pytest.fixture
+def archive_dir(app, shared_archive_dir, monkeypatch):
+    monkeypatch.setitem(app.config, 'ARCHIVE_DIR', str(shared_archive_dir))
+    return shared_archive_dir
+
+
+@pytest.fixture
+def make_report():
+    """Build an unsaved DailyReport with every column default filled in (resubmissions copy them all)."""
+    from models import DailyReport
+
+    def make(**fields):
+        for column in DailyReport.__table__.columns:
+            if column.default is not None and column.default.is_scalar:
+                fields.setdefault(column.name, column.default.arg)
+        return DailyReport(**fields)
+    return make
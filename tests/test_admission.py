@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+from flask import Flask, jsonify
+
+from admission import HEAVY, AdmissionController
+
+
+@pytest.fixture
+def gated_app():
+    """An app whose non-critical views block until release is set."""
+    app = Flask(__name__)
+    app.entered = threading.Semaphore(0)
+    app.release = threading.Event()
+
+    def blocking_view():
+        app.entered.release()
+        app.release.wait(5)
+        return jsonify(ok=True)
+
+    app.add_url_rule('/', 'index', lambda: 'ok')
+    app.add_url_rule('/report', 'report', blocking_view)
+    app.add_url_rule('/export', 'export_csv', blocking_view)
+    app.add_url_rule('/api/pivot', 'api_pivot', blocking_view)
+    return app
+
+
+def hold(app, path, count=1):
+    """Start count requests to path that stay inside their view until app.release is set."""
+    threads = [threading.Thread(target=app.test_client().get, args=(path,)) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        assert app.entered.acquire(timeout=5)
+    return threads
+
+
+def finish(app, threads):
+    app.release.set()
+    for thread in threads:
+        thread.join(5)
+
+
+def test_a_full_pool_sheds_at_once_and_critical_requests_still_pass(gated_app):
+    admission = AdmissionController(capacity=3, reserved=1, queue_seconds=5)
+    admission.init_app(gated_app)
+    client = gated_app.test_client()
+
+    held = hold(gated_app, '/report', 2)
+    shed = client.get('/report')
+    assert shed.status_code == 503
+    assert shed.headers['Retry-After'] == '10'
+    assert shed.mimetype == 'text/plain'
+    assert client.get('/').status_code == 200
+
+    finish(gated_app, held)
+    assert client.get('/report').status_code == 200
+    stats = admission.stats()
+    assert stats['pool']['active'] == 0
+    assert stats['endpoints']['report'] == {'class': 'default', 'admitted': 3, 'queued': 0, 'shed': 1,
+                                            'max_wait_ms': 0.0}
+
+
+def test_a_heavy_request_queues_for_its_class_then_is_shed(gated_app):
+    admission = AdmissionController(capacity=8, reserved=2, class_limits={HEAVY: 1}, queue_seconds=0.1)
+    admission.init_app(gated_app)
+    client = gated_app.test_client()
+
+    held = hold(gated_app, '/export')
+    shed = client.get('/api/pivot')
+    assert shed.status_code == 503
+    assert shed.get_json() == {'error': 'Server busy, please retry shortly.'}
+    # Default requests do not count against the heavy class
+    other = hold(gated_app, '/report')
+
+    finish(gated_app, held + other)
+    assert client.get('/api/pivot').status_code == 200
+    stats = admission.stats()
+    assert stats['classes'][HEAVY] == {'limit': 1, 'active': 0, 'waiting': 0}
+    assert stats['pool']['active'] == 0
+    assert stats['endpoints']['api_pivot']['shed'] == 1
@@ -0,0 +1,64 @@
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from analytics import portfolio_kpis
+from models import db
+from submissions import commit_report
+
+
+def test_portfolio_kpis_align_every_brand_from_one_query(app, make_report):
+    def save(brand, product, day, **values):
+        commit_report(make_report(
+            report_date=date(2026, 7, day), created_at=datetime(2026, 7, day, 9), employee_name='Mai',
+            brand=brand, product=product, date_report=f'2026-07-{day:02d}', **values
+        ))
+
+    save('KPI-ALPHA', 'A', 1, new_orders=4, current_balance='10.00', current_inventory=90,
+         average_orders_30_days=3, average_rating=4.2)
+    save('KPI-ALPHA', 'B', 1, new_orders=1, current_balance='10.00', current_inventory=500,
+         average_orders_30_days=2, average_rating=4.2)
+    save('KPI-ALPHA', 'A', 2, new_orders=6, current_balance='25.50', current_inventory=60,
+         average_orders_30_days=3, average_rating=4.5)
+    save('KPI-BETA', 'C', 2, new_orders=2, current_balance='7.25', current_inventory=0,
+         average_orders_30_days=0, average_rating=3.9)
+
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        kpis = portfolio_kpis('2026-07-01', '2026-07-02')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    # One grouped pass over the reports, plus the ads deltas a date range needs
+    assert len(statements) == 2
+    assert kpis['brands'] == ['KPI-ALPHA', 'KPI-BETA']
+    assert kpis['reports'] == [3, 1]
+    assert kpis['orders'] == [11, 2]
+    assert kpis['balance'] == [25.5, 7.25]
+    # Inventory and cover from each product's latest report
+    assert kpis['inventory'] == [560, 0]
+    assert kpis['days_of_stock'] == [112.0, 0]
+    assert kpis['rating'] == [4.5, 3.9]
+    assert kpis['rating_trend'] == [0.3, 0.0]
+    assert all(len(values) == 2 for values in kpis.values())
+
+
+def test_portfolio_ads_figures_cover_only_the_date_range(app, make_report):
+    # ads_spend_total / ads_sales_total are lifetime running totals
+    for day, spend, sales in [(1, '100.00', '400.00'), (2, '150.00', '500.00'), (3, '230.00', '700.00')]:
+        commit_report(make_report(
+            report_date=date(2026, 2, day), created_at=datetime(2026, 2, day, 9), employee_name='Mai',
+            brand='KPI-RANGE', product='Sea Moss', date_report=f'2026-02-{day:02d}',
+            ads_spend_total=spend, ads_sales_total=sales
+        ))
+
+    def ads(start_date=None, end_date=None):
+        kpis = portfolio_kpis(start_date, end_date)
+        position = kpis['brands'].index('KPI-RANGE')
+        return kpis['ads_spend'][position], kpis['ads_sales'][position], kpis['acos'][position]
+
+    assert ads() == (230.0, 700.0, 32.86)
+    assert ads('2026-02-02', '2026-02-03') == (130.0, 300.0, 43.33)
+    assert ads('2026-02-03') == (80.0, 200.0, 40.0)
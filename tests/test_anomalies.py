@@ -0,0 +1,47 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from anomalies import LEVEL_SHIFT_REPORTS, MIN_SAMPLES, MONITORED_FIELDS, check_report
+from models import ReportAnomaly
+from submissions import commit_report
+
+
+def report_values(**values):
+    fields = dict.fromkeys(MONITORED_FIELDS)
+    fields.update(values)
+    return SimpleNamespace(id=1, brand='B', product='P', employee_name='Mai', date_report='2026-01-01', **fields)
+
+
+def flagged_inventory(inventories):
+    stats_by_field = {}
+    return [bool(check_report(report_values(current_inventory=value), stats_by_field))
+            for value in inventories]
+
+
+def test_single_outlier_is_flagged_and_kept_out_of_the_baseline():
+    assert flagged_inventory([500] * MIN_SAMPLES + [5000, 500, 510]) == [False] * MIN_SAMPLES + [True, False, False]
+
+
+def test_sustained_step_change_becomes_the_baseline():
+    flags = flagged_inventory([500] * MIN_SAMPLES + [5000] * 6)
+
+    # Flagged until the run reaches LEVEL_SHIFT_REPORTS, then the new level is normal
+    shift = [True] * (LEVEL_SHIFT_REPORTS - 1) + [False] * (6 - LEVEL_SHIFT_REPORTS + 1)
+    assert flags == [False] * MIN_SAMPLES + shift
+
+
+def test_outliers_on_both_sides_are_not_a_level():
+    assert flagged_inventory([500] * MIN_SAMPLES + [5000, 50, 5000, 50]) == [False] * MIN_SAMPLES + [True] * 4
+
+
+def test_step_change_is_learned_across_submissions(app, make_report):
+    for day in range(1, 12):
+        commit_report(make_report(
+            report_date=date(2026, 3, day), created_at=datetime(2026, 3, day, 9),
+            employee_name='Mai', brand='ANOMALY-STEP', product='Sea Moss', date_report=f'2026-03-{day:02d}',
+            current_inventory=500 if day <= 5 else 5000
+        ))
+
+    flagged = ReportAnomaly.query.filter_by(brand='ANOMALY-STEP', field='current_inventory')\
+        .order_by(ReportAnomaly.date_report).with_entities(ReportAnomaly.date_report).all()
+    assert [day for day, in flagged] == ['2026-03-06', '2026-03-07']
@@ -0,0 +1,88 @@
+import csv
+import os
+
+import pandas as pd
+import pytest
+from flask import Flask
+
+from bulk_load import AlreadyLoaded, copy_buffer, load_file, validate_chunk
+from models import db, AmazonTransaction, DailyReport, ShipmentCost
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def shipment_rows(brand):
+    return [
+        {'brand': brand, 'cost_date': '2026-01-05', 'product': 'Sea Moss', 'cost_type': 'Freight',
+         'total_amount': '120.50'},
+        {'brand': brand, 'cost_date': '2026-01-06', 'product': 'Sea Moss', 'cost_type': 'Freight',
+         'total_amount': '80'},
+    ]
+
+
+def test_reload_of_keyless_table_is_refused(app, tmp_path):
+    path = write_csv(tmp_path / 'costs.csv', shipment_rows('BULK-RELOAD'))
+
+    assert load_file('shipment_costs', path).loaded == 2
+    with pytest.raises(AlreadyLoaded):
+        load_file('shipment_costs', path)
+
+    assert ShipmentCost.query.filter_by(brand='BULK-RELOAD').count() == 2
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 10])
+def test_first_row_for_a_day_wins_across_chunks(app, tmp_path, chunk_size):
+    brand = f'BULK-FIRST-{chunk_size}'
+    rows = [{'employee_name': 'Mai', 'brand': brand, 'product': 'Gummies', 'date_report': '2026-02-01',
+             'new_orders': orders} for orders in (1, 2, 3)]
+    stats = load_file('daily_reports', write_csv(tmp_path / 'reports.csv', rows), chunk_size)
+
+    assert (stats.loaded, stats.duplicates) == (1, 2)
+    assert DailyReport.query.filter_by(brand=brand).one().new_orders == 1
+
+
+def test_copy_buffer_matches_copy_csv_format(app):
+    chunk = pd.DataFrame([
+        {'brand': 'BULK-COPY', 'transaction_type': 'Order', 'posted_date': '2026-01-05T10:30:00',
+         'description': 'Fee, "promo"', 'quantity': '2', 'total_amount': '12.345'},
+        {'brand': 'BULK-COPY', 'transaction_type': 'Refund', 'posted_date': '',
+         'description': '', 'quantity': '', 'total_amount': '-3'},
+    ])
+    valid, rejected = validate_chunk(AmazonTransaction, chunk, pd.Timestamp('2026-01-10').to_pydatetime())
+    assert rejected.empty
+
+    rows = [dict(zip(valid.columns, row)) for row in csv.reader(copy_buffer(valid))]
+    assert rows[0]['description'] == 'Fee, "promo"'
+    assert rows[0]['posted_date'] == '2026-01-05 10:30:00'
+    # Money goes in as integer cents, NULL as an empty field
+    assert (rows[0]['total_amount'], rows[1]['total_amount']) == ('1235', '-300')
+    assert (rows[1]['posted_date'], rows[1]['quantity']) == ('', '0')
+
+
+@pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'),
+                    reason='set TEST_POSTGRES_URL to a scratch PostgreSQL database to test COPY')
+def test_copy_load_on_postgres(tmp_path):
+    pytest.importorskip('psycopg2')
+    pg_app = Flask(__name__)
+    pg_app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['TEST_POSTGRES_URL']
+    db.init_app(pg_app)
+    with pg_app.app_context():
+        db.create_all()
+        ShipmentCost.query.filter_by(brand='BULK-PG').delete()
+        DailyReport.query.filter_by(brand='BULK-PG').delete()
+        db.session.commit()
+
+        path = write_csv(tmp_path / 'costs.csv', shipment_rows('BULK-PG'))
+        assert load_file('shipment_costs', path).loaded == 2
+        with pytest.raises(AlreadyLoaded):
+            load_file('shipment_costs', path)
+        assert sorted(cost.total_amount for cost in ShipmentCost.query.filter_by(brand='BULK-PG')) == [80, 120.5]
+
+        rows = [{'employee_name': 'Mai', 'brand': 'BULK-PG', 'product': 'Gummies', 'date_report': '2026-02-01',
+                 'new_orders': orders} for orders in (1, 2)]
+        stats = load_file('daily_reports', write_csv(tmp_path / 'reports.csv', rows), chunk_size=1)
+        assert (stats.loaded, stats.duplicates) == (1, 1)
+        assert DailyReport.query.filter_by(brand='BULK-PG').one().new_orders == 1
@@ -0,0 +1,53 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from group_commit import GroupCommitWriter
+from models import DailyReport
+
+
+@pytest.fixture
+def report(make_report):
+    def build(brand, product, employee_name='Mai', **values):
+        return make_report(
+            report_date=date(2026, 5, 1), created_at=datetime(2026, 5, 1, 9), employee_name=employee_name,
+            brand=brand, product=product, date_report='2026-05-01', **values
+        )
+    return build
+
+
+def running_future():
+    future = Future()
+    future.set_running_or_notify_cancel()
+    return future
+
+
+def test_a_bad_report_fails_alone_and_the_rest_of_its_batch_commits(app, report):
+    batch = [(report('GROUP-RETRY', 'A', new_orders=1), running_future()),
+             (report('GROUP-RETRY', 'B', employee_name=None), running_future()),
+             (report('GROUP-RETRY', 'C', new_orders=3), running_future())]
+
+    GroupCommitWriter(app)._commit_batch(batch)
+
+    (_, good_a), (_, bad), (_, good_c) = batch
+    assert isinstance(bad.exception(), IntegrityError)
+    assert good_a.result()['brand'] == good_c.result()['brand'] == 'GROUP-RETRY'
+    saved = DailyReport.query.filter_by(brand='GROUP-RETRY').order_by(DailyReport.product)
+    assert [(row.product, row.new_orders) for row in saved] == [('A', 1), ('C', 3)]
+
+
+def test_submit_reports_each_outcome_to_its_own_caller(app, report):
+    writer = GroupCommitWriter(app, max_delay=0.05)
+    reports = [report('GROUP-SUBMIT', str(n), employee_name=None if n == 2 else 'Mai') for n in range(5)]
+
+    with ThreadPoolExecutor(len(reports)) as pool:
+        futures = [pool.submit(writer.submit, item, 10) for item in reports]
+    with pytest.raises(IntegrityError):
+        futures[2].result()
+    assert [futures[n].result()['replaced'] for n in (0, 1, 3, 4)] == [False] * 4
+
+    # The writer survives the failure and keeps committing
+    assert writer.submit(report('GROUP-SUBMIT', '0', new_orders=9), 10)['replaced'] is True
+    assert DailyReport.query.filter_by(brand='GROUP-SUBMIT').count() == 4
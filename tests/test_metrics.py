@@ -0,0 +1,40 @@
+import random
+from datetime import date, datetime, timedelta
+
+from metrics import refresh_brand_metrics
+from models import db, BrandDailyMetrics, ReportMetrics
+from submissions import commit_report
+
+
+def stored_metrics(brand):
+    def rows(model, keys):
+        columns = [column.name for column in model.__table__.columns if column.name != 'id']
+        return sorted((tuple(getattr(row, column) for column in columns)
+                       for row in model.query.filter_by(brand=brand)), key=lambda row: row[:keys])
+    return rows(ReportMetrics, 1), rows(BrandDailyMetrics, 2)
+
+
+def test_incremental_refresh_matches_a_full_recompute(app, make_report):
+    brand = 'METRICS-EQUAL'
+    rng = random.Random(31)
+    days = [day for day in range(1, 41) if rng.random() < 0.6]
+    submissions = [(day, product) for day in days for product in ('A', 'B')]
+    # Out of order: backfilled days land behind later ones, and some days are resubmitted
+    rng.shuffle(submissions)
+    submissions += rng.sample(submissions, 10)
+
+    for n, (day, product) in enumerate(submissions):
+        spend = day * 10 + rng.randint(0, 5)
+        commit_report(make_report(
+            report_date=date(2026, 6, 1), created_at=datetime(2026, 6, 1, 9) + timedelta(minutes=n), employee_name='Mai',
+            brand=brand, product=product, date_report=(date(2026, 1, 1) + timedelta(days=day)).isoformat(),
+            ads_spend_total=f'{spend}.25', ads_sales_total=f'{spend * 4}.50',
+            total_unit_sales=day * 3 + rng.randint(0, 2), vine_total_orders=day // 4
+        ))
+    incremental = stored_metrics(brand)
+
+    refresh_brand_metrics(brand)
+    db.session.commit()
+
+    assert len(incremental[1]) == len(days)
+    assert incremental == stored_metrics(brand)
@@ -0,0 +1,53 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select, text
+
+from models import db, ShipmentCost
+from money import cents, from_cents, parse_amount, to_cents
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1,234.565', Decimal('1234.57')),
+    ('-0.005', Decimal('-0.01')),
+    (0.1, Decimal('0.10')),
+    (2.675, Decimal('2.68')),
+    ('  ', Decimal('0.00')),
+    (None, Decimal('0.00')),
+])
+def test_parse_amount_rounds_half_up_to_the_cent(value, expected):
+    assert parse_amount(value) == expected
+
+
+@pytest.mark.parametrize('value', ['abc', 'NaN', 'Infinity'])
+def test_parse_amount_rejects_non_amounts(value):
+    with pytest.raises(ValueError, match='Invalid amount'):
+        parse_amount(value)
+
+
+def test_cents_conversions_round_trip():
+    assert to_cents('19.999') == 2000
+    assert to_cents(-0.29) == -29
+    assert to_cents(None) is None and from_cents(None) is None
+    assert from_cents(-205) == Decimal('-2.05')
+    assert from_cents(to_cents('12345678901.23')) == Decimal('12345678901.23')
+
+
+def test_cents_column_stores_integers_and_sums_exactly(app):
+    now = datetime(2026, 1, 1)
+    db.session.add_all([
+        ShipmentCost(brand='MONEY-SUM', created_at=now, cost_date=date(2026, 1, 1), product='P',
+                     cost_type='Freight', total_amount=amount)
+        for amount in ['0.10'] * 10 + [0.2, Decimal('1.005')]
+    ])
+    db.session.commit()
+
+    stored = db.session.execute(text(
+        "SELECT total_amount, typeof(total_amount) FROM shipment_costs WHERE brand = 'MONEY-SUM'")).all()
+    assert sorted(stored) == [(10, 'integer')] * 10 + [(20, 'integer'), (101, 'integer')]
+
+    total = select(func.sum(cents(ShipmentCost.total_amount))).where(ShipmentCost.brand == 'MONEY-SUM')
+    assert db.session.execute(total).scalar() == 221
+    assert {cost.total_amount for cost in ShipmentCost.query.filter_by(brand='MONEY-SUM')} == {
+        Decimal('0.10'), Decimal('0.20'), Decimal('1.01')}
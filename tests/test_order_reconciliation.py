@@ -0,0 +1,33 @@
+from datetime import datetime
+from decimal import Decimal
+
+from archive import archive_month
+from models import db, ArchivedOrder
+from order_reconciliation import anomalous_orders, order_transactions
+from settlement import insert_transactions
+
+
+def add(brand, order_id, day, transaction_type, amount):
+    insert_transactions([{
+        'brand': brand, 'created_at': datetime(2026, 1, 1), 'posted_date': day, 'amazon_order_id': order_id,
+        'transaction_type': transaction_type, 'total_amount': Decimal(amount)
+    }])
+    db.session.commit()
+
+
+def test_orders_split_across_the_archive_are_left_out_and_counted(archive_dir):
+    brand = 'ORDERS-SPLIT'
+    add(brand, 'charged-then-refunded', datetime(2018, 5, 20), 'Order', '20')
+    add(brand, 'archived-only', datetime(2018, 5, 21), 'Order', '15')
+    assert archive_month('2018-05') == 2
+    assert {order for order, in db.session.query(ArchivedOrder.amazon_order_id).filter_by(brand=brand)} == {
+        'charged-then-refunded', 'archived-only'}
+
+    # Its refund lands in the table: alone it would look like a negative order
+    add(brand, 'charged-then-refunded', datetime(2018, 6, 2), 'Refund', '-20')
+    add(brand, 'negative', datetime(2018, 6, 3), 'OtherTransaction', '-5')
+
+    orders, stats = anomalous_orders(brand)
+    assert [order['order_id'] for order in orders] == ['negative']
+    assert stats['split_orders'] == 1
+    assert list(order_transactions(brand, 'charged-then-refunded')['total_amount']) == [2000, -2000]
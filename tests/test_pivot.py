@@ -0,0 +1,69 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql, sqlite
+
+from pivot import compile_pivot, data_version, parse_spec, run_pivot
+from submissions import commit_report
+
+
+@pytest.fixture
+def save(make_report):
+    def save_report(brand, product, day, submitted_at, **values):
+        commit_report(make_report(
+            report_date=date(2026, 4, day), created_at=submitted_at, employee_name='Mai',
+            brand=brand, product=product, date_report=f'2026-04-{day:02d}', **values
+        ))
+    return save_report
+
+
+@pytest.mark.parametrize('dimensions, metrics, message', [
+    ('brand,colour', None, 'Unknown dimension'),
+    ('day,month', None, 'only one of day, week and month'),
+    ('brand,brand', None, 'Each dimension may appear once'),
+    ('brand', 'new_orders:median', 'Unknown aggregator'),
+    ('brand', 'password:sum', 'Unknown metric field'),
+    ('brand', 'acos:avg,acos:avg', 'Each metric may appear once'),
+])
+def test_parse_spec_rejects_bad_requests(dimensions, metrics, message):
+    with pytest.raises(ValueError, match=message):
+        parse_spec(dimensions, metrics)
+
+
+def test_parse_spec_normalizes_and_defaults():
+    spec = parse_spec(' brand , month ', 'new_orders', {'product': '', 'brand': 'B'})
+
+    assert spec == (('brand', 'month'), (('new_orders', 'sum'),), (('brand', 'B'),), None, None, 1000)
+    assert parse_spec('brand', '')[1] == (('reports', 'count'),)
+    with pytest.raises(ValueError):
+        parse_spec('brand', None, {'employee_name': 'x'})
+
+
+@pytest.mark.parametrize('dialect', [sqlite.dialect(), postgresql.dialect()])
+def test_compile_pivot_groups_by_position_and_binds_filters(dialect):
+    spec = parse_spec('brand,week', 'current_balance:sum', {'brand': "B'; DROP TABLE x"})
+    sql = str(compile_pivot(spec, dialect.name).compile(dialect=dialect))
+
+    assert 'GROUP BY 1, 2' in sql and 'ORDER BY 1, 2' in sql
+    assert 'DROP TABLE' not in sql
+
+
+def test_run_pivot_sums_money_in_units(app, save):
+    save('PIVOT-SUM', 'A', 1, datetime(2026, 4, 1, 9), current_balance='10.10', new_orders=2)
+    save('PIVOT-SUM', 'B', 1, datetime(2026, 4, 1, 9), current_balance='0.20', new_orders=3)
+
+    result = run_pivot(parse_spec('brand', 'current_balance:sum,new_orders:sum,reports',
+                                  {'brand': 'PIVOT-SUM'}))
+    assert result['rows'] == [{'brand': 'PIVOT-SUM', 'current_balance_sum': 10.3, 'new_orders_sum': 5,
+                               'reports': 2}]
+
+
+def test_data_version_moves_on_a_resubmission_older_than_the_newest_report(app, save):
+    save('PIVOT-VERSION', 'A', 2, datetime(2026, 4, 2, 12))
+    save('PIVOT-VERSION', 'B', 2, datetime(2026, 4, 2, 9), new_orders=1)
+    before = data_version()
+
+    # Committed late: its updated_at is older than the newest report's and the count is unchanged
+    save('PIVOT-VERSION', 'B', 2, datetime(2026, 4, 2, 10), new_orders=7)
+
+    assert data_version() != before
@@ -0,0 +1,102 @@
+import pytest
+from flask import Flask, g, jsonify
+
+import replica
+from columnar import ReportColumnStore
+from models import db, ShipmentCost, get_bangkok_now
+from replica import REPLICA_BIND, read_replica, remember_writes
+
+
+@pytest.fixture
+def routed_app(tmp_path):
+    """An app with a primary and a replica SQLite file holding different rows."""
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "primary.db"}',
+        SQLALCHEMY_BINDS={REPLICA_BIND: f'sqlite:///{tmp_path / "replica.db"}'},
+        READ_AFTER_WRITE_SECONDS=10,
+        REPLICA_MAX_LAG_SECONDS=5,
+    )
+    db.init_app(app)
+    app.after_request(remember_writes)
+
+    @app.route('/brands')
+    @read_replica
+    def brands():
+        return jsonify(sorted(cost.brand for cost in ShipmentCost.query))
+
+    @app.route('/costs', methods=['POST'])
+    def add_cost():
+        db.session.add(cost_row('WRITTEN'))
+        db.session.commit()
+        return '', 204
+
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines[REPLICA_BIND])
+        db.session.add(cost_row('PRIMARY'))
+        db.session.commit()
+        with db.engines[REPLICA_BIND].begin() as connection:
+            connection.execute(ShipmentCost.__table__.insert(), [{
+                'brand': 'REPLICA', 'created_at': get_bangkok_now().replace(tzinfo=None),
+                'cost_date': get_bangkok_now().date(), 'product': 'Sea Moss', 'cost_type': 'Freight',
+                'total_amount': 100,
+            }])
+
+    replica._lag_cache.update(checked_at=0.0, lag=0.0)
+    return app
+
+
+def cost_row(brand):
+    now = get_bangkok_now().replace(tzinfo=None)
+    return ShipmentCost(brand=brand, created_at=now, cost_date=now.date(), product='Sea Moss',
+                        cost_type='Freight', total_amount=1)
+
+
+def test_reads_go_to_the_replica(routed_app):
+    assert routed_app.test_client().get('/brands').get_json() == ['REPLICA']
+
+
+def test_reads_fall_back_to_the_primary_after_a_write(routed_app):
+    client = routed_app.test_client()
+    assert client.post('/costs').status_code == 204
+    assert client.get('/brands').get_json() == ['PRIMARY', 'WRITTEN']
+
+    # Once READ_AFTER_WRITE_SECONDS have passed the replica is used again
+    with client.session_transaction() as session:
+        session['read_primary_until'] -= routed_app.config['READ_AFTER_WRITE_SECONDS']
+    assert client.get('/brands').get_json() == ['REPLICA']
+
+    # Other browsers never left the replica
+    assert routed_app.test_client().get('/brands').get_json() == ['REPLICA']
+
+
+def test_reads_fall_back_to_the_primary_when_the_replica_lags(routed_app, monkeypatch):
+    client = routed_app.test_client()
+    monkeypatch.setattr(replica, 'replica_lag', lambda engine: 60.0)
+    assert client.get('/brands').get_json() == ['PRIMARY']
+
+    monkeypatch.setattr(replica, 'replica_lag', lambda engine: 1.0)
+    assert client.get('/brands').get_json() == ['REPLICA']
+
+
+def test_undecorated_reads_use_the_primary(routed_app):
+    with routed_app.test_request_context('/'):
+        assert [cost.brand for cost in ShipmentCost.query] == ['PRIMARY']
+
+
+def test_column_store_reads_the_primary_inside_replica_views(routed_app, make_report):
+    now = get_bangkok_now().replace(tzinfo=None)
+    with routed_app.app_context():
+        db.session.add(make_report(report_date=now.date(), created_at=now, updated_at=now, employee_name='Mai',
+                                   brand='PRIMARY', product='Sea Moss', date_report=now.strftime('%Y-%m-%d')))
+        db.session.commit()
+
+    store = ReportColumnStore()
+    with routed_app.test_request_context('/'):
+        g.read_replica = True
+        store.refresh()
+        # The replica has no reports yet: read there, the row would be dropped as deleted
+        assert store.refresh() == 0
+        assert list(store.frame()['brand']) == ['PRIMARY']
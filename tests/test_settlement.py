@@ -0,0 +1,82 @@
+import io
+from datetime import datetime
+
+import pytest
+
+import settlement
+from models import db, AmazonTransaction, SettlementImport
+from settlement import DuplicateSettlement, insert_transactions, parse_settlement_import, record_import
+
+IMPORTED_AT = datetime(2026, 2, 1, 9)
+
+
+def settlement_xml(settlement_id, note=''):
+    return f'''<?xml version="1.0"?>
+<AmazonEnvelope><Message><SettlementReport>{note}
+<SettlementData><AmazonSettlementID>{settlement_id}</AmazonSettlementID>
+<TotalAmount currency="USD">27.64</TotalAmount></SettlementData>
+<Order><AmazonOrderID>{settlement_id}-1</AmazonOrderID><MarketplaceName>Amazon.com</MarketplaceName>
+<Fulfillment><PostedDate>2026-01-03T10:00:00+00:00</PostedDate>
+<Item><SKU>SKU1</SKU><Quantity>1</Quantity>
+<ItemPrice><Component><Type>Principal</Type><Amount currency="USD">39.98</Amount></Component></ItemPrice>
+</Item></Fulfillment></Order>
+<OtherTransaction><TransactionType>Storage Fee</TransactionType>
+<PostedDate>2026-01-06T00:00:00+00:00</PostedDate><Amount currency="USD">-12.34</Amount></OtherTransaction>
+</SettlementReport></Message></AmazonEnvelope>'''.encode()
+
+
+def import_file(brand, data):
+    rows, manifest = parse_settlement_import(io.BytesIO(data), brand, IMPORTED_AT)
+    settlement_import = record_import(brand, 'settlement.xml', rows, manifest, IMPORTED_AT)
+    db.session.commit()
+    return settlement_import
+
+
+def stored(brand):
+    return (SettlementImport.query.filter_by(brand=brand).count(),
+            AmazonTransaction.query.filter_by(brand=brand).count())
+
+
+def test_the_same_file_is_imported_once(app):
+    data = settlement_xml('DUP-FILE')
+    first = import_file('SETTLE-FILE', data)
+    assert (first.settlement_id, first.row_count) == ('DUP-FILE', 2)
+
+    with pytest.raises(DuplicateSettlement, match=f'import #{first.id}'):
+        import_file('SETTLE-FILE', data)
+    assert stored('SETTLE-FILE') == (1, 2)
+
+
+def test_the_same_settlement_id_is_imported_once_per_brand(app):
+    import_file('SETTLE-ID', settlement_xml('DUP-ID'))
+
+    # A re-download differs byte for byte but carries the same settlement ID
+    with pytest.raises(DuplicateSettlement, match='DUP-ID'):
+        import_file('SETTLE-ID', settlement_xml('DUP-ID', note='\n'))
+    assert stored('SETTLE-ID') == (1, 2)
+
+    import_file('SETTLE-ID-OTHER', settlement_xml('DUP-ID', note='\n\n'))
+    assert stored('SETTLE-ID-OTHER') == (1, 2)
+
+
+def test_rows_imported_before_manifests_count_as_a_duplicate(app):
+    data = settlement_xml('DUP-LEGACY')
+    rows, _ = parse_settlement_import(io.BytesIO(data), 'SETTLE-LEGACY', IMPORTED_AT)
+    insert_transactions(rows)
+    db.session.commit()
+
+    with pytest.raises(DuplicateSettlement, match='before settlement imports were tracked'):
+        import_file('SETTLE-LEGACY', data)
+    assert stored('SETTLE-LEGACY') == (0, 2)
+
+
+def test_a_concurrent_import_of_the_same_file_is_a_duplicate(app, monkeypatch):
+    data = settlement_xml('DUP-RACE')
+    first = import_file('SETTLE-RACE', data)
+
+    # The other request's manifest committed after this one's checks ran
+    monkeypatch.setattr(settlement, '_previous_import', lambda brand, manifest: None)
+    monkeypatch.setattr(settlement, '_legacy_rows_present', lambda brand, rows: False)
+    with pytest.raises(DuplicateSettlement, match=f'import #{first.id}'):
+        import_file('SETTLE-RACE', data)
+    assert stored('SETTLE-RACE') == (1, 2)